@@ -0,0 +1,34 @@
+from yt_dlp.extractor.common import InfoExtractor
+
+
+class FakeMediaIE(InfoExtractor):
+    """Экстрактор страниц /watch/<id> локального FakeMediaServer.
+
+    Метаданные запрашиваются у сервера (/api/<id>), поэтому задержка сервера
+    и общий пул соединений влияют на фазу extract так же, как у площадок.
+    """
+
+    IE_NAME = 'benchmark'
+    _VALID_URL = r'(?P<base>https?://(?:127\.0\.0\.1|localhost):\d+)/watch/(?P<id>[\w-]+)'
+
+    def _real_extract(self, url):
+        base, video_id = self._match_valid_url(url).group('base', 'id')
+        data = self._download_json(f'{base}/api/{video_id}', video_id, note=False)
+        return {
+            'id': data['id'],
+            'title': data['title'],
+            'duration': data['duration'],
+            'formats': [{
+                'format_id': 'mp4-720p',
+                'url': data['url'],
+                'ext': 'mp4',
+                'protocol': 'http',
+                'width': 1280,
+                'height': 720,
+                'fps': 30,
+                'vcodec': 'avc1.64001f',
+                'acodec': 'mp4a.40.2',
+                'tbr': data['tbr'],
+                'filesize': data['filesize'],
+            }],
+        }
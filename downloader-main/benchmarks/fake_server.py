@@ -0,0 +1,175 @@
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Размер файла по умолчанию и порция записи в сокет
+DEFAULT_SIZE = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# Длительность синтетического ролика: от нее зависит битрейт формата
+DURATION = 10
+
+_API_RE = re.compile(r'^/api/([\w-]+)$')
+_MEDIA_RE = re.compile(r'^/media/([\w-]+)\.mp4$')
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def make_payload(size):
+    """Детерминированные байты: одинаковый файл в каждом прогоне"""
+    block = bytes(range(256)) * (CHUNK_SIZE // 256)
+    return (block * (size // len(block) + 1))[:size]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 с Content-Length: клиенты держат keep-alive, как с настоящими CDN
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._route(send_body=False)
+
+    def do_GET(self):
+        self._route(send_body=True)
+
+    def _route(self, send_body):
+        media = self.server.media
+        media.count_request()
+        if media.latency:
+            time.sleep(media.latency)
+        match = _API_RE.match(self.path)
+        if match:
+            return self._send_bytes(200, json.dumps(media.describe(match.group(1))).encode(),
+                                    'application/json', send_body)
+        match = _MEDIA_RE.match(self.path)
+        if match:
+            return self._send_media(send_body)
+        self._send_bytes(404, b'not found', 'text/plain', send_body)
+
+    def _send_media(self, send_body):
+        media = self.server.media
+        size = media.size
+        start, end, status = 0, size - 1, 200
+        header = self.headers.get('Range')
+        match = _RANGE_RE.match(header or '')
+        if media.ranges and match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            else:
+                start = max(0, size - int(match.group(2)))
+            if start > end:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            status = 206
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', str(end - start + 1))
+        if media.ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.end_headers()
+        if send_body:
+            self._write_paced(media.payload, start, end + 1, media.bandwidth)
+
+    def _write_paced(self, payload, start, stop, bandwidth):
+        """Пишет тело порциями; с bandwidth скорость соединения не выше заданной"""
+        started = time.monotonic()
+        sent = 0
+        try:
+            for position in range(start, stop, CHUNK_SIZE):
+                chunk = payload[position:min(position + CHUNK_SIZE, stop)]
+                self.wfile.write(chunk)
+                sent += len(chunk)
+                if bandwidth:
+                    ahead = sent / bandwidth - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except ConnectionError:
+            # Клиент отменил загрузку или закрыл сегмент
+            self.close_connection = True
+
+    def _send_bytes(self, status, body, content_type, send_body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Клиенты закрывают keep-alive и пробные запросы сегментов без дочитывания
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FakeMediaServer:
+    """Локальный HTTP-сервер синтетических роликов для бенчмарков.
+
+    /api/<id> отдает метаданные для фейкового экстрактора, /media/<id>.mp4 —
+    файл заданного размера. Задержка добавляется перед каждым ответом,
+    bandwidth ограничивает скорость одного соединения (байт/с), ranges
+    включает ответы 206 на Range-запросы.
+    """
+
+    def __init__(self, size=DEFAULT_SIZE, latency=0.0, bandwidth=None, ranges=True,
+                 host='127.0.0.1', port=0):
+        self.size = size
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.ranges = ranges
+        self.payload = make_payload(size)
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.media = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def describe(self, video_id):
+        """Метаданные ролика: один готовый mp4 со звуком"""
+        return {
+            'id': video_id,
+            'title': f'bench {video_id}',
+            'duration': DURATION,
+            'url': f'{self.base_url}/media/{video_id}.mp4',
+            'filesize': self.size,
+            'tbr': round(self.size * 8 / 1000 / DURATION, 1),
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-media', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,244 @@
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+DEFAULT_BATCHES = (1, 10, 1000)
+# Показатели, которые сравнивает --compare, и направление улучшения
+COMPARED = (
+    ('items_per_s', 1),
+    ('mb_per_s', 1),
+    ('latency_p50', -1),
+    ('latency_p99', -1),
+    ('peak_rss_mb', -1),
+)
+
+# Модули src импортируют друг друга как верхнеуровневые (utils.*, core.*)
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+from cli import parse_rate  # noqa: E402
+
+
+def percentile(values, q):
+    """Перцентиль по ближайшему рангу; None для пустого списка"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдает килобайты, macOS — байты
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_batch(base_url, items, workers, segments=None, pipeline=False):
+    """Один прогон download_all в текущем процессе; файлы удаляются сразу после загрузки"""
+    from utils.ydl_pool import ydl_pool
+    from benchmarks.fake_extractor import FakeMediaIE
+    from downloader import VideoDownloader
+
+    ydl_pool.add_extractor(FakeMediaIE)
+    rss_start = _peak_rss_mb()
+    output = tempfile.mkdtemp(prefix='bench-')
+    downloader = VideoDownloader(max_workers=workers)
+    downloader.set_download_dir(output)
+    options = {
+        'format': 'video+audio',
+        'quality': '720p',
+        'output_dir': output,
+        'max_workers': workers,
+        'pipeline': pipeline,
+        # Каждый прогон измеряет экстрактор, а не кэш прошлого
+        'metadata_cache': False,
+    }
+    if segments is not None:
+        options['segments'] = segments
+    downloader.set_options(options)
+    for i in range(items):
+        downloader.add_to_queue(f'{base_url}/watch/b{os.getpid()}-{i}')
+
+    latencies = []
+    statuses = {}
+    totals = {'bytes': 0, 'connections_new': 0, 'connections_reused': 0}
+
+    def on_event(event, *args):
+        if event != 'item_complete':
+            return
+        result = args[3]
+        statuses[result.get('status')] = statuses.get(result.get('status'), 0) + 1
+        job = result.get('metrics') or {}
+        if job.get('started'):
+            latencies.append(time.time() - job['started'])
+        totals['bytes'] += job.get('bytes') or 0
+        connections = result.get('connections') or {}
+        totals['connections_new'] += connections.get('new', 0)
+        totals['connections_reused'] += connections.get('reused', 0)
+        if result.get('path') and os.path.exists(result['path']):
+            os.remove(result['path'])
+
+    cpu = _cpu_seconds()
+    started = time.perf_counter()
+    try:
+        downloader.download_all(on_event)
+    finally:
+        wall = time.perf_counter() - started
+        shutil.rmtree(output, ignore_errors=True)
+
+    return {
+        'items': items,
+        'statuses': statuses,
+        'wall_s': round(wall, 3),
+        'cpu_s': round(_cpu_seconds() - cpu, 3),
+        'items_per_s': round(items / wall, 2),
+        'mb_per_s': round(totals['bytes'] / wall / (1024 * 1024), 2),
+        'latency_p50': round(percentile(latencies, 50), 4) if latencies else None,
+        'latency_p99': round(percentile(latencies, 99), 4) if latencies else None,
+        'peak_rss_mb': _peak_rss_mb(),
+        'start_rss_mb': rss_start,
+        **totals,
+    }
+
+
+def _environment():
+    import yt_dlp.version
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'yt_dlp': yt_dlp.version.__version__,
+        'commit': commit,
+    }
+
+
+def _run_child(base_url, items, args):
+    """Каждая партия в своем процессе: пиковый RSS и прогретые пулы не переходят между партиями"""
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        out = f.name
+    command = [sys.executable, '-m', 'benchmarks.run', '--child', out,
+               '--base-url', base_url, '--items', str(items), '--workers', str(args.workers)]
+    if args.segments is not None:
+        command += ['--segments', str(args.segments)]
+    if args.pipeline:
+        command.append('--pipeline')
+    try:
+        # Строка прогресса yt-dlp идет в stdout; ошибки остаются в stderr
+        subprocess.run(command, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        with open(out, encoding='utf-8') as f:
+            return json.load(f)
+    finally:
+        os.remove(out)
+
+
+def compare(current, baseline):
+    """Строки сравнения двух прогонов по партиям одинакового размера"""
+    previous = {batch['items']: batch for batch in baseline.get('batches', [])}
+    lines = []
+    for batch in current['batches']:
+        old = previous.get(batch['items'])
+        if not old:
+            continue
+        cells = []
+        for name, direction in COMPARED:
+            new_value, old_value = batch.get(name), old.get(name)
+            if not new_value or not old_value:
+                continue
+            change = (new_value - old_value) / old_value * 100
+            mark = '+' if change * direction > 0 else '-' if change else '='
+            cells.append(f'{name} {old_value} -> {new_value} ({change:+.1f}% {mark})')
+        lines.append(f"{batch['items']:>5} items: " + ', '.join(cells))
+    return lines
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Throughput benchmark against a local fake media server')
+    parser.add_argument('--batches', type=int, nargs='+', default=list(DEFAULT_BATCHES),
+                        help='batch sizes (default 1 10 1000)')
+    parser.add_argument('--size', type=parse_rate, default='1M', help='media file size, e.g. 512K or 4M')
+    parser.add_argument('--latency', type=float, default=0.0, help='server delay before every response (s)')
+    parser.add_argument('--bandwidth', type=parse_rate, help='per-connection speed cap, e.g. 10M (bytes/s)')
+    parser.add_argument('--no-ranges', action='store_true', help='server ignores Range requests')
+    parser.add_argument('-w', '--workers', type=int, default=4, help='parallel downloads')
+    parser.add_argument('--segments', type=int, help='connections per file (0 = yt-dlp downloader)')
+    parser.add_argument('--pipeline', action='store_true', help='resolve metadata ahead of downloads')
+    parser.add_argument('-o', '--output', help=f'result JSON (default {RESULTS_DIR}/bench_<time>.json)')
+    parser.add_argument('--compare', help='earlier result JSON to compare with')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--base-url', help=argparse.SUPPRESS)
+    parser.add_argument('--items', type=int, help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.child:
+        result = run_batch(args.base_url, args.items, args.workers, args.segments, args.pipeline)
+        with open(args.child, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        return 0
+
+    from benchmarks.fake_server import FakeMediaServer
+
+    config = {
+        'size': args.size,
+        'latency': args.latency,
+        'bandwidth': args.bandwidth,
+        'ranges': not args.no_ranges,
+        'workers': args.workers,
+        'segments': args.segments,
+        'pipeline': args.pipeline,
+    }
+    report = {'started': time.strftime('%Y-%m-%dT%H:%M:%S'), 'environment': _environment(),
+              'config': config, 'batches': []}
+    with FakeMediaServer(args.size, args.latency, args.bandwidth, not args.no_ranges) as server:
+        for items in args.batches:
+            requests_before = server.requests
+            batch = _run_child(server.base_url, items, args)
+            batch['server_requests'] = server.requests - requests_before
+            report['batches'].append(batch)
+            print(f"{items:>5} items: {batch['items_per_s']} items/s, {batch['mb_per_s']} MB/s, "
+                  f"p50 {batch['latency_p50']}s, p99 {batch['latency_p99']}s, "
+                  f"peak RSS {batch['peak_rss_mb']} MB, {batch['statuses']}", flush=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"bench_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    directory = os.path.dirname(os.path.abspath(output))
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f'Results: {output}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        for line in compare(report, baseline):
+            print(line)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
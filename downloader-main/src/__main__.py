@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Модули src импортируют друг друга как верхнеуровневые (utils.*, core.*)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cli import main
+
+sys.exit(main())
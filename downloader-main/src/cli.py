@@ -0,0 +1,207 @@
+import argparse
+import itertools
+import os
+import sys
+
+# Модуль должен импортироваться быстро: yt-dlp, Qt и плагины
+# подгружаются внутри команд, только когда они действительно нужны
+
+
+def read_urls(source):
+    """Читает URL из файла или stdin ('-'); пустые строки и # комментарии пропускаются"""
+    stream = sys.stdin if source == '-' else open(source, encoding='utf-8')
+    try:
+        for line in stream:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def _print_event(event, *args):
+    if event == 'item_complete':
+        i, total, url, result = args
+        status = result.get('status')
+        detail = result.get('path') or result.get('message') or ''
+        position = f'{i + 1}/{total}' if total is not None else f'{i + 1}'
+        print(f'[{position}] {status}: {url} {detail}'.rstrip(), flush=True)
+        if result.get('report_error'):
+            print(result['report_error'], file=sys.stderr)
+
+
+def parse_rate(value):
+    """Скорость вида 500K, 2.5M или число байт в секунду"""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    value = value.strip().upper().rstrip('B')
+    try:
+        if value and value[-1] in units:
+            return int(float(value[:-1]) * units[value[-1]])
+        return int(float(value))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid rate: {value}')
+
+
+def _options_from_args(args):
+    options = {
+        'format': args.format,
+        'quality': args.quality,
+        'output_dir': args.output,
+        'max_workers': args.workers,
+    }
+    if args.priority:
+        options['priority'] = args.priority
+    if args.segments is not None:
+        options['segments'] = args.segments
+    if args.split_tracks:
+        options['prefer_muxed'] = False
+    if args.no_expand:
+        options['expand_playlists'] = False
+    if args.archive:
+        options['download_archive'] = args.archive
+    if args.postprocess_workers:
+        options['postprocess_workers'] = args.postprocess_workers
+    return options
+
+
+def _profiling_from_args(args, scope='job'):
+    if not args.profile:
+        return None
+    return {'mode': args.profile, 'scope': scope, 'sample': args.profile_sample}
+
+
+def cmd_batch(args):
+    from downloader import VideoDownloader
+
+    downloader = VideoDownloader(max_workers=args.workers)
+    if args.limit_rate:
+        downloader.bandwidth.set_limit(args.limit_rate)
+    if args.journal:
+        downloader.set_journal(args.journal)
+        resumed = downloader.resume()
+        if resumed:
+            print(f'Resumed {resumed} unfinished job(s) from {args.journal}', file=sys.stderr)
+
+    if args.metrics_file:
+        downloader.metrics.set_textfile(args.metrics_file)
+    if not args.no_report:
+        downloader.set_reports(args.report_dir)
+        print(f'Report: {downloader.reports.directory}', file=sys.stderr)
+    profiling = _profiling_from_args(args, args.profile_scope)
+    if profiling:
+        downloader.set_profiling(**profiling)
+    downloader.set_download_dir(args.output)
+    options = _options_from_args(args)
+    options['pipeline'] = args.pipeline
+    downloader.set_options(options)
+
+    # URL читаются из файла по мере освобождения окна задач, а итоги только считаются:
+    # память не растет с размером списка. Возобновленные задачи идут первыми
+    urls = itertools.chain(list(downloader.queue), read_urls(args.source))
+    counts = {}
+    try:
+        for _, _, result in downloader.download_iter(urls, _print_event):
+            counts[result.get('status')] = counts.get(result.get('status'), 0) + 1
+    except KeyboardInterrupt:
+        downloader.stop_download()
+        print('Interrupted', file=sys.stderr)
+        return 130
+
+    if args.metrics_file:
+        downloader.metrics.write_textfile()
+    if downloader.profiler and downloader.profiler.files:
+        print(f'Profiles: {len(downloader.profiler.files)} file(s) in {downloader.profiler.directory}',
+              file=sys.stderr)
+    if not counts:
+        print('Queue is empty', file=sys.stderr)
+        return 0
+    print('Done: ' + ', '.join(f'{status} {count}' for status, count in sorted(counts.items())),
+          file=sys.stderr)
+    failed = sum(count for status, count in counts.items() if status not in ('success', 'skipped'))
+    return 1 if failed else 0
+
+
+def cmd_serve(args):
+    import asyncio
+    from download_queue.manager import DEFAULT_JOURNAL_PATH
+    from server import serve
+    from utils.bandwidth import bandwidth
+
+    if args.limit_rate:
+        bandwidth.set_limit(args.limit_rate)
+    journal = None if args.no_journal else (args.journal or DEFAULT_JOURNAL_PATH)
+    report_dir = None if args.no_report else (args.report_dir or os.path.join(os.getcwd(), 'data', 'reports'))
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, journal, _options_from_args(args), report_dir,
+                          _profiling_from_args(args)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_gui(args):
+    from main import main as run_gui
+
+    run_gui()
+    return 0
+
+
+def _add_download_arguments(parser):
+    parser.add_argument('-w', '--workers', type=int, default=4, help='parallel downloads')
+    parser.add_argument('-o', '--output', default=os.getcwd(), help='download directory')
+    parser.add_argument('-f', '--format', default='video+audio',
+                        choices=('video+audio', 'video_only', 'audio_only'))
+    parser.add_argument('-q', '--quality', default='1080p')
+    parser.add_argument('--archive', help='download archive; already downloaded videos are skipped')
+    parser.add_argument('--postprocess-workers', type=int, default=0,
+                        help='run ffmpeg in a separate process pool')
+    parser.add_argument('--limit-rate', type=parse_rate,
+                        help='total bandwidth shared by all downloads, e.g. 5M (bytes/s)')
+    parser.add_argument('--priority', choices=('interactive', 'bulk'),
+                        help='bandwidth class of the downloads')
+    parser.add_argument('--segments', type=int,
+                        help='connections per progressive file (0 = yt-dlp downloader, default per platform)')
+    parser.add_argument('--report-dir', help='JSONL reports and their index (default data/reports)')
+    parser.add_argument('--no-report', action='store_true', help='do not write a report')
+    parser.add_argument('--split-tracks', action='store_true',
+                        help='always take separate video and audio tracks, even if a muxed file matches')
+    parser.add_argument('--no-expand', action='store_true',
+                        help='download playlist and channel URLs as one job instead of expanding their entries')
+    parser.add_argument('--profile', choices=('cpu', 'memory', 'both'),
+                        help='profile sampled jobs with cProfile and/or tracemalloc (files next to the report)')
+    parser.add_argument('--profile-sample', type=float, default=0.1,
+                        help='fraction of jobs to profile (default 0.1)')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m src', description='Video downloader')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    batch = commands.add_parser('batch', help='download URLs from a file or stdin without GUI')
+    batch.add_argument('source', nargs='?', default='-', help="file with URLs, one per line ('-' for stdin)")
+    _add_download_arguments(batch)
+    batch.set_defaults(priority='bulk')
+    batch.add_argument('--pipeline', action='store_true', help='resolve metadata ahead of downloads')
+    batch.add_argument('--journal', help='SQLite job journal; unfinished jobs are resumed')
+    batch.add_argument('--profile-scope', choices=('job', 'batch'), default='job',
+                       help='profile sampled jobs separately or the whole batch as one profile')
+    batch.add_argument('--metrics-file', help='Prometheus text file with per-platform timings (node_exporter textfile)')
+    batch.set_defaults(handler=cmd_batch)
+
+    serve = commands.add_parser('serve', help='run the HTTP job API')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    _add_download_arguments(serve)
+    serve.add_argument('--journal', help='SQLite job journal (default data/queue.sqlite)')
+    serve.add_argument('--no-journal', action='store_true', help='keep jobs in memory only')
+    serve.set_defaults(handler=cmd_serve)
+
+    gui = commands.add_parser('gui', help='start the graphical interface')
+    gui.set_defaults(handler=cmd_gui)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
@@ -1,12 +1,215 @@
-def is_short_video(video_path: str, duration_threshold: int = 60) -> bool:
-    """Проверяет, является ли видео Shorts (до 60 секунд)."""
-    # Используем ffprobe (из ffmpeg) для получения длительности
-    import subprocess
-    cmd =  [
+import os
+import re
+import sqlite3
+import subprocess
+import threading
+from typing import Dict, Iterable, List, Optional, Union
+
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.webm', '.mov', '.avi', '.flv', '.m4v', '.3gp')
+# Сколько файлов открывает один процесс ffmpeg при пакетном чтении длительности
+PROBE_BATCH_SIZE = 32
+# Кэш проб по умолчанию лежит рядом с кэшем метаданных
+DEFAULT_PROBE_CACHE_PATH = os.path.join('data', 'cache', 'probe.sqlite')
+
+_INPUT_RE = re.compile(r'^Input #(\d+),')
+_DURATION_RE = re.compile(r'^\s+Duration: (\d+):(\d+):(\d+(?:\.\d+)?)')
+
+
+class ProbeCache:
+    """Кэш длительностей по (путь, mtime, размер): файл не пробуется дважды"""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS probe (
+                path TEXT PRIMARY KEY,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL,
+                duration REAL NOT NULL
+            )
+        ''')
+        self._conn.commit()
+
+    def get_many(self, paths: Iterable[str]) -> Dict[str, float]:
+        found = {}
+        with self._lock:
+            for path in paths:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                row = self._conn.execute(
+                    'SELECT duration FROM probe WHERE path = ? AND mtime = ? AND size = ?',
+                    (os.path.abspath(path), stat.st_mtime, stat.st_size)
+                ).fetchone()
+                if row is not None:
+                    found[path] = row[0]
+        return found
+
+    def set_many(self, durations: Dict[str, float]):
+        rows = []
+        for path, duration in durations.items():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            rows.append((os.path.abspath(path), stat.st_mtime, stat.st_size, duration))
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO probe VALUES (?, ?, ?, ?)', rows)
+            self._conn.commit()
+
+
+_default_cache: Optional[ProbeCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_probe_cache() -> ProbeCache:
+    """Общий дисковый кэш проб процесса (создается при первом обращении)"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ProbeCache(os.path.join(os.getcwd(), DEFAULT_PROBE_CACHE_PATH))
+        return _default_cache
+
+
+def _resolve_cache(cache) -> Optional[ProbeCache]:
+    """True — общий кэш, None/False — без кэша, иначе переданный ProbeCache"""
+    if cache is True:
+        return get_probe_cache()
+    return cache or None
+
+
+def _probe_single(video_path: str) -> Optional[float]:
+    """Длительность одного файла через ffprobe"""
+    cmd = [
         "ffprobe", "-v", "error",
         "-show_entries", "format=duration",
         "-of", "default=noprint_wrappers=1:nokey=1",
         video_path
     ]
-    duration = float(subprocess.check_output(cmd).decode().strip())
-    return duration <= duration_threshold
\ No newline at end of file
+    try:
+        return float(subprocess.check_output(cmd, stderr=subprocess.DEVNULL).decode().strip())
+    except (subprocess.CalledProcessError, ValueError, OSError):
+        return None
+
+
+def probe_durations(paths: List[str], batch_size: int = PROBE_BATCH_SIZE) -> Dict[str, float]:
+    """Читает длительности пачками: один ffmpeg открывает сразу много входов
+    и печатает Duration для каждого. Файлы, которые ffmpeg не разобрал, пробуются по одному"""
+    durations = {}
+    for start in range(0, len(paths), batch_size):
+        batch = paths[start:start + batch_size]
+        cmd = ['ffmpeg', '-hide_banner', '-nostdin']
+        for path in batch:
+            cmd += ['-i', path]
+        try:
+            # Без выходного файла ffmpeg завершится с ошибкой, но описание входов уже напечатано
+            output = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE).stderr
+        except OSError:
+            output = b''
+
+        current = None
+        for line in output.decode(errors='replace').splitlines():
+            match = _INPUT_RE.match(line)
+            if match:
+                current = int(match.group(1))
+                continue
+            match = _DURATION_RE.match(line)
+            if match and current is not None and current < len(batch):
+                hours, minutes, seconds = match.groups()
+                durations[batch[current]] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+                current = None
+
+    for path in paths:
+        if path not in durations:
+            duration = _probe_single(path)
+            if duration is not None:
+                durations[path] = duration
+    return durations
+
+
+def _duration_from_item(item) -> Optional[float]:
+    """Длительность из info dict yt-dlp или результата загрузки"""
+    duration = item.get('duration')
+    return float(duration) if duration else None
+
+
+def _path_from_item(item) -> Optional[str]:
+    if item.get('path'):
+        return item['path']
+    if item.get('filepath'):
+        return item['filepath']
+    downloads = item.get('requested_downloads') or []
+    if downloads and downloads[0].get('filepath'):
+        return downloads[0]['filepath']
+    return None
+
+
+def get_durations(items: Iterable, cache: Union[ProbeCache, bool, None] = True) -> Dict[str, Optional[float]]:
+    """Длительности для путей и/или словарей (info dict, результат download()).
+    Порядок источников: поле duration -> кэш проб -> пакетный ffmpeg/ffprobe.
+    cache=None отключает кэш проб"""
+    durations = {}
+    to_probe = []
+    for item in items:
+        if isinstance(item, dict):
+            key = _path_from_item(item) or item.get('webpage_url') or item.get('id')
+            duration = _duration_from_item(item)
+            if duration is not None or not _path_from_item(item):
+                durations[key] = duration
+                continue
+        else:
+            key = item
+        durations[key] = None
+        to_probe.append(key)
+
+    cache = _resolve_cache(cache) if to_probe else None
+    if cache is not None:
+        cached = cache.get_many(to_probe)
+        durations.update(cached)
+        to_probe = [path for path in to_probe if path not in cached]
+
+    if to_probe:
+        probed = probe_durations(to_probe)
+        durations.update(probed)
+        if cache is not None:
+            cache.set_many(probed)
+    return durations
+
+
+def classify_videos(items: Iterable, duration_threshold: int = 60,
+                    cache: Union[ProbeCache, bool, None] = True) -> Dict[str, Optional[bool]]:
+    """Классифицирует сразу весь набор: True — Shorts, False — обычное видео,
+    None — длительность узнать не удалось"""
+    return {
+        key: (duration <= duration_threshold if duration is not None else None)
+        for key, duration in get_durations(items, cache).items()
+    }
+
+
+def classify_directory(directory: str, duration_threshold: int = 60,
+                       cache: Union[ProbeCache, bool, None] = True,
+                       extensions: Iterable[str] = VIDEO_EXTENSIONS) -> Dict[str, Optional[bool]]:
+    """Классифицирует все видеофайлы в папке"""
+    extensions = tuple(ext.lower() for ext in extensions)
+    paths = sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(extensions)
+    )
+    return classify_videos(paths, duration_threshold, cache)
+
+
+def is_short_video(video_path: str, duration_threshold: int = 60,
+                   info: Optional[dict] = None, cache: Union[ProbeCache, bool, None] = True) -> bool:
+    """Проверяет, является ли видео Shorts (до 60 секунд)."""
+    # Сначала длительность из info dict yt-dlp, затем кэш, и только потом ffprobe
+    item = dict(info, path=video_path) if info else video_path
+    duration = next(iter(get_durations([item], cache).values()))
+    if duration is None:
+        raise ValueError(f'Cannot determine duration of {video_path}')
+    return duration <= duration_threshold
@@ -0,0 +1,203 @@
+import re
+from typing import Dict, Iterator, List, Optional
+
+from core.presets import PRESETS, QualityPreset
+
+# Относительный размер при равном качестве: чем меньше, тем экономнее кодек
+CODEC_EFFICIENCY = {
+    'av01': 0.55,
+    'vp09': 0.7,
+    'vp9': 0.7,
+    'hev1': 0.7,
+    'hvc1': 0.7,
+    'avc1': 1.0,
+    'h264': 1.0,
+}
+DEFAULT_EFFICIENCY = 1.2
+# 29.97 и 30 кадров считаются одной частотой
+FPS_TOLERANCE = 1
+# Готовый файл со звуком равен паре дорожек, если уступает ей не больше чем на эти доли
+MUXED_HEIGHT_TOLERANCE = 0.1
+MUXED_BITRATE_TOLERANCE = 0.2
+# Контейнеры, в которые дорожки склеиваются без перекодирования
+COMPATIBLE_AUDIO = {'mp4': ('m4a', 'mp4'), 'webm': ('webm', 'weba')}
+
+_HEIGHT_RE = re.compile(r'^(\d+)p$')
+_BITRATE_RE = re.compile(r'^(\d+(?:\.\d+)?)([kKmM]?)$')
+
+
+def parse_bitrate(value: Optional[str]) -> Optional[float]:
+    """'5000k' / '10M' в кбит/с; 'best' и пустое значение — без ограничения"""
+    match = _BITRATE_RE.match((value or '').strip())
+    if not match:
+        return None
+    number, unit = float(match.group(1)), match.group(2).lower()
+    return number * 1000 if unit == 'm' else number if unit == 'k' else number / 1000
+
+
+def get_preset(quality: Optional[str]) -> QualityPreset:
+    """Пресет по имени качества; для '480p' и т.п. ограничивается только высота"""
+    if quality in PRESETS:
+        return PRESETS[quality]
+    match = _HEIGHT_RE.match(quality or '')
+    if match:
+        return QualityPreset(quality, int(match.group(1)), 999, 'best')
+    return PRESETS['max']
+
+
+def _has_video(f: Dict) -> bool:
+    return f.get('vcodec') != 'none'
+
+
+def _has_audio(f: Dict) -> bool:
+    return f.get('acodec') != 'none'
+
+
+def _size(f: Dict) -> Optional[float]:
+    return f.get('filesize') or f.get('filesize_approx')
+
+
+def _rate(f: Dict) -> Optional[float]:
+    return f.get('tbr') or f.get('vbr')
+
+
+def _efficiency(f: Dict) -> float:
+    codec = (f.get('vcodec') or '').split('.')[0].lower()
+    return CODEC_EFFICIENCY.get(codec, DEFAULT_EFFICIENCY)
+
+
+class FormatSelector:
+    """Выбор формата для yt-dlp (опция 'format' принимает callable).
+
+    Из форматов, укладывающихся в пресет по высоте, частоте кадров и битрейту,
+    берется лучшее разрешение и частота, а среди равных — самый маленький по
+    filesize/filesize_approx (без размера — по экономности кодека). Так 60fps
+    VP9 не скачивается вдвое большим файлом, когда пресет просит 30fps.
+
+    С prefer_muxed готовый файл со звуком выбирается вместо пары дорожек
+    близкого разрешения и битрейта: одна загрузка и никакой склейки ffmpeg.
+    Отвергнутая пара записывается в '__merge_skipped' выбранного формата.
+    """
+
+    def __init__(self, preset: QualityPreset, format_type: str = 'video+audio', prefer_muxed: bool = True):
+        self.preset = preset
+        self.format_type = format_type
+        self.prefer_muxed = prefer_muxed
+        self.max_rate = parse_bitrate(preset.bitrate)
+
+    def __repr__(self):
+        # Стабильное представление: по нему пул YoutubeDL сравнивает опции
+        return f'FormatSelector({self.preset!r}, {self.format_type!r}, prefer_muxed={self.prefer_muxed!r})'
+
+    def __call__(self, ctx: Dict) -> Iterator[Dict]:
+        formats = [f for f in ctx.get('formats', []) if _has_video(f) or _has_audio(f)]
+        if self.format_type == 'video_only':
+            candidates = [f for f in formats if _has_video(f) and not _has_audio(f)]
+            chosen = self.pick_video(candidates or [f for f in formats if _has_video(f)])
+            if chosen:
+                yield chosen
+            return
+
+        videos = [f for f in formats if _has_video(f) and not _has_audio(f)]
+        audios = [f for f in formats if _has_audio(f) and not _has_video(f)]
+        muxed = [f for f in formats if _has_video(f) and _has_audio(f)]
+        pair = None
+        video = self.pick_video(videos)
+        if video:
+            audio = self.pick_audio(audios, video)
+            pair = self.merge(video, audio) if audio else video
+
+        if self.prefer_muxed and pair and pair.get('requested_formats'):
+            best_muxed = self.pick_video(muxed)
+            if best_muxed and self.meets(best_muxed) and self.equivalent(best_muxed, pair):
+                chosen = dict(best_muxed)
+                chosen['__merge_skipped'] = {'format_id': pair['format_id'],
+                                               'filesize': _size(pair) or _size(best_muxed)}
+                yield chosen
+                return
+
+        chosen = self.pick_video(muxed + [pair] if pair else muxed)
+        if chosen:
+            yield chosen
+
+    @staticmethod
+    def equivalent(muxed: Dict, pair: Dict) -> bool:
+        """Готовый файл не хуже пары дорожек с учетом допусков; неизвестное не сравнивается"""
+        if muxed.get('height') and pair.get('height'):
+            if muxed['height'] < pair['height'] * (1 - MUXED_HEIGHT_TOLERANCE):
+                return False
+        if _rate(muxed) and pair.get('tbr'):
+            if _rate(muxed) < pair['tbr'] * (1 - MUXED_BITRATE_TOLERANCE):
+                return False
+        return True
+
+    def meets(self, f: Dict) -> bool:
+        """Формат не выше пресета; неизвестные поля ограничением не считаются"""
+        preset = self.preset
+        if f.get('height') and f['height'] > preset.max_height:
+            return False
+        if f.get('fps') and f['fps'] > preset.fps + FPS_TOLERANCE:
+            return False
+        if self.max_rate and _rate(f) and _rate(f) > self.max_rate:
+            return False
+        return True
+
+    def rank(self, f: Dict):
+        """Ключ сортировки: лучшее качество в пределах пресета, затем меньший размер"""
+        size = _size(f)
+        return (
+            -(f.get('height') or 0),
+            -min(f.get('fps') or 0, self.preset.fps + FPS_TOLERANCE),
+            size is None,
+            size or 0,
+            _efficiency(f),
+        )
+
+    def pick_video(self, formats: List[Dict]) -> Optional[Dict]:
+        if not formats:
+            return None
+        fitting = [f for f in formats if self.meets(f)]
+        if fitting:
+            return min(fitting, key=self.rank)
+        # Ничего не укладывается в пресет: самый маленький из доступных
+        return min(formats, key=lambda f: (f.get('height') or 0, f.get('fps') or 0, _size(f) or 0))
+
+    def pick_audio(self, formats: List[Dict], video: Dict) -> Optional[Dict]:
+        """Лучший звук в остатке бюджета битрейта; склеиваемый без перекодирования — первым"""
+        if not formats:
+            return None
+        compatible = COMPATIBLE_AUDIO.get(video.get('ext'), ())
+        budget = self.max_rate - (_rate(video) or 0) if self.max_rate else None
+
+        def key(f):
+            abr = f.get('abr') or f.get('tbr') or 0
+            return (f.get('ext') in compatible, not budget or abr <= budget, abr)
+
+        return max(formats, key=key)
+
+    @staticmethod
+    def merge(video: Dict, audio: Dict) -> Dict:
+        """Описание пары дорожек в том же виде, что строит yt-dlp для 'bv+ba'"""
+        from yt_dlp.utils import get_compatible_ext
+
+        pair = [video, audio]
+        sizes = [_size(f) for f in pair]
+        return {
+            'requested_formats': pair,
+            'format': f"{video.get('format')}+{audio.get('format')}",
+            'format_id': f"{video['format_id']}+{audio['format_id']}",
+            'ext': get_compatible_ext(vcodecs=[video.get('vcodec')], acodecs=[audio.get('acodec')],
+                                      vexts=[video['ext']], aexts=[audio['ext']]),
+            'protocol': f"{video.get('protocol')}+{audio.get('protocol')}",
+            'filesize_approx': sum(sizes) if all(sizes) else None,
+            'tbr': (_rate(video) or 0) + (audio.get('abr') or audio.get('tbr') or 0) or None,
+            'width': video.get('width'),
+            'height': video.get('height'),
+            'fps': video.get('fps'),
+            'vcodec': video.get('vcodec'),
+            'vbr': video.get('vbr'),
+            'acodec': audio.get('acodec'),
+            'abr': audio.get('abr'),
+            'asr': audio.get('asr'),
+            'audio_channels': audio.get('audio_channels'),
+        }
@@ -1,18 +1,30 @@
-from typing import List
+import os
+from typing import List, Optional
 from threading import Thread
-from src.downloader import VideoDownloader
+from downloader import VideoDownloader
 from core.types import PRESETS
 
+DEFAULT_JOURNAL_PATH = os.path.join('data', 'queue.sqlite')
+
 class DownloadQueue:
-    def __init__(self):
+    def __init__(self, journal_path: Optional[str] = DEFAULT_JOURNAL_PATH):
         self.queue: List[str] = []
         self.downloader = VideoDownloader()
         self.preset = PRESETS["720p"]
+        if journal_path:
+            self.downloader.set_journal(journal_path)
+            # Подхватываем задачи, прерванные при прошлом запуске
+            self.downloader.resume()
+            self.queue = list(self.downloader.queue)
 
     def add_to_queue(self, url: str):
-        self.queue.append(url)
+        if self.downloader.add_to_queue(url):
+            self.queue.append(url)
 
-    def start_download(self):
-        for url in self.queue:
-            Thread(target=self.downloader.download, args=(url, self.preset)).start()
-        self.queue.clear()
\ No newline at end of file
+    def start_download(self, callback=None) -> Thread:
+        self.downloader.queue = list(self.queue)
+        thread = Thread(target=self.downloader.download_all, args=(callback,))
+        thread.start()
+        # Неудачные загрузки остаются в очереди загрузчика и в журнале
+        self.queue.clear()
+        return thread
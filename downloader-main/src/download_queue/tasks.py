@@ -0,0 +1,121 @@
+import os
+import time
+import sqlite3
+import threading
+
+# Состояния задачи в журнале
+PENDING = 'pending'
+RESOLVING = 'resolving'
+DOWNLOADING = 'downloading'
+POSTPROCESSING = 'postprocessing'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+ACTIVE_STATES = (PENDING, RESOLVING, DOWNLOADING, POSTPROCESSING)
+FINAL_STATES = (DONE, FAILED, CANCELLED)
+
+
+class JobJournal:
+    """Журнал задач загрузки в SQLite (WAL), переживающий падение и закрытие GUI"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # WAL + NORMAL: запись не теряется при падении процесса
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                path TEXT,
+                message TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS jobs_url ON jobs (url)')
+        self._conn.commit()
+
+    def add(self, url):
+        """Добавляет задачу в состоянии pending и возвращает ее id"""
+        with self._lock:
+            job_id = self._insert(url)
+            self._conn.commit()
+            return job_id
+
+    def ensure(self, url, exclude=()):
+        """Возвращает id незавершенной (или упавшей) задачи для URL, создавая новую при необходимости.
+        exclude — id, уже занятые в этой партии: у дублей URL свои задачи"""
+        exclude = list(exclude)
+        query = 'SELECT id FROM jobs WHERE url = ? AND state != ?'
+        if exclude:
+            query += f' AND id NOT IN ({", ".join("?" * len(exclude))})'
+        # Поиск и вставка под одной блокировкой: параллельные вызовы не создают лишних задач
+        with self._lock:
+            row = self._conn.execute(query + ' ORDER BY id DESC LIMIT 1', [url, DONE] + exclude).fetchone()
+            if row is not None:
+                return row['id']
+            job_id = self._insert(url)
+            self._conn.commit()
+            return job_id
+
+    def _insert(self, url):
+        now = time.time()
+        cursor = self._conn.execute(
+            'INSERT INTO jobs (url, state, created, updated) VALUES (?, ?, ?, ?)',
+            (url, PENDING, now, now)
+        )
+        return cursor.lastrowid
+
+    def set_state(self, job_id, state, **fields):
+        """Меняет состояние задачи; fields — path или message"""
+        columns = ['state = ?', 'updated = ?']
+        values = [state, time.time()]
+        for name in ('path', 'message'):
+            if name in fields:
+                columns.append(f'{name} = ?')
+                values.append(fields[name])
+        if state == DOWNLOADING:
+            columns.append('attempts = attempts + 1')
+        values.append(job_id)
+        with self._lock:
+            self._conn.execute(f'UPDATE jobs SET {", ".join(columns)} WHERE id = ?', values)
+            self._conn.commit()
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_unfinished(self, max_attempts=None):
+        """Задачи, прерванные на любой стадии, и упавшие, у которых остались попытки"""
+        query = f'SELECT * FROM jobs WHERE state IN ({", ".join("?" * len(ACTIVE_STATES))})'
+        params = list(ACTIVE_STATES)
+        if max_attempts:
+            query += ' OR (state = ? AND attempts < ?)'
+            params += [FAILED, max_attempts]
+        with self._lock:
+            rows = self._conn.execute(query + ' ORDER BY id', params).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_counts(self):
+        """Количество задач по состояниям"""
+        with self._lock:
+            rows = self._conn.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall()
+        return {state: count for state, count in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,22 +1,87 @@
 import os
 import time
 import json
-import requests
-import yt_dlp
 from urllib.parse import urlparse, parse_qs
 import re
 from datetime import datetime
 import threading
+import itertools
+from collections import deque
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
+from core.format_selector import FormatSelector, get_preset
+from utils.cache import MetadataCache
+from utils.ratelimit import HostLimiter
+from utils.ydl_pool import ydl_pool
+from utils.bandwidth import bandwidth, INTERACTIVE, PACE_SLICE
+from utils.http import http_pool
+from utils.archive import DownloadArchive
+from utils.urls import canonicalize_url, get_video_key, get_return_type, make_archive_key
+from utils.feed import UrlFeed, FeedClosed, ExpandError
+from utils.postprocess import PostprocessStage, merge_costs
+from utils.metrics import metrics, JobMetrics
+from utils.profiling import JobProfiler, DEFAULT_SAMPLE
+from utils.progress import ProgressStore, format_bytes, format_eta
+from utils.reporter import ReportWriter
+from utils.segmented import SegmentedDownloader, RangeNotSupported, CONTROL_SUFFIX as SEGMENTS_CONTROL_SUFFIX
+from download_queue.tasks import JobJournal, RESOLVING, DOWNLOADING, POSTPROCESSING, DONE, FAILED, PENDING, CANCELLED
+
+# Вложенность плейлистов, которую раскрывает expand (канал -> вкладка -> плейлист)
+MAX_EXPAND_DEPTH = 2
+# Как часто download_iter проверяет источник, пока плейлист раскрывается в фоне (секунды)
+FEED_POLL = 0.1
 
 class VideoDownloader:
-    def __init__(self):
+    def __init__(self, max_workers=1, plugin_manager=None, journal=None):
         self.queue = []
         self.download_dir = os.getcwd()
         self.options = {}
         self.current_downloads = {}
         self.is_downloading = False
-        self._stop_flag = False
+        self.max_workers = max_workers
+        self.plugin_manager = plugin_manager
+        # Кэши метаданных по пути файла: путь и отключение могут прийти в options вызова
+        self._metadata_caches = {}
+        self.ydl_pool = ydl_pool
+        # Общая полоса делится между активными загрузками по options['priority']
+        self.bandwidth = bandwidth
+        # Соединения с хостами переиспользуются всеми задачами процесса
+        self.http_pool = http_pool
+        # Гистограммы фаз и скорости по площадкам и пресетам (экспорт в Prometheus)
+        self.metrics = metrics
+        self._job_metrics = {}
+        self.journal = journal
+        # Построчный отчет JSONL: пишется по мере завершения задач
+        self.reports = None
+        # Выборочное профилирование задач или всей партии (cProfile, tracemalloc)
+        self.profiler = None
+        self._archives = {}
+        self.postprocess_stage = None
+        # Многопоточные загрузчики по числу соединений
+        self._segmented = {}
+        # Сырые цифры прогресса по id задачи; GUI опрашивает их по таймеру
+        self.progress = ProgressStore()
+        self._job_seq = itertools.count(1)
+        # Общие данные используются сразу несколькими рабочими потоками
+        self._lock = threading.RLock()
+        self._callback_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        # Задачи, отмененные по отдельности; прерываются на следующем чанке
+        self._cancelled = set()
+        # Файлы, записанные задачей: .part и уже скачанные дорожки
+        self._job_files = {}
+    
+    @property
+    def _stop_flag(self):
+        return self._stop_event.is_set()
+    
+    @_stop_flag.setter
+    def _stop_flag(self, value):
+        if value:
+            self._stop_event.set()
+        else:
+            self._stop_event.clear()
         
     def set_download_dir(self, directory):
         """Устанавливает директорию для сохранения файлов"""
@@ -30,13 +95,50 @@ class VideoDownloader:
         self.options = options
         return True
     
+    def set_journal(self, path):
+        """Включает журнал задач, чтобы очередь переживала падения"""
+        self.journal = JobJournal(path)
+        return True
+    
+    def set_reports(self, directory=None, **kwargs):
+        """Включает потоковый отчет: строка JSONL на каждую завершенную задачу"""
+        if self.reports:
+            self.reports.close()
+        self.reports = ReportWriter(directory, **kwargs)
+        return self.reports
+    
+    def set_profiling(self, mode='cpu', scope='job', sample=DEFAULT_SAMPLE, directory=None, **kwargs):
+        """Включает профилирование (mode 'cpu', 'memory' или 'both'; None выключает).
+        Файлы .pstats и .alloc.txt пишутся рядом с отчетом"""
+        if not mode:
+            self.profiler = None
+            return None
+        if self.reports:
+            directory = directory or self.reports.directory
+            kwargs.setdefault('prefix', f'profile_{self.reports.session}')
+        self.profiler = JobProfiler(directory, mode, scope, sample, **kwargs)
+        return self.profiler
+    
     def add_to_queue(self, url):
         """Добавляет URL в очередь загрузки"""
         if self._validate_url(url):
             self.queue.append(url)
+            if self.journal:
+                self.journal.ensure(url)
             return True
         return False
     
+    def resume(self, max_attempts=3):
+        """Возвращает в очередь задачи, прерванные при прошлом запуске"""
+        if not self.journal:
+            return 0
+        added = 0
+        for job in self.journal.get_unfinished(max_attempts):
+            if job['url'] not in self.queue:
+                self.queue.append(job['url'])
+                added += 1
+        return added
+    
     def _validate_url(self, url):
         """Проверяет валидность URL"""
         try:
@@ -45,6 +147,36 @@ class VideoDownloader:
         except:
             return False
     
+    def canonicalize(self, url, resolve=True):
+        """Возвращает канонический URL (короткие ссылки раскрыты, трекинг убран) или None"""
+        if not self._validate_url(url):
+            return None
+        canonical = canonicalize_url(url, resolve=resolve)
+        return canonical if self._validate_url(canonical) else url
+    
+    def _get_archive(self, options):
+        """Возвращает архив скачанных видео из options['download_archive']"""
+        path = options.get('download_archive') or os.path.join(os.getcwd(), 'data', 'archive.txt')
+        with self._lock:
+            if path not in self._archives:
+                self._archives[path] = DownloadArchive(path)
+            return self._archives[path]
+    
+    def _should_skip_archived(self, options, skip_archived):
+        if skip_archived is None:
+            return options.get('skip_archived', bool(options.get('download_archive')))
+        return skip_archived
+    
+    def _skipped_result(self, key, callback=None):
+        result = {
+            'status': 'skipped',
+            'key': ' '.join(key),
+            'message': 'Already downloaded'
+        }
+        if callback:
+            callback(result)
+        return result
+    
     def get_queue_length(self):
         """Возвращает длину очереди"""
         return len(self.queue)
@@ -55,14 +187,43 @@ class VideoDownloader:
         return True
     
     def stop_download(self):
-        """Останавливает текущую загрузку"""
+        """Останавливает все загрузки: активные прерываются на следующем чанке"""
         self._stop_flag = True
         return True
     
-    def _get_ydl_opts(self, url, format_type):
+    def cancel(self, job_id):
+        """Отменяет одну задачу: в очереди она не начнется, активная прервется на следующем чанке"""
+        with self._lock:
+            self._cancelled.add(job_id)
+        return True
+    
+    def cancel_url(self, url):
+        """Отменяет текущую загрузку URL"""
+        with self._lock:
+            job_id = self.current_downloads.get(url, {}).get('job_id')
+        return self.cancel(job_id) if job_id is not None else False
+    
+    def _is_cancelled(self, job_id):
+        return self._stop_event.is_set() or job_id in self._cancelled
+    
+    def _cleanup_partial(self, paths, options):
+        """Удаляет файлы отмененной задачи, если options['partial_files'] == 'delete'.
+        По умолчанию ('keep') .part остается и докачивается при следующем запуске"""
+        if options.get('partial_files', 'keep') != 'delete':
+            return
+        for path in paths:
+            # Вместе с .part сегментной загрузки удаляются и ее смещения
+            for name in (path, path + SEGMENTS_CONTROL_SUFFIX):
+                try:
+                    os.remove(name)
+                except OSError:
+                    pass
+    
+    def _get_ydl_opts(self, url, format_type, options=None, job_id=None):
         """Возвращает опции для yt-dlp"""
+        options = self.options if options is None else options
         output_template = os.path.join(
-            self.options.get('output_dir', self.download_dir),
+            options.get('output_dir', self.download_dir),
             '%(title)s.%(ext)s'
         )
         
@@ -71,7 +232,11 @@ class VideoDownloader:
             'outtmpl': output_template,
             'quiet': True,
             'no_warnings': False,
-            'progress_hooks': [self._progress_hook],
+            'progress_hooks': [partial(self._progress_hook, job_id)],
+            # Время склейки и постобработки yt-dlp для метрик задачи и оценки склеек
+            'postprocessor_hooks': [partial(self._postprocessor_hook, job_id, {})],
+            # Докачиваем .part файлы, оставшиеся от прерванных загрузок
+            'continuedl': True,
         }
         
         # Настройки формата
@@ -85,80 +250,315 @@ class VideoDownloader:
                 }],
             })
         else:
-            # Для видео определяем качество
-            quality_map = {
-                '2160p': 'bestvideo[height<=2160]+bestaudio/best[height<=2160]',
-                '1440p': 'bestvideo[height<=1440]+bestaudio/best[height<=1440]',
-                '1080p': 'bestvideo[height<=1080]+bestaudio/best[height<=1080]',
-                '720p': 'bestvideo[height<=720]+bestaudio/best[height<=720]',
-                '480p': 'bestvideo[height<=480]+bestaudio/best[height<=480]',
-                '360p': 'bestvideo[height<=360]+bestaudio/best[height<=360]',
-                '240p': 'bestvideo[height<=240]+bestaudio/best[height<=240]',
-                '144p': 'bestvideo[height<=144]+bestaudio/best[height<=144]',
-            }
-            
-            quality = self.options.get('quality', '1080p')
-            format_string = quality_map.get(quality, 'bestvideo+bestaudio/best')
-            
-            if format_type == 'video_only':
-                format_string = format_string.replace('+bestaudio', '')
-            
-            ydl_opts['format'] = format_string
+            # Формат подбирается по пресету: высота, частота кадров, битрейт и размер файла
+            preset = get_preset(options.get('quality', '1080p'))
+            ydl_opts['format'] = FormatSelector(preset, format_type, options.get('prefer_muxed', True))
         
         # Дополнительные опции
-        if self.options.get('watermark', False):
+        if options.get('watermark', False):
             # Попытка удалить водяные знаки (если поддерживается платформой)
             ydl_opts['postprocessors'] = ydl_opts.get('postprocessors', []) + [{
                 'key': 'ExecAfterDownload',
                 'exec_cmd': f'ffmpeg -i "%(filepath)q" -c copy -map 0 -y "%(filepath)q"',
             }]
         
+        # ffmpeg выполняется отдельной стадией, а не в потоке загрузки
+        if options.get('postprocess_workers'):
+            ydl_opts.pop('postprocessors', None)
+        
         # Настройки VPN (если нужно)
-        if self.options.get('vpn', False):
+        if options.get('vpn', False):
             # Здесь можно добавить прокси-настройки
             # ydl_opts['proxy'] = 'http://your-vpn-proxy:port'
             pass
         
         return ydl_opts
     
-    def _progress_hook(self, d):
-        """Хук для отслеживания прогресса загрузки"""
+    def _progress_hook(self, job_id, d):
+        """Хук для отслеживания прогресса загрузки: сырые числа по id задачи"""
+        if job_id is None:
+            return
+        job_metrics = self._job_metrics.get(job_id)
+        if job_metrics is not None:
+            job_metrics.on_progress(d)
+        
         if d['status'] == 'downloading':
-            url = d.get('info_dict', {}).get('webpage_url', 'unknown')
-            if url in self.current_downloads:
-                self.current_downloads[url]['progress'] = d.get('_percent_str', '0%')
-                self.current_downloads[url]['speed'] = d.get('_speed_str', 'N/A')
-                self.current_downloads[url]['eta'] = d.get('_eta_str', 'N/A')
+            self._pace(job_id, d)
+            if d.get('tmpfilename'):
+                with self._lock:
+                    self._job_files.setdefault(job_id, set()).add(d['tmpfilename'])
+            self.progress.update(job_id,
+                downloaded_bytes=d.get('downloaded_bytes') or 0,
+                total_bytes=d.get('total_bytes') or d.get('total_bytes_estimate'),
+                speed=d.get('speed'),
+                eta=d.get('eta'),
+                filename=d.get('filename')
+            )
         
         elif d['status'] == 'finished':
-            url = d.get('info_dict', {}).get('webpage_url', 'unknown')
-            if url in self.current_downloads:
-                self.current_downloads[url]['progress'] = '100%'
-                self.current_downloads[url]['status'] = 'processing'
+            if d.get('filename'):
+                with self._lock:
+                    self._job_files.setdefault(job_id, set()).add(d['filename'])
+            total = d.get('total_bytes') or d.get('downloaded_bytes')
+            self.progress.update(job_id,
+                status='processing',
+                downloaded_bytes=total or 0,
+                total_bytes=total,
+                speed=None,
+                eta=None,
+                filename=d.get('filename')
+            )
+    
+    def _pace(self, job_id, d):
+        """Выдерживает лимит полосы задачи и прерывает отмененную загрузку"""
+        delay = self.bandwidth.pace(job_id, d.get('downloaded_bytes') or 0, d.get('speed'))
+        while delay > 0 and not self._is_cancelled(job_id):
+            time.sleep(min(delay, PACE_SLICE))
+            delay = self.bandwidth.pace(job_id, d.get('downloaded_bytes') or 0)
+        if self._is_cancelled(job_id):
+            from yt_dlp.utils import DownloadCancelled
+            
+            # Исключение из хука прерывает загрузку и закрывает соединение
+            raise DownloadCancelled('Download cancelled')
+    
+    def _postprocessor_hook(self, job_id, timer, d):
+        """Засекает постпроцессоры yt-dlp: склейка (FFmpegMerger) идет в фазу merge
+        и в статистику склеек, остальные — в фазу postprocess"""
+        name = d.get('postprocessor')
+        if d['status'] == 'started':
+            timer[name] = time.time()
+            return
+        if d['status'] != 'finished' or name not in timer:
+            return
+        seconds = time.time() - timer.pop(name)
+        job_metrics = self._job_metrics.get(job_id)
+        if job_metrics is not None:
+            job_metrics.add('merge' if name == 'Merger' else 'postprocess', seconds)
+        if name == 'Merger':
+            path = (d.get('info_dict') or {}).get('filepath')
+            if path and os.path.exists(path):
+                merge_costs.record(seconds, os.path.getsize(path))
+    
+    def _journal_hook(self, job_id, d):
+        """Записывает в журнал переход к постобработке"""
+        if d['status'] == 'finished':
+            self._set_job_state(job_id, POSTPROCESSING)
     
-    def download(self, url, callback=None):
-        """Загружает видео/аудио"""
+    def _set_job_state(self, job_id, state, **fields):
+        if self.journal and job_id is not None:
+            self.journal.set_state(job_id, state, **fields)
+    
+    def resolve(self, url, options=None, skip_archived=None):
+        """Получает метаданные без загрузки медиа (первая стадия конвейера)"""
         if self._stop_flag:
             return {'status': 'cancelled', 'message': 'Download cancelled'}
         
         try:
-            format_type = self.options.get('format', 'video+audio')
-            ydl_opts = self._get_ydl_opts(url, format_type)
+            options = self.options if options is None else options
+            archive = None
+            if self._should_skip_archived(options, skip_archived):
+                archive = self._get_archive(options)
+                url = self.canonicalize(url) or url
+                key = get_video_key(url)
+                if key and key in archive:
+                    return self._skipped_result(key)
             
-            # Инициализируем информацию о загрузке
-            self.current_downloads[url] = {
-                'status': 'downloading',
-                'progress': '0%',
-                'speed': 'N/A',
-                'eta': 'N/A',
-                'start_time': datetime.now()
+            ydl_opts = self._get_ydl_opts(url, options.get('format', 'video+audio'), options)
+            with self.ydl_pool.lease(ydl_opts) as ydl:
+                profile = self.profiler.start_thread() if self.profiler else None
+                try:
+                    info, _ = self._extract_info(ydl, url, options=options)
+                finally:
+                    if profile:
+                        self.profiler.finish(profile)
+            
+            key = make_archive_key(info)
+            if archive is not None and key and key in archive:
+                return self._skipped_result(key)
+            return {
+                'status': 'resolved',
+                'info': info,
+                'title': info.get('title', 'Unknown'),
+                'duration': info.get('duration', 0),
             }
+        except Exception as e:
+            return self._error_result(e)
+    
+    def expand(self, url, options=None, depth=0, stop=None):
+        """Генератор URL для загрузки: записи плейлиста или канала берутся flat-извлечением
+        и отдаются по мере прихода страниц. Если пробный запрос показал одно видео,
+        отдается (url, info): задача не вызывает экстрактор второй раз.
+        stop — событие остановки раскрытия (закрытый UrlFeed)"""
+        if self._return_type(url) not in ('playlist', 'any'):
+            yield url
+            return
+        
+        from yt_dlp.utils import PagedList
+        
+        options = self.options if options is None else options
+        ydl_opts = self._get_ydl_opts(url, options.get('format', 'video+audio'), options)
+        # Записи плейлиста не извлекаются: от них нужны только URL
+        ydl_opts['extract_flat'] = 'in_playlist'
+        plugins = self.plugin_manager or get_plugin_manager()
+        with self.ydl_pool.lease(ydl_opts) as ydl:
+            # Пробный запрос тоже тратит бюджет хоста, как задачи в пуле
+            self._wait_for_host(url, plugins, stop)
+            started = time.time()
+            try:
+                info = ydl.extract_info(url, download=False, process=False)
+            finally:
+                plugins.release(url)
+            kind = info.get('_type', 'video')
+            if kind == 'video':
+                info['__extract_seconds'] = time.time() - started
+                yield url, info
+                return
+            if kind in ('playlist', 'multi_video'):
+                entries = info.get('entries') or ()
+                if isinstance(entries, PagedList):
+                    # Страницы по требованию, а не весь список сразу
+                    entries = entries._getslice(0, None)
+                for entry in entries:
+                    entry_url = self._entry_url(entry)
+                    if entry_url is None:
+                        continue
+                    if depth < MAX_EXPAND_DEPTH and self._return_type(entry_url) == 'playlist':
+                        yield from self.expand(entry_url, options, depth + 1, stop)
+                    else:
+                        yield entry_url
+                return
+        
+        # Ссылка ведет на другую страницу (например, канал на вкладку с видео)
+        target = self._entry_url(info)
+        if target and target != url and depth < MAX_EXPAND_DEPTH:
+            yield from self.expand(target, options, depth + 1, stop)
+        else:
+            yield target or url
+    
+    def _wait_for_host(self, url, plugins, stop=None):
+        """Ждет слот и токен хоста для запроса вне пула задач (раскрытие в фоне).
+        FeedClosed — раскрытие остановлено, пока хост был занят"""
+        while not plugins.try_acquire(url):
+            if self._stop_flag or (stop is not None and stop.is_set()):
+                raise FeedClosed(url)
+            self._stop_event.wait(plugins.get_delay(url) or FEED_POLL)
+    
+    def _return_type(self, url):
+        return get_return_type(url, tuple(self.ydl_pool.extractors))
+    
+    def _entry_url(self, entry):
+        if not entry:
+            return None
+        for key in ('url', 'webpage_url'):
+            if entry.get(key) and self._validate_url(entry[key]):
+                return entry[key]
+        return None
+    
+    def feed(self, urls, options=None):
+        """UrlFeed над urls: плейлисты и каналы раскрываются в фоновом потоке"""
+        stop = threading.Event()
+        return UrlFeed(urls, partial(self.expand, options=options, stop=stop), stop=stop)
+    
+    def _error_result(self, e):
+        """Превращает исключение в результат загрузки с понятным сообщением"""
+        from yt_dlp.utils import DownloadCancelled, DownloadError
+        
+        if isinstance(e, DownloadCancelled):
+            return {'status': 'cancelled', 'message': 'Download cancelled', 'error_class': 'cancelled'}
+        
+        error_msg = str(e)
+        # Класс ошибки для отчетов: причина или тип исходного исключения
+        error_class = type(e).__name__
+        if isinstance(e, DownloadError):
+            if e.exc_info and e.exc_info[1] is not None:
+                error_class = type(e.exc_info[1]).__name__
+            if 'Private video' in error_msg:
+                error_msg, error_class = 'Video is private', 'private'
+            elif ' unavailable' in error_msg:
+                error_msg, error_class = 'Video is unavailable', 'unavailable'
+            elif 'Sign in' in error_msg:
+                error_msg, error_class = 'Authentication required', 'auth_required'
+        
+        return {
+            'status': 'error',
+            'message': f'Download failed: {error_msg}',
+            'error_class': error_class
+        }
+    
+    def download(self, url, callback=None, options=None, info=None, job_id=None, skip_archived=None,
+                 defer_postprocess=False):
+        """Загружает видео/аудио (options переопределяют self.options для этого вызова,
+        info — уже полученные метаданные, тогда экстрактор не вызывается,
+        job_id — задача в журнале, skip_archived — пропускать видео из архива).
+        
+        С options['postprocess_workers'] ffmpeg работает в отдельном пуле процессов;
+        defer_postprocess=True возвращает результат со статусом 'postprocessing'
+        и future в 'postprocess', не дожидаясь ffmpeg.
+        """
+        if job_id is None:
+            job_id = next(self._job_seq)
+        if self._is_cancelled(job_id):
+            with self._lock:
+                self._cancelled.discard(job_id)
+            return {'status': 'cancelled', 'message': 'Download cancelled'}
+        self.progress.start(job_id, url)
+        
+        result = None
+        archive = None
+        archive_key = None
+        release_key = True
+        source_url = url
+        options = self.options if options is None else options
+        profile = self.profiler.start_job(job_id, options.get('profile', False)) if self.profiler else None
+        # Запросы этого потока (и его сегментов) считаются в статистику задачи
+        connections_stats = self.http_pool.new_stats()
+        previous_stats = self.http_pool.bind(connections_stats)
+        # Фазы, байты и скорость задачи; метки — площадка и пресет качества
+        preset = 'audio' if options.get('format') == 'audio_only' else options.get('quality', '1080p')
+        job_metrics = JobMetrics((self.plugin_manager or get_plugin_manager()).get_host_key(url), preset)
+        with self._lock:
+            self._job_metrics[job_id] = job_metrics
+        if info is not None and info.get('__extract_seconds') is not None:
+            # Метаданные получены заранее стадией конвейера
+            job_metrics.add('extract', info.pop('__extract_seconds'))
+        try:
+            if self._should_skip_archived(options, skip_archived):
+                archive = self._get_archive(options)
+                source_url = self.canonicalize(url) or url
+                key = get_video_key(source_url)
+                if key and not archive.claim(key):
+                    result = self._skipped_result(key, callback)
+                    return result
+                archive_key = key
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                
-                if self._stop_flag:
-                    return {'status': 'cancelled', 'message': 'Download cancelled'}
+            format_type = options.get('format', 'video+audio')
+            ydl_opts = self._get_ydl_opts(url, format_type, options, job_id)
+            if self.journal and job_id is not None:
+                ydl_opts['progress_hooks'].append(partial(self._journal_hook, job_id))
+            
+            # Инициализируем информацию о загрузке
+            with self._lock:
+                self.current_downloads[url] = {
+                    'job_id': job_id,
+                    'status': 'downloading',
+                    'start_time': datetime.now()
+                }
+            
+            transfer = None
+            connections = self._get_segment_connections(url, options)
+            if options.get('postprocess_workers'):
+                transfer = partial(self._transfer_for_postprocess, format_type=format_type, options=options,
+                                   connections=connections, hooks=ydl_opts['progress_hooks'])
+            elif connections:
+                transfer = partial(self._transfer_segmented, connections=connections,
+                                   hooks=ydl_opts['progress_hooks'])
+            
+            with self.ydl_pool.lease(ydl_opts) as ydl:
+                self.bandwidth.attach(job_id, options.get('priority', INTERACTIVE))
+                info = self._extract_and_download(ydl, source_url, info, archive, transfer, job_metrics, options)
+                if info is None:
+                    result = self._skipped_result(archive_key or ('', source_url), callback)
+                    return result
                 
                 # Получаем путь к скачанному файлу
                 downloaded_file = ydl.prepare_filename(info)
@@ -173,38 +573,41 @@ class VideoDownloader:
                     'title': info.get('title', 'Unknown'),
                     'duration': info.get('duration', 0),
                     'format': format_type,
-                    'message': 'Download completed successfully'
+                    'message': 'Download completed successfully',
+                    'connections': connections_stats
                 }
+                skipped = info.get('__merge_skipped')
+                if skipped:
+                    # Выбран готовый файл со звуком: склейка пары дорожек не понадобилась
+                    result['merge_saved'] = dict(merge_costs.estimate(skipped.get('filesize')),
+                                                 format_id=skipped['format_id'])
                 
-                if callback:
-                    callback(result)
-                
-                return result
+            steps = info.get('__postprocess_steps')
+            if steps:
+                # Время ffmpeg-стадии добавит _apply_postprocess
+                job_metrics.finish()
+                result['metrics'] = job_metrics.snapshot()
+                # Отдаем файлы ffmpeg-стадии; при заполненной очереди здесь срабатывает backpressure
+                future = self._get_postprocess_stage(options).submit(steps)
+                if archive is not None:
+                    key = make_archive_key(info) or archive_key or ('url', source_url)
+                    future.add_done_callback(partial(self._archive_after_postprocess, archive, key, archive_key))
+                    release_key = False
                 
-        except yt_dlp.utils.DownloadError as e:
-            error_msg = str(e)
-            if 'Private video' in error_msg:
-                error_msg = 'Video is private'
-            elif ' unavailable' in error_msg:
-                error_msg = 'Video is unavailable'
-            elif 'Sign in' in error_msg:
-                error_msg = 'Authentication required'
-            
-            result = {
-                'status': 'error',
-                'message': f'Download failed: {error_msg}'
-            }
+                result.update({'status': 'postprocessing', 'postprocess': future})
+                if defer_postprocess:
+                    return result
+                result = self._apply_postprocess(result)
+            elif archive is not None:
+                archive.add(make_archive_key(info) or archive_key or ('url', source_url))
             
             if callback:
                 callback(result)
             
             return result
-            
+                
         except Exception as e:
-            result = {
-                'status': 'error',
-                'message': f'Download failed: {str(e)}'
-            }
+            result = self._error_result(e)
             
             if callback:
                 callback(result)
@@ -212,52 +615,542 @@ class VideoDownloader:
             return result
         
         finally:
+            self.http_pool.bind(previous_stats)
+            if profile is not None:
+                profile_files = self.profiler.finish(profile)
+                if profile_files and result is not None:
+                    result['profile'] = profile_files
             # Удаляем из текущих загрузок
-            if url in self.current_downloads:
-                del self.current_downloads[url]
+            with self._lock:
+                self._job_metrics.pop(job_id, None)
+                self.current_downloads.pop(url, None)
+                self._cancelled.discard(job_id)
+                files = self._job_files.pop(job_id, ())
+            self.bandwidth.detach(job_id)
+            if archive is not None and archive_key and release_key:
+                archive.release(archive_key)
+            status = result['status'] if result else 'cancelled'
+            if result is not None and 'metrics' not in result:
+                job_metrics.finish()
+                result['metrics'] = job_metrics.snapshot()
+            if status != 'postprocessing':
+                # Отложенную постобработку учитывает download_all после ffmpeg
+                self.metrics.observe(result['metrics'] if result else job_metrics.snapshot(), status)
+            if status == 'cancelled':
+                self._cleanup_partial(files, options)
+            self.progress.update(job_id, connections=dict(connections_stats),
+                                 merge_saved=result.get('merge_saved') if result else None)
+            if status == 'postprocessing':
+                self.progress.update(job_id, status=status)
+            else:
+                self.progress.finish(job_id, status)
     
-    def download_all(self, callback=None):
-        """Загружает все видео в очереди"""
-        self.is_downloading = True
-        self._stop_flag = False
+    def _get_metadata_cache(self, options=None):
+        """Возвращает кэш метаданных (None, если он отключен в опциях)"""
+        options = self.options if options is None else options
+        if not options.get('metadata_cache', True):
+            return None
+        path = options.get('metadata_cache_path') or os.path.join(os.getcwd(), 'data', 'cache', 'metadata.sqlite')
+        with self._lock:
+            if path not in self._metadata_caches:
+                self._metadata_caches[path] = MetadataCache(path)
+            return self._metadata_caches[path]
+    
+    def _extract_info(self, ydl, url, job_metrics=None, options=None):
+        """Берет свежие метаданные из кэша или у экстрактора; второй элемент — признак кэша.
+        Время экстрактора идет в job_metrics, а без задачи (конвейер) — в '__extract_seconds'"""
+        cache = self._get_metadata_cache(options)
+        cached = cache.get(url) if cache else None
+        if cached is not None:
+            return cached, True
         
-        results = {}
-        total = len(self.queue)
+        started = time.time()
+        info = ydl.extract_info(url, download=False)
+        if job_metrics is not None:
+            job_metrics.add('extract', time.time() - started)
+        if cache:
+            platform = (self.plugin_manager or get_plugin_manager()).get_host_key(url)
+            cache.set(url, ydl.sanitize_info(info), platform)
+        if job_metrics is None:
+            info['__extract_seconds'] = time.time() - started
+        return info, False
+    
+    def _extract_and_download(self, ydl, url, info=None, archive=None, transfer=None, job_metrics=None,
+                              options=None):
+        """Скачивает медиа по готовым или только что полученным метаданным.
+        Возвращает None, если видео уже есть в архиве"""
+        from yt_dlp.utils import DownloadError
         
-        for i, url in enumerate(self.queue):
-            if self._stop_flag:
-                break
-                
-            if callback:
-                callback('progress', i, total, url)
-            
-            result = self.download(url, 
-                lambda res: callback('item_progress', i, total, url, res) if callback else None
+        if transfer is None:
+            transfer = lambda ydl, info: ydl.process_ie_result(info, download=True)
+        reused = info is not None
+        if info is None:
+            info, reused = self._extract_info(ydl, url, job_metrics, options)
+        
+        key = make_archive_key(info)
+        if archive is not None and key and key in archive:
+            return None
+        
+        if reused:
+            try:
+                return transfer(ydl, info)
+            except DownloadError:
+                # Ссылки на медиа протухли, пока метаданные лежали в кэше или очереди
+                cache = self._get_metadata_cache(options)
+                if cache:
+                    cache.invalidate(url)
+                if job_metrics is not None:
+                    job_metrics.retry()
+                info, _ = self._extract_info(ydl, url, job_metrics, options)
+        
+        return transfer(ydl, info)
+    
+    def _get_segment_connections(self, url, options):
+        """Число соединений на файл: options['segments'] или значение плагина (None — обычный загрузчик)"""
+        if 'segments' in options:
+            return options['segments'] or None
+        plugin = (self.plugin_manager or get_plugin_manager()).get_plugin_for_url(url)
+        return plugin.segments if plugin else None
+    
+    def _get_segmented(self, connections):
+        with self._lock:
+            if connections not in self._segmented:
+                self._segmented[connections] = SegmentedDownloader(connections)
+            return self._segmented[connections]
+    
+    def _download_segmented(self, ydl, path, info, connections, hooks):
+        """Качает один прогрессивный формат в несколько соединений.
+        False — формат не подходит (не http или без Range), нужен загрузчик yt-dlp"""
+        if not connections or not info.get('url') or info.get('protocol') not in ('http', 'https'):
+            return False
+        headers = dict(info.get('http_headers') or {})
+        cookie = ydl.cookiejar.get_cookie_header(info['url'])
+        if cookie:
+            headers['Cookie'] = cookie
+        try:
+            self._get_segmented(connections).download(
+                info['url'], path, headers, hooks, proxy=ydl.params.get('proxy')
             )
-            
+        except RangeNotSupported:
+            return False
+        return True
+    
+    def _transfer_segmented(self, ydl, info, connections, hooks):
+        """Загрузка одного прогрессивного файла сегментами; склейка дорожек остается за yt-dlp"""
+        info = ydl.process_ie_result(info, download=False)
+        if info.get('requested_formats') or info.get('_type', 'video') != 'video':
+            return ydl.process_ie_result(info, download=True)
+        path = ydl.prepare_filename(info)
+        if not os.path.exists(path) and not self._download_segmented(ydl, path, info, connections, hooks):
+            return ydl.process_ie_result(info, download=True)
+        # Постпроцессоры yt-dlp (извлечение звука, водяные знаки) запускаются как обычно
+        return ydl.post_process(path, info)
+    
+    def _transfer_for_postprocess(self, ydl, info, format_type, options, connections=None, hooks=()):
+        """Скачивает медиа без ffmpeg и описывает шаги постобработки в '__postprocess_steps'"""
+        from yt_dlp.utils import DownloadError
+        
+        # Форматы выбираем заново: метаданные могли быть получены с другим качеством
+        info = ydl.process_ie_result(info, download=False)
+        path = ydl.prepare_filename(info)
+        steps = []
+        
+        requested = info.get('requested_formats')
+        if requested:
+            # Дорожки качаются по отдельности, склейка уходит в пул процессов
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            base = os.path.splitext(path)[0]
+            inputs = []
+            for fmt in requested:
+                part = f"{base}.f{fmt['format_id']}.{fmt['ext']}"
+                part_info = dict(info)
+                part_info.pop('requested_formats', None)
+                part_info.update(fmt)
+                if (not self._download_segmented(ydl, part, part_info, connections, hooks)
+                        and not ydl.dl(part, part_info)):
+                    raise DownloadError(f"Failed to download format {fmt['format_id']}")
+                inputs.append(part)
+            steps.append({'op': 'merge', 'inputs': inputs, 'output': path})
+        elif not self._download_segmented(ydl, path, info, connections, hooks):
+            info = ydl.process_ie_result(info, download=True)
+            path = ydl.prepare_filename(info)
+        
+        if format_type == 'audio_only':
+            audio_path = os.path.splitext(path)[0] + '.mp3'
+            steps.append({'op': 'extract_audio', 'input': path, 'output': audio_path, 'quality': '192'})
+            path = audio_path
+        
+        if options.get('watermark', False):
+            steps.append({'op': 'remux', 'input': path})
+        
+        info = dict(info)
+        info['__postprocess_steps'] = steps
+        return info
+    
+    def _get_postprocess_stage(self, options):
+        """Возвращает пул процессов постобработки"""
+        with self._lock:
+            if self.postprocess_stage is None:
+                self.postprocess_stage = PostprocessStage(
+                    workers=options.get('postprocess_workers'),
+                    queue_size=options.get('postprocess_queue_size')
+                )
+            return self.postprocess_stage
+    
+    def _apply_postprocess(self, result):
+        """Дожидается ffmpeg-стадии и дополняет результат загрузки"""
+        result = dict(result)
+        future = result.pop('postprocess')
+        try:
+            processed = future.result()
+        except Exception as e:
+            processed = {'status': 'error', 'message': f'Postprocessing failed: {str(e)}'}
+        
+        if processed['status'] != 'success':
+            return {'status': 'error', 'message': processed['message'], 'error_class': 'postprocess',
+                    'metrics': result.get('metrics')}
+        
+        result.update({
+            'status': 'success',
+            'path': processed['path'],
+            'postprocess_timings': processed.get('timings', {}),
+        })
+        if 'merge' in processed.get('timings', {}):
+            merge_costs.record(processed['timings']['merge'], processed.get('merged_bytes'),
+                               processed.get('cpu_timings', {}).get('merge'))
+        if result.get('metrics'):
+            timings = result['metrics']['timings']
+            for op, seconds in processed.get('timings', {}).items():
+                phase = 'merge' if op == 'merge' else 'postprocess'
+                timings[phase] = round(timings.get(phase, 0) + seconds, 3)
+        return result
+    
+    def _archive_after_postprocess(self, archive, key, claimed_key, future):
+        try:
+            if future.result()['status'] == 'success':
+                archive.add(key)
+        except Exception:
+            pass
+        finally:
+            if claimed_key:
+                archive.release(claimed_key)
+    
+    def download_all(self, callback=None, max_workers=None, pipeline=None, skip_archived=None):
+        """Загружает все видео в очереди пулом рабочих потоков (обертка над download_iter).
+        
+        В режиме конвейера (pipeline=True или options['pipeline']) отдельные потоки
+        заранее получают метаданные, а потоки загрузки только передают байты.
+        С skip_archived уже скачанные видео (в том числе дубли в очереди) пропускаются.
+        """
+        notify = self._make_notifier(callback)
+        results = {}
+        queue = list(self.queue)
+        source = self.feed(queue) if self.options.get('expand_playlists', True) else queue
+        for _, url, result in self.download_iter(source, callback, max_workers, pipeline, skip_archived,
+                                                 expand=False):
             results[url] = result
-            
-            if callback:
-                callback('item_complete', i, total, url, result)
         
-        self.is_downloading = False
-        self.queue = []  # Очищаем очередь после загрузки
+        expanded = source.expanded if isinstance(source, UrlFeed) else set()
+        statuses = {url: result.get('status') for url, result in results.items()}
+        self.queue = self.unfinished(queue, statuses, expanded)
         
-        if callback:
-            callback('complete', results)
+        notify('complete', results)
         
         return results
     
+    def unfinished(self, queue, statuses, expanded=()):
+        """URL партии, которые должны остаться в очереди: неудачные и не начатые
+        (или остановленные общим стопом). statuses — статус итога по URL.
+        Раскрытый плейлист заменяется своими записями, которые не завершились"""
+        finished = ('success', 'skipped') if self._stop_flag else ('success', 'skipped', 'cancelled')
+        for url in expanded:
+            if self.journal:
+                self._set_job_state(self.journal.ensure(url), DONE)
+        remaining = [url for url in queue if url not in expanded and statuses.get(url) not in finished]
+        queued = set(queue)
+        remaining += [url for url, status in statuses.items() if url not in queued and status not in finished]
+        return remaining
+    
+    def download_iter(self, urls, callback=None, max_workers=None, pipeline=None, skip_archived=None,
+                      window=None, expand=None):
+        """Генератор (индекс, url, результат) в порядке завершения задач.
+        
+        urls может быть ленивым (строки файла): из него читается не больше
+        window URL сверх уже запущенных (по умолчанию options['window'] или
+        4 × число потоков), а результаты не накапливаются, поэтому память не
+        зависит от размера партии. Некорректные URL сразу отдаются с ошибкой.
+        Если перестать читать генератор (break, close), загрузки останавливаются.
+        
+        С expand (по умолчанию options['expand_playlists'], включено) плейлисты
+        и каналы раскрываются в фоне: первые записи качаются, пока идет пагинация.
+        """
+        workers = max(1, int(max_workers or self.options.get('max_workers', self.max_workers)))
+        if pipeline is None:
+            pipeline = self.options.get('pipeline', False)
+        resolve_workers = max(1, int(self.options.get('resolve_workers', workers)))
+        # Размер буфера готовых метаданных между стадиями
+        prefetch = max(1, int(self.options.get('prefetch', workers * 2)))
+        window = max(workers, int(window or self.options.get('window', workers * 4)))
+        plugins = self.plugin_manager or get_plugin_manager()
+        self.is_downloading = True
+        self._stop_flag = False
+        notify = self._make_notifier(callback)
+        
+        # total в событиях — число исходных URL; записей раскрытых плейлистов может быть больше
+        total = len(urls) if hasattr(urls, '__len__') else getattr(urls, 'total', None)
+        if expand is None:
+            expand = self.options.get('expand_playlists', True)
+        if expand and not isinstance(urls, UrlFeed):
+            urls = self.feed(urls)
+        source = iter(urls)
+        counter = itertools.count()
+        exhausted = False
+        # Источник пока пуст, но раскрытие плейлиста еще идет
+        waiting = False
+        # id задачи: из журнала, если он включен, иначе внутренний счетчик; только для задач в работе
+        job_ids = {}
+        # id журнала, занятые незавершенными задачами партии, по URL: дубли получают разные задачи
+        claimed = {}
+        pending = deque()
+        resolving = {}
+        ready = deque()
+        running = {}
+        # ffmpeg-задачи не занимают слот загрузки
+        postprocessing = {}
+        
+        resolver_pool = ThreadPoolExecutor(max_workers=resolve_workers, thread_name_prefix='resolve') if pipeline else None
+        transfer_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='download')
+        profiler = self.profiler
+        batch_profile = profiler.start_batch() if profiler else None
+        
+        try:
+            while True:
+                # Подчитываем URL из источника, пока окно задач не заполнено
+                waiting = False
+                while not exhausted and not self._stop_flag and \
+                        len(pending) + len(resolving) + len(ready) + len(running) + len(postprocessing) < window:
+                    try:
+                        item = next(source)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if item is None:
+                        waiting = True
+                        break
+                    if isinstance(item, ExpandError):
+                        # Плейлист не раскрылся: ошибка уходит итогом исходного URL
+                        i, url = next(counter), item.url
+                        result = self._error_result(item.error)
+                        job_id = self.journal.ensure(url, claimed.get(url, ())) if self.journal else next(self._job_seq)
+                        self._finish_job(job_id, result, url)
+                        notify('item_complete', i, total, url, result)
+                        yield i, url, result
+                        continue
+                    url, info = (item, None) if isinstance(item, str) else item
+                    i = next(counter)
+                    if not self._validate_url(url):
+                        result = {'status': 'error', 'message': 'Invalid URL', 'error_class': 'invalid_url'}
+                        notify('item_complete', i, total, url, result)
+                        yield i, url, result
+                        continue
+                    if self.journal:
+                        job_ids[i] = self.journal.ensure(url, claimed.get(url, ()))
+                        claimed.setdefault(url, []).append(job_ids[i])
+                    else:
+                        job_ids[i] = next(self._job_seq)
+                    pending.append((i, url, info))
+                
+                # Заполняем свободные слоты, пока не нажат стоп.
+                # Хост без свободного бюджета не блокирует остальные
+                delay = None
+                while pending and not self._stop_flag:
+                    if pipeline:
+                        if len(resolving) >= resolve_workers or len(resolving) + len(ready) >= prefetch:
+                            break
+                    elif len(running) + len(ready) >= workers:
+                        break
+                    item, delay = self._next_ready_item(pending, plugins)
+                    if item is None:
+                        break
+                    i, url, info = item
+                    notify('progress', i, total, url)
+                    if pipeline and info is None:
+                        self._set_job_state(job_ids[i], RESOLVING)
+                        resolving[resolver_pool.submit(self.resolve, url, skip_archived=skip_archived)] = (i, url)
+                    else:
+                        if pipeline:
+                            # Метаданные уже получены при раскрытии: слот хоста нужен только resolve
+                            plugins.release(url)
+                        ready.append(item)
+                
+                while ready and len(running) < workers and not self._stop_flag:
+                    i, url, info = ready.popleft()
+                    self._set_job_state(job_ids[i], DOWNLOADING)
+                    future = transfer_pool.submit(self.download, url,
+                        lambda res, i=i, url=url: notify('item_progress', i, total, url, res),
+                        info=info, job_id=job_ids[i], skip_archived=skip_archived,
+                        defer_postprocess=True
+                    )
+                    running[future] = (i, url)
+                
+                if not resolving and not running and not postprocessing:
+                    if pending and not self._stop_flag:
+                        # Все хосты исчерпали бюджет (токены или слоты других загрузчиков)
+                        self._stop_event.wait(delay or 0.1)
+                        continue
+                    if not exhausted and not self._stop_flag:
+                        if waiting:
+                            self._stop_event.wait(FEED_POLL)
+                        continue
+                    break
+                
+                # Отдаем результаты по мере готовности, а не в конце
+                if waiting and not delay:
+                    delay = FEED_POLL
+                done, _ = wait(list(resolving) + list(running) + list(postprocessing),
+                               timeout=delay or None, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in postprocessing:
+                        i, url, result = postprocessing.pop(future)
+                        result = self._apply_postprocess(result)
+                        self.metrics.observe(result.get('metrics'), result['status'])
+                        self.progress.finish(job_ids[i], result['status'])
+                        notify('item_progress', i, total, url, result)
+                    elif future in resolving:
+                        # Бюджет хоста нужен только на время работы экстрактора
+                        i, url = resolving.pop(future)
+                        plugins.release(url)
+                        result = self._future_result(future)
+                        if result['status'] == 'resolved':
+                            ready.append((i, url, result['info']))
+                            continue
+                    else:
+                        i, url = running.pop(future)
+                        if not pipeline:
+                            plugins.release(url)
+                        result = self._future_result(future)
+                        if result['status'] == 'postprocessing':
+                            postprocessing[result['postprocess']] = (i, url, result)
+                            continue
+                    
+                    # Недоступные и приватные видео отсеиваются, не занимая слот загрузки
+                    job_id = job_ids.pop(i)
+                    self._finish_job(job_id, result, url)
+                    if url in claimed:
+                        claimed[url].remove(job_id)
+                        if not claimed[url]:
+                            del claimed[url]
+                    notify('item_complete', i, total, url, result)
+                    yield i, url, result
+        except BaseException:
+            # Генератор закрыт (break, close) или упал потребитель: остальные загрузки прерываются
+            self._stop_flag = True
+            raise
+        finally:
+            if isinstance(urls, UrlFeed):
+                urls.close()
+            transfer_pool.shutdown(wait=True)
+            if resolver_pool:
+                resolver_pool.shutdown(wait=True)
+            # Задачи, брошенные при закрытии генератора, возвращают занятые слоты хостов.
+            # В режиме конвейера слот держит только стадия resolve
+            held = list(resolving.values())
+            if not pipeline:
+                held += [(i, url) for i, url, _ in ready] + list(running.values())
+            for _, url in held:
+                plugins.release(url)
+            if batch_profile is not None:
+                profiler.finish_batch(batch_profile)
+            self.is_downloading = False
+    
+    def _finish_job(self, job_id, result, url=None):
+        """Фиксирует итог задачи в журнале и строкой отчета"""
+        if self.reports and url is not None:
+            try:
+                platform = (self.plugin_manager or get_plugin_manager()).get_host_key(url)
+                self.reports.add_result(url, result, self.progress.get(job_id), platform, job_id)
+            except Exception as e:
+                # Итог задачи не теряется: ошибка отчета уходит вместе с ним в item_complete
+                result['report_error'] = f'Error writing report: {e}'
+        if result.get('status') in ('success', 'skipped'):
+            self._set_job_state(job_id, DONE, path=result.get('path'))
+        elif result.get('status') == 'cancelled':
+            # Общий стоп оставляет задачу для продолжения, отмена конкретной задачи окончательна
+            self._set_job_state(job_id, PENDING if self._stop_flag else CANCELLED)
+        else:
+            self._set_job_state(job_id, FAILED, message=result.get('message'))
+    
+    def _future_result(self, future):
+        try:
+            return future.result()
+        except Exception as e:
+            return {'status': 'error', 'message': f'Download failed: {str(e)}'}
+    
+    def _next_ready_item(self, pending, plugins):
+        """Достает из очереди первый URL, чей хост укладывается в свой бюджет"""
+        blocked = set()
+        delay = None
+        for item in pending:
+            host = plugins.get_host_key(item[1])
+            if host in blocked:
+                continue
+            if plugins.try_acquire(item[1]):
+                pending.remove(item)
+                return item, None
+            blocked.add(host)
+            wait_time = plugins.get_delay(item[1])
+            if wait_time and (delay is None or wait_time < delay):
+                delay = wait_time
+        return None, delay
+    
+    def _make_notifier(self, callback):
+        """Сериализует вызовы callback из разных потоков"""
+        def notify(*args):
+            if callback:
+                with self._callback_lock:
+                    callback(*args)
+        return notify
+    
     def get_download_info(self, url):
         """Возвращает информацию о текущей загрузке"""
-        return self.current_downloads.get(url, {})
+        with self._lock:
+            info = dict(self.current_downloads.get(url, {}))
+        return self._with_progress(info)
     
     def get_all_downloads_info(self):
         """Возвращает информацию о всех текущих загрузках"""
-        return self.current_downloads.copy()
+        with self._lock:
+            downloads = {url: dict(info) for url, info in self.current_downloads.items()}
+        return {url: self._with_progress(info) for url, info in downloads.items()}
+    
+    def _with_progress(self, info):
+        """Дополняет запись текущей загрузки цифрами и строками прогресса"""
+        job = self.progress.get(info['job_id']) if info.get('job_id') is not None else None
+        if not job:
+            return info
+        total = job['total_bytes']
+        percent = job['downloaded_bytes'] * 100 / total if total else 0
+        info.update({
+            'status': job['status'],
+            'downloaded_bytes': job['downloaded_bytes'],
+            'total_bytes': total,
+            'progress': f'{percent:.1f}%',
+            'speed': f"{format_bytes(job['speed'])}/s" if job['speed'] else 'N/A',
+            'eta': format_eta(job['eta']),
+        })
+        return info
 
 # Система плагинов для поддержки разных платформ
 class DownloaderPlugin:
+    # Домены платформы; первый используется как ключ бюджета хоста
+    domains = []
+    # Бюджет хоста: одновременные загрузки и запросы в секунду (None — без ограничений)
+    max_concurrent = None
+    requests_per_second = None
+    burst = 1
+    # Соединений на файл для прогрессивных форматов (None — стандартный загрузчик yt-dlp)
+    segments = None
+    
     def can_handle(self, url):
         raise NotImplementedError
         
@@ -265,39 +1158,111 @@ class DownloaderPlugin:
         raise NotImplementedError
 
 class YouTubePlugin(DownloaderPlugin):
+    domains = ['youtube.com', 'youtu.be']
+    max_concurrent = 4
+    requests_per_second = 2
+    burst = 4
+    
     def can_handle(self, url):
         return any(domain in url for domain in ['youtube.com', 'youtu.be'])
     
     def download(self, url, options):
-        # Используем базовый метод через yt-dlp
-        downloader = VideoDownloader()
-        downloader.set_options(options)
-        return downloader.download(url)
+        # Используем базовый метод через yt-dlp; YoutubeDL берется из общего пула
+        return get_downloader().download(url, options=options)
 
 class VKPlugin(DownloaderPlugin):
+    domains = ['vk.com']
+    max_concurrent = 3
+    requests_per_second = 1
+    burst = 2
+    segments = 4
+    
     def can_handle(self, url):
         return 'vk.com' in url
     
     def download(self, url, options):
         # Базовая реализация для VK
         # В реальном проекте нужно добавить специфичную логику для VK
-        downloader = VideoDownloader()
-        downloader.set_options(options)
-        return downloader.download(url)
+        return get_downloader().download(url, options=options)
+
+class TikTokPlugin(DownloaderPlugin):
+    domains = ['tiktok.com']
+    max_concurrent = 3
+    requests_per_second = 1
+    burst = 3
+    segments = 4
+    
+    def can_handle(self, url):
+        return 'tiktok.com' in url
+    
+    def download(self, url, options):
+        return get_downloader().download(url, options=options)
 
 class PluginManager:
     def __init__(self):
         self.plugins = [
             YouTubePlugin(),
-            VKPlugin()
+            VKPlugin(),
+            TikTokPlugin()
         ]
+        self.limiter = HostLimiter()
     
     def get_plugin_for_url(self, url):
         for plugin in self.plugins:
             if plugin.can_handle(url):
                 return plugin
         return None
+    
+    def get_host_key(self, url):
+        """Возвращает ключ, по которому считается бюджет хоста"""
+        plugin = self.get_plugin_for_url(url)
+        if plugin and plugin.domains:
+            return plugin.domains[0]
+        netloc = urlparse(url).netloc.lower()
+        return netloc[4:] if netloc.startswith('www.') else netloc
+    
+    def try_acquire(self, url):
+        """Занимает слот хоста, если позволяют лимиты плагина"""
+        plugin = self.get_plugin_for_url(url) or DownloaderPlugin
+        return self.limiter.try_acquire(
+            self.get_host_key(url),
+            max_concurrent=plugin.max_concurrent,
+            rate=plugin.requests_per_second,
+            burst=plugin.burst
+        )
+    
+    def release(self, url):
+        self.limiter.release(self.get_host_key(url))
+    
+    def get_delay(self, url):
+        return self.limiter.delay(self.get_host_key(url))
+    
+    def set_limits(self, domain, max_concurrent=None, requests_per_second=None, burst=1):
+        """Переопределяет бюджет хоста во время работы"""
+        self.limiter.configure(domain, max_concurrent, requests_per_second, burst)
+
+# Глобальные экземпляры создаются при первом обращении, а не при импорте модуля
+_instances = {}
+_instances_lock = threading.Lock()
+
+def _get_instance(name, factory):
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = factory()
+        return _instances[name]
+
+def get_downloader():
+    """Глобальный экземпляр загрузчика"""
+    return _get_instance('downloader', VideoDownloader)
+
+def get_plugin_manager():
+    """Глобальный менеджер плагинов"""
+    return _get_instance('plugin_manager', PluginManager)
 
-# Глобальный экземпляр загрузчика
-downloader = VideoDownloader()
-plugin_manager = PluginManager()
\ No newline at end of file
+def __getattr__(name):
+    # Совместимость со старым `from downloader import downloader, plugin_manager`
+    if name == 'downloader':
+        return get_downloader()
+    if name == 'plugin_manager':
+        return get_plugin_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,37 @@
+from collections import deque
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QPlainTextEdit
+
+# Сколько последних строк хранит лог
+LOG_MAX_LINES = 5000
+# Как часто буфер сбрасывается в виджет (мс)
+LOG_FLUSH_INTERVAL = 100
+
+
+class RingLogView(QPlainTextEdit):
+    """Лог с ограниченным числом строк.
+
+    append() совместим с QTextEdit.append, но только кладет строку в буфер:
+    в виджет строки попадают пачкой по таймеру, старые вытесняются.
+    """
+
+    def __init__(self, max_lines=LOG_MAX_LINES, parent=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setMaximumBlockCount(max_lines)
+        self._buffer = deque(maxlen=max_lines)
+        self._timer = QTimer(self)
+        self._timer.setInterval(LOG_FLUSH_INTERVAL)
+        self._timer.timeout.connect(self.flush)
+        self._timer.start()
+
+    def append(self, text):
+        self._buffer.append(text)
+
+    def flush(self):
+        if not self._buffer:
+            return
+        lines = list(self._buffer)
+        self._buffer.clear()
+        self.appendPlainText('\n'.join(lines))
@@ -0,0 +1,112 @@
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+COLUMNS = ('url', 'status', 'progress', 'speed', 'eta', 'path')
+
+STATUS_ICONS = {
+    'queued': '🕒',
+    'downloading': '⏬',
+    'processing': '⚙️',
+    'postprocessing': '⚙️',
+    'success': '✅',
+    'skipped': '⏭',
+    'cancelled': '⏹',
+    'error': '❌',
+}
+
+HEADERS = {
+    'ru': ('URL', 'Статус', 'Прогресс', 'Скорость', 'Осталось', 'Файл'),
+    'en': ('URL', 'Status', 'Progress', 'Speed', 'ETA', 'File'),
+}
+
+
+def format_status(status):
+    return f"{STATUS_ICONS.get(status, '')} {status}".strip()
+
+
+class QueueTableModel(QAbstractTableModel):
+    """Очередь загрузок: одна строка на задачу.
+
+    Изменения копятся в add_job/update_job и применяются разом в flush(),
+    поэтому представление перерисовывается один раз за кадр, а не на каждый URL.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.language = 'ru'
+        self._rows = []
+        self._index = {}
+        self._pending_rows = []
+        self._pending_keys = set()
+        self._pending_updates = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        column = COLUMNS[index.column()]
+        if role == Qt.DisplayRole:
+            return row.get(column, '')
+        if role == Qt.ToolTipRole and column in ('url', 'path'):
+            return row.get(column, '')
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return HEADERS[self.language][section]
+        return None
+
+    def set_language(self, language):
+        self.language = language
+        self.headerDataChanged.emit(Qt.Horizontal, 0, len(COLUMNS) - 1)
+
+    def add_job(self, key, url, status=''):
+        """Добавляет строку (появится после flush)"""
+        if key in self._index or key in self._pending_keys:
+            return
+        self._pending_keys.add(key)
+        self._pending_rows.append({'key': key, 'url': url, 'status': status})
+
+    def update_job(self, key, **fields):
+        """Запоминает изменения строки (применятся при flush)"""
+        self._pending_updates.setdefault(key, {}).update(fields)
+
+    def flush(self):
+        """Применяет накопленные изменения одной пачкой"""
+        if self._pending_rows:
+            start = len(self._rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(self._pending_rows) - 1)
+            for row in self._pending_rows:
+                self._index[row['key']] = len(self._rows)
+                self._rows.append(row)
+            self._pending_rows = []
+            self._pending_keys = set()
+            self.endInsertRows()
+
+        if self._pending_updates:
+            changed = []
+            for key, fields in self._pending_updates.items():
+                position = self._index.get(key)
+                if position is not None:
+                    self._rows[position].update(fields)
+                    changed.append(position)
+            self._pending_updates = {}
+            if changed:
+                self.dataChanged.emit(
+                    self.index(min(changed), 0),
+                    self.index(max(changed), len(COLUMNS) - 1)
+                )
+
+    def clear(self):
+        self.beginResetModel()
+        self._rows = []
+        self._index = {}
+        self._pending_rows = []
+        self._pending_keys = set()
+        self._pending_updates = {}
+        self.endResetModel()
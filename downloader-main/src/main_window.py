@@ -7,128 +7,77 @@ import json
 import time
 import random
 from downloader import VideoDownloader
+from download_queue.manager import DEFAULT_JOURNAL_PATH
+from gui.queue_model import QueueTableModel, format_status
+from gui.log_view import RingLogView
+from utils.progress import format_bytes, format_eta
 
-# Базовый класс VideoDownloader (оставьте как есть)
-class VideoDownloader:
-    def __init__(self):
-        self.queue = []
-        self.download_dir = os.getcwd()
-        self.options = {}
-        
-    def set_download_dir(self, directory):
-        """Устанавливает директорию для сохранения файлов"""
-        self.download_dir = directory
-        if not os.path.exists(directory):
-            os.makedirs(directory)
-    
-    def set_options(self, options):
-        """Устанавливает опции загрузки"""
-        self.options = options
-    
-    def add_to_queue(self, url):
-        """Добавляет URL в очередь загрузки"""
-        self.queue.append(url)
-    
-    def download(self, url):
-        """Имитация загрузки видео"""
-        try:
-            # Имитация процесса загрузки
-            time.sleep(1)
-            
-            # Определяем расширение файла
-            format_ext = {
-                "video+audio": "mp4",
-                "video_only": "mp4",
-                "audio_only": "mp3"
-            }
-            ext = format_ext.get(self.options.get('format', 'video+audio'), 'mp4')
-            
-            # Генерация имени файла
-            filename = f"video_{hash(url) % 10000}.{ext}"
-            filepath = os.path.join(self.download_dir, filename)
-            
-            return {
-                'status': 'success',
-                'path': filepath,
-                'message': 'Download completed successfully'
-            }
-        except Exception as e:
-            return {
-                'status': 'error',
-                'message': f'Download failed: {str(e)}'
-            }
-
-# Базовый класс Reporter (оставьте как есть)
-class Reporter:
-    def save_report(self, results):
-        """Сохраняет отчет о загрузках"""
-        try:
-            report_dir = os.path.join(os.getcwd(), "reports")
-            if not os.path.exists(report_dir):
-                os.makedirs(report_dir)
-            
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            report_file = os.path.join(report_dir, f"report_{timestamp}.txt")
-            
-            with open(report_file, 'w', encoding='utf-8') as f:
-                f.write("=== VIDEO DOWNLOAD REPORT ===\n")
-                f.write(f"Generated: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write("=" * 30 + "\n\n")
-                
-                success_count = sum(1 for r in results.values() if '✅' in r)
-                total_count = len(results)
-                
-                f.write(f"Total: {total_count}\n")
-                f.write(f"Successful: {success_count}\n")
-                f.write(f"Failed: {total_count - success_count}\n\n")
-                
-                f.write("DETAILS:\n")
-                f.write("-" * 20 + "\n")
-                
-                for url, result in results.items():
-                    f.write(f"URL: {url}\n")
-                    f.write(f"Result: {result}\n")
-                    f.write("-" * 20 + "\n")
-            
-            return True
-        except Exception as e:
-            print(f"Error saving report: {e}")
-            return False
+# Частота опроса прогресса загрузок интерфейсом (кадров в секунду)
+PROGRESS_FPS = 10
 
+# Варианты профилирования: ключ перевода -> аргументы set_profiling
+PROFILING_CHOICES = {
+    "profile_off": None,
+    "profile_cpu": {"mode": "cpu", "scope": "job", "sample": 0.1},
+    "profile_both": {"mode": "both", "scope": "job", "sample": 0.1},
+    "profile_batch": {"mode": "cpu", "scope": "batch"},
+}
 
 # Класс DownloadThread должен быть определен ДО MainWindow
 class DownloadThread(QThread):
     progress_signal = pyqtSignal(int, int, str, dict)
-    result_signal = pyqtSignal(dict)
+    # Итог потоковой загрузки: успешно, всего (результаты не копятся в памяти)
+    summary_signal = pyqtSignal(int, int)
     
     def __init__(self, downloader):
         super().__init__()
         self.downloader = downloader
+        self.queue = list(downloader.queue)
+        # Что остается в очереди после партии: неудачные и не начатые
+        self.remaining = []
     
     def run(self):
-        results = {}
-        for i, url in enumerate(self.downloader.queue):
-            if hasattr(self.downloader, '_stop_flag') and self.downloader._stop_flag:
-                break
-                
-            result = self.downloader.download(url)
-            results[url] = result
-            self.progress_signal.emit(i, len(self.downloader.queue), url, {})
-        
-        self.result_signal.emit(results)
+        # Строка таблицы обновляется по сигналу элемента; побайтовый прогресс GUI читает по таймеру
+        queue = self.queue
+        source = self.downloader.feed(queue) if self.downloader.options.get('expand_playlists', True) else queue
+        statuses = {}
+        success = total = 0
+        for index, url, result in self.downloader.download_iter(source, expand=False):
+            total += 1
+            success += result.get('status') == 'success'
+            statuses[url] = result.get('status')
+            self.progress_signal.emit(index, len(queue), url, result)
+        self.remaining = self.downloader.unfinished(queue, statuses, getattr(source, 'expanded', ()))
+        self.summary_signal.emit(success, total)
 
 # Основной класс MainWindow
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.downloader = VideoDownloader()
-        self.reporter = Reporter()
+        # Потоковый отчет: строка JSONL на каждую задачу
+        self.downloader.set_reports()
+        # Журнал задач: очередь переживает закрытие окна и падения
+        self.downloader.set_journal(os.path.join(os.getcwd(), DEFAULT_JOURNAL_PATH))
         self.current_language = "ru"
         self.dark_theme = True
         self.setup_ui()
         self.setup_translations()
         self.setup_styles()
         self.load_presets()
+        self.restore_queue()
+    
+    def restore_queue(self):
+        """Возвращает в очередь задачи, прерванные или упавшие при прошлом запуске"""
+        resumed = self.downloader.resume()
+        if not resumed:
+            return
+        for url in self.downloader.queue:
+            self.queue_model.add_job(url, url, format_status('queued'))
+        self.queue_model.flush()
+        self.log_area.append(f"♻️ Восстановлено из журнала: {resumed}" if self.current_language == 'ru'
+                             else f"♻️ Restored from journal: {resumed}")
+        self.update_status(f"📥 В очереди: {len(self.downloader.queue)} видео")
     
     def setup_ui(self):
         self.setWindowTitle("🔥 Ultra Video Downloader PRO")
@@ -196,6 +145,22 @@ class MainWindow(QMainWindow):
         self.save_watermark_btn = QPushButton("💧 Сохранить с водяным знаком")
         self.save_watermark_btn.clicked.connect(self.save_with_watermark)
         
+        # Общий лимит скорости (меняется на лету) и класс приоритета загрузок
+        self.bandwidth_spin = QSpinBox()
+        self.bandwidth_spin.setRange(0, 10000)
+        self.bandwidth_spin.setSuffix(" МБ/с")
+        self.bandwidth_spin.setSpecialValueText("∞")
+        self.bandwidth_spin.valueChanged.connect(self.change_bandwidth)
+        self.priority_combo = QComboBox()
+        self.priority_combo.addItem("Срочно", "interactive")
+        self.priority_combo.addItem("Фоном", "bulk")
+        
+        # Профилирование выборки задач или всей партии (файлы рядом с отчетом)
+        self.profile_combo = QComboBox()
+        for key, label in (("profile_off", "Выкл"), ("profile_cpu", "CPU, 10% задач"),
+                           ("profile_both", "CPU и память, 10% задач"), ("profile_batch", "CPU, вся партия")):
+            self.profile_combo.addItem(label, key)
+        
         # Добавляем элементы
         settings_layout.addWidget(QLabel("Папка сохранения:"), 0, 0)
         settings_layout.addWidget(self.folder_input, 0, 1)
@@ -210,6 +175,12 @@ class MainWindow(QMainWindow):
         settings_layout.addWidget(self.preset_combo, 5, 1)
         settings_layout.addWidget(self.save_preset_btn, 5, 2)
         settings_layout.addWidget(self.save_watermark_btn, 6, 0, 1, 3)
+        settings_layout.addWidget(QLabel("Лимит скорости:"), 7, 0)
+        settings_layout.addWidget(self.bandwidth_spin, 7, 1)
+        settings_layout.addWidget(QLabel("Приоритет:"), 8, 0)
+        settings_layout.addWidget(self.priority_combo, 8, 1)
+        settings_layout.addWidget(QLabel("Профилирование:"), 9, 0)
+        settings_layout.addWidget(self.profile_combo, 9, 1)
         
         self.settings_group.setLayout(settings_layout)
         layout.addWidget(self.settings_group)
@@ -234,19 +205,37 @@ class MainWindow(QMainWindow):
         self.progress = QProgressBar()
         self.progress.setVisible(False)
         
-        # Лог действий
-        self.log_area = QTextEdit()
-        self.log_area.setReadOnly(True)
+        # Таблица очереди: одна строка на задачу, обновления применяются пачками
+        self.queue_model = QueueTableModel(self)
+        self.queue_view = QTableView()
+        self.queue_view.setModel(self.queue_model)
+        self.queue_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.queue_view.verticalHeader().setVisible(False)
+        self.queue_view.verticalHeader().setDefaultSectionSize(22)
+        self.queue_view.horizontalHeader().setStretchLastSection(True)
+        self.queue_view.setColumnWidth(0, 320)
+        self.queue_view.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.queue_view.customContextMenuRequested.connect(self.show_queue_menu)
+        
+        # Лог действий (кольцевой буфер последних строк)
+        self.log_area = RingLogView()
         
         # Добавляем элементы
         layout.addWidget(self.url_input)
         layout.addLayout(btn_layout)
         layout.addWidget(self.progress)
-        layout.addWidget(self.log_area)
+        layout.addWidget(self.queue_view, 2)
+        layout.addWidget(self.log_area, 1)
         
         # Статус бар
         self.status_bar = self.statusBar()
         self.update_status("🟢 Готов к работе")
+        
+        # Прогресс загрузок опрашивается с ограниченной частотой, а не по сигналу на чанк
+        self.progress_timer = QTimer(self)
+        self.progress_timer.setInterval(1000 // PROGRESS_FPS)
+        self.progress_timer.timeout.connect(self.refresh_progress)
+        self._progress_version = None
     
     def setup_translations(self):
         self.translations = {
@@ -268,7 +257,19 @@ class MainWindow(QMainWindow):
                 "extract_audio": "🎵 Извлечь звук",
                 "ready": "🟢 Готов к работе",
                 "theme_btn": "🌙 Темная тема",
-                "language": "Язык:"
+                "language": "Язык:",
+                "cancel": "⏹ Отменить выбранные",
+                "stop_all": "⏹ Остановить все",
+                "bandwidth": "Лимит скорости:",
+                "bandwidth_unit": " МБ/с",
+                "priority": "Приоритет:",
+                "interactive": "Срочно",
+                "bulk": "Фоном",
+                "profile": "Профилирование:",
+                "profile_off": "Выкл",
+                "profile_cpu": "CPU, 10% задач",
+                "profile_both": "CPU и память, 10% задач",
+                "profile_batch": "CPU, вся партия"
             },
             "en": {
                 "header": "ULTRA VIDEO DOWNLOADER",
@@ -288,7 +289,19 @@ class MainWindow(QMainWindow):
                 "extract_audio": "🎵 Extract audio",
                 "ready": "🟢 Ready to work",
                 "theme_btn": "🌙 Dark theme",
-                "language": "Language:"
+                "language": "Language:",
+                "cancel": "⏹ Cancel selected",
+                "stop_all": "⏹ Stop all",
+                "bandwidth": "Speed limit:",
+                "bandwidth_unit": " MB/s",
+                "priority": "Priority:",
+                "interactive": "Interactive",
+                "bulk": "Background",
+                "profile": "Profiling:",
+                "profile_off": "Off",
+                "profile_cpu": "CPU, 10% of jobs",
+                "profile_both": "CPU and memory, 10% of jobs",
+                "profile_batch": "CPU, whole batch"
             }
         }
     
@@ -314,11 +327,20 @@ class MainWindow(QMainWindow):
         self.settings_group.layout().itemAtPosition(5, 0).widget().setText(trans["presets"])
         self.save_preset_btn.setText(trans["save_preset"])
         self.save_watermark_btn.setText(trans["save_watermark"])
+        self.settings_group.layout().itemAtPosition(7, 0).widget().setText(trans["bandwidth"])
+        self.bandwidth_spin.setSuffix(trans["bandwidth_unit"])
+        self.settings_group.layout().itemAtPosition(8, 0).widget().setText(trans["priority"])
+        for i in range(self.priority_combo.count()):
+            self.priority_combo.setItemText(i, trans[self.priority_combo.itemData(i)])
+        self.settings_group.layout().itemAtPosition(9, 0).widget().setText(trans["profile"])
+        for i in range(self.profile_combo.count()):
+            self.profile_combo.setItemText(i, trans[self.profile_combo.itemData(i)])
         self.url_input.setPlaceholderText(trans["placeholder"])
         self.add_btn.setText(trans["add"])
         self.download_btn.setText(trans["download"])
         self.extract_audio_btn.setText(trans["extract_audio"])
         self.theme_btn.setText("🌙 Темная тема" if self.current_language == "ru" else "🌙 Dark theme")
+        self.queue_model.set_language(self.current_language)
         self.update_status(trans["ready"])
         
         # Обновляем заголовки в layout
@@ -381,7 +403,7 @@ class MainWindow(QMainWindow):
                 QPushButton:pressed {
                     background-color: #3a0ca3;
                 }
-                QLineEdit, QTextEdit, QComboBox {
+                QLineEdit, QTextEdit, QPlainTextEdit, QComboBox {
                     background-color: #252526;
                     color: white;
                     border: 1px solid #4cc9f0;
@@ -416,7 +438,19 @@ class MainWindow(QMainWindow):
                     background-color: #4361ee;
                     border: 1px solid #4cc9f0;
                 }
-                QTextEdit {
+                QTableView {
+                    background-color: #1a1a2e;
+                    color: #ffffff;
+                    gridline-color: #252526;
+                    border: 1px solid #4cc9f0;
+                }
+                QHeaderView::section {
+                    background-color: #252526;
+                    color: #4cc9f0;
+                    border: none;
+                    padding: 4px;
+                }
+                QTextEdit, QPlainTextEdit {
                     background-color: #1a1a2e;
                     color: #00ff88;
                     font-family: 'Courier New';
@@ -459,7 +493,7 @@ class MainWindow(QMainWindow):
                 QPushButton:pressed {
                     background-color: #005a9e;
                 }
-                QLineEdit, QTextEdit, QComboBox {
+                QLineEdit, QTextEdit, QPlainTextEdit, QComboBox {
                     background-color: #ffffff;
                     color: #333333;
                     border: 1px solid #cccccc;
@@ -494,7 +528,19 @@ class MainWindow(QMainWindow):
                     background-color: #007acc;
                     border: 1px solid #005a9e;
                 }
-                QTextEdit {
+                QTableView {
+                    background-color: #ffffff;
+                    color: #333333;
+                    gridline-color: #eeeeee;
+                    border: 1px solid #cccccc;
+                }
+                QHeaderView::section {
+                    background-color: #f5f5f5;
+                    color: #007acc;
+                    border: none;
+                    padding: 4px;
+                }
+                QTextEdit, QPlainTextEdit {
                     background-color: #ffffff;
                     color: #008000;
                     font-family: 'Courier New';
@@ -583,10 +629,21 @@ class MainWindow(QMainWindow):
             self.downloader.set_download_dir(folder)
     
     def add_url(self):
-        url = self.url_input.text().strip()
-        if url:
-            self.downloader.add_to_queue(url)
-            self.log_area.append(f"✅ Добавлено в очередь: {url}")
+        # Можно вставить сразу много ссылок через пробел
+        urls = self.url_input.text().split()
+        if urls:
+            added = []
+            for url in urls:
+                if self.downloader.add_to_queue(url):
+                    added.append(url)
+                    self.queue_model.add_job(url, url, format_status('queued'))
+                else:
+                    self.log_area.append(f"❌ Некорректная ссылка: {url}")
+            self.queue_model.flush()
+            if len(added) == 1:
+                self.log_area.append(f"✅ Добавлено в очередь: {added[0]}")
+            elif added:
+                self.log_area.append(f"✅ Добавлено в очередь: {len(added)} ссылок")
             self.url_input.clear()
             self.update_status(f"📥 В очереди: {len(self.downloader.queue)} видео")
         else:
@@ -596,7 +653,12 @@ class MainWindow(QMainWindow):
     def extract_audio(self):
         url = self.url_input.text().strip()
         if url:
-            self.downloader.add_to_queue(url)
+            if not self.downloader.add_to_queue(url):
+                QMessageBox.warning(self, "Ошибка",
+                    "Некорректная ссылка" if self.current_language == 'ru' else "Invalid URL")
+                return
+            self.queue_model.add_job(url, url, format_status('queued'))
+            self.queue_model.flush()
             self.log_area.append(f"🎵 Добавлено в очередь для извлечения звука: {url}")
             self.url_input.clear()
             self.update_status(f"📥 В очереди: {len(self.downloader.queue)} аудио")
@@ -621,11 +683,17 @@ class MainWindow(QMainWindow):
             'format': download_format,
             'watermark': self.watermark_check.isChecked(),
             'vpn': self.vpn_check.isChecked(),
-            'output_dir': self.folder_input.text()
+            'output_dir': self.folder_input.text(),
+            'priority': self.priority_combo.currentData()
         }
         
         self.downloader.set_options(options)
         self.downloader.set_download_dir(self.folder_input.text())
+        profiling = PROFILING_CHOICES[self.profile_combo.currentData()]
+        if profiling:
+            self.downloader.set_profiling(**profiling)
+        else:
+            self.downloader.set_profiling(None)
         
         self.progress.setMaximum(len(self.downloader.queue))
         self.progress.setValue(0)
@@ -636,35 +704,114 @@ class MainWindow(QMainWindow):
         
         self.download_thread = DownloadThread(self.downloader)
         self.download_thread.progress_signal.connect(self.update_progress)
-        self.download_thread.result_signal.connect(self.handle_download_result)
+        self.download_thread.summary_signal.connect(self.finish_download)
         self.download_thread.start()
+        self.progress_timer.start()
+    
+    def change_bandwidth(self, value):
+        """Меняет общий лимит скорости, в том числе для уже идущих загрузок"""
+        self.downloader.bandwidth.set_limit(value * 1024 * 1024 if value else None)
+    
+    def show_queue_menu(self, pos):
+        """Контекстное меню очереди: отмена выбранных задач или всех загрузок"""
+        trans = self.translations[self.current_language]
+        menu = QMenu(self)
+        cancel_action = menu.addAction(trans["cancel"])
+        stop_action = menu.addAction(trans["stop_all"])
+        cancel_action.setEnabled(bool(self.queue_view.selectionModel().selectedRows()))
+        stop_action.setEnabled(self.downloader.is_downloading)
+        
+        action = menu.exec_(self.queue_view.viewport().mapToGlobal(pos))
+        if action == cancel_action:
+            self.cancel_selected()
+        elif action == stop_action:
+            self.downloader.stop_download()
+            self.log_area.append("⏹ Загрузка остановлена" if self.current_language == 'ru' else "⏹ Download stopped")
+    
+    def cancel_selected(self):
+        """Прерывает выбранные загрузки на следующем чанке"""
+        cancelled = 0
+        for index in self.queue_view.selectionModel().selectedRows():
+            if self.downloader.cancel_url(index.data()):
+                cancelled += 1
+        if cancelled:
+            self.log_area.append(f"⏹ Отменено: {cancelled}" if self.current_language == 'ru' else f"⏹ Cancelled: {cancelled}")
+    
+    def refresh_progress(self):
+        """Снимает прогресс со всех активных загрузок и показывает суммарную скорость"""
+        self._sample_progress()
+        self.queue_model.flush()
+    
+    def _sample_progress(self):
+        progress = self.downloader.progress
+        if progress.version == self._progress_version:
+            return
+        self._progress_version, jobs = progress.snapshot()
+        
+        for job in jobs.values():
+            if job['status'] not in ('downloading', 'processing', 'postprocessing'):
+                continue
+            total = job['total_bytes']
+            percent = job['downloaded_bytes'] * 100 / total if total else 0
+            self.queue_model.update_job(job['url'],
+                status=format_status(job['status']),
+                progress=f"{percent:.1f}%",
+                speed=f"{format_bytes(job['speed'])}/s" if job['speed'] else '',
+                eta=format_eta(job['eta']) if job['eta'] is not None else ''
+            )
+        
+        totals = self.downloader.progress.get_totals()
+        if not totals['active']:
+            return
+        speed = totals['speed'] / (1024 * 1024)
+        if self.current_language == 'ru':
+            self.update_status(f"⏬ Активных загрузок: {totals['active']} · {speed:.1f} МБ/с")
+        else:
+            self.update_status(f"⏬ Active downloads: {totals['active']} · {speed:.1f} MB/s")
     
     def update_progress(self, index, total, url, progress_data):
         """Обновляет прогресс загрузки"""
-        self.progress.setValue(index + 1)
+        # Элементы завершаются не по порядку, поэтому считаем завершенные.
+        # Записей раскрытого плейлиста больше, чем ссылок в очереди
+        if self.progress.value() + 1 > self.progress.maximum():
+            self.progress.setMaximum(self.progress.value() + 1)
+        self.progress.setValue(self.progress.value() + 1)
         self.log_area.append(f"{index+1}/{total}. Загрузка: {url}")
+        if progress_data.get('report_error'):
+            self.log_area.append(f"⚠️ {progress_data['report_error']}")
+        if progress_data.get('status'):
+            self.queue_model.add_job(url, url)
+            self.queue_model.update_job(url,
+                status=format_status(progress_data['status']),
+                progress='100%' if progress_data['status'] == 'success' else '',
+                speed='', eta='',
+                path=progress_data.get('path', progress_data.get('message', ''))
+            )
     
-    def handle_download_result(self, results):
-        """Обрабатывает результаты загрузки"""
+    def finish_download(self, success_count, total_count):
+        """Сводка по завершенной загрузке"""
+        self.progress_timer.stop()
         self.progress.setVisible(False)
-        
-        success_count = sum(1 for r in results.values() if r.get('status') == 'success')
-        total_count = len(results)
-        
-        for url, result in results.items():
-            if result.get('status') == 'success':
-                self.log_area.append(f"✅ {url} - Успешно: {result.get('path', '')}")
-            else:
-                self.log_area.append(f"❌ {url} - Ошибка: {result.get('message', '')}")
-        
-        # Сохраняем отчет
-        try:
-            self.reporter.save_report(results)
-            self.log_area.append("📊 Отчет сохранен" if self.current_language == 'ru' else "📊 Report saved")
-        except Exception as e:
-            self.log_area.append(f"❌ Ошибка сохранения отчета: {str(e)}")
-        
-        self.downloader.queue.clear()
+        self.queue_model.flush()
+        self.log_area.append(
+            f"📦 Успешно: {success_count}, ошибок: {total_count - success_count}"
+            if self.current_language == 'ru' else
+            f"📦 Successful: {success_count}, failed: {total_count - success_count}"
+        )
+        
+        # Потоковый отчет уже записан по мере завершения задач
+        reports = self.downloader.reports
+        if reports is not None and reports.path:
+            self.log_area.append(f"📊 Отчет: {reports.path}" if self.current_language == 'ru' else f"📊 Report: {reports.path}")
+        
+        profiler = self.downloader.profiler
+        if profiler is not None and profiler.files:
+            self.log_area.append(f"⏱ Профили: {profiler.directory}" if self.current_language == 'ru' else f"⏱ Profiles: {profiler.directory}")
+        
+        # Неудачные и не начатые остаются в очереди (и в журнале) для повтора,
+        # добавленные во время загрузки ждут следующего запуска
+        thread = self.download_thread
+        self.downloader.queue = thread.remaining + self.downloader.queue[len(thread.queue):]
         
         msg = QMessageBox()
         msg.setWindowTitle("🎉 Завершено!" if self.current_language == 'ru' else "🎉 Completed!")
@@ -0,0 +1,479 @@
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Optional
+from urllib.parse import urlsplit, parse_qs
+
+from download_queue.manager import DownloadQueue
+from download_queue.tasks import DOWNLOADING, CANCELLED
+from utils.bandwidth import BULK, INTERACTIVE
+from utils.http import http_pool
+
+# Как часто рассылается прогресс подписчикам SSE (секунды)
+SSE_INTERVAL = 0.5
+# Сколько событий копится для медленного клиента, прежде чем старые отбрасываются
+SSE_CLIENT_BUFFER = 256
+# Комментарий-пинг, чтобы прокси не закрывали простаивающий поток
+SSE_KEEPALIVE = 15
+MAX_BODY_SIZE = 10 * 1024 * 1024
+
+HTTP_STATUS = {
+    200: 'OK',
+    202: 'Accepted',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    409: 'Conflict',
+    413: 'Payload Too Large',
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _public_result(result: Optional[Dict]) -> Optional[Dict]:
+    """Результат загрузки без несериализуемых полей (future постобработки)"""
+    if result is None:
+        return None
+    return {key: value for key, value in result.items() if key != 'postprocess'}
+
+
+class JobService:
+    """Задачи загрузки поверх DownloadQueue: прием, статус, отмена и события.
+
+    Все состояние живет в потоке event loop; блокирующие вызовы yt-dlp
+    выполняются в пуле потоков, число которых ограничено workers.
+    """
+
+    def __init__(self, queue: DownloadQueue, workers: int = 4):
+        self.queue = queue
+        self.downloader = queue.downloader
+        self.workers = max(1, workers)
+        self.jobs: Dict[int, Dict] = {}
+        self._pending = deque()
+        self._running = set()
+        self._subscribers = set()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='api-download')
+        self._tasks = []
+        self._slots = None
+        self._wakeup = None
+
+    async def start(self):
+        self._slots = asyncio.Semaphore(self.workers)
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.ensure_future(self._dispatch()),
+            asyncio.ensure_future(self._sample_progress()),
+        ]
+        # Задачи, прерванные при прошлом запуске, DownloadQueue уже достал из журнала
+        for url in self.queue.queue:
+            await self.submit(url)
+        self.queue.queue.clear()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self.downloader.stop_download()
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, url: str, options: Optional[Dict] = None) -> Optional[Dict]:
+        """Ставит URL в очередь; возвращает запись задачи или None для невалидного URL"""
+        if not self.downloader._validate_url(url):
+            return None
+        journal = self.downloader.journal
+        if journal:
+            # Запись в SQLite не блокирует event loop; пул загрузок для нее не занимается
+            job_id = await asyncio.get_running_loop().run_in_executor(None, journal.ensure, url)
+        else:
+            job_id = next(self.downloader._job_seq)
+        if job_id in self.jobs and self.jobs[job_id]['status'] in ('queued', 'downloading', 'cancelling'):
+            return self.jobs[job_id]
+
+        record = {
+            'id': job_id,
+            'url': url,
+            'status': 'queued',
+            'options': options or {},
+            'created': time.time(),
+            'result': None,
+        }
+        self.jobs[job_id] = record
+        self._pending.append((job_id, url))
+        self._wakeup.set()
+        self._publish('queued', self._describe(record))
+        return record
+
+    def cancel(self, job_id: int) -> Dict:
+        record = self.jobs.get(job_id)
+        if record is None:
+            raise HttpError(404, f'Job {job_id} not found')
+        if record['status'] == 'downloading':
+            # Загрузка прервется на следующем чанке, итог придет событием complete
+            self.downloader.cancel(job_id)
+            record['status'] = 'cancelling'
+        elif record['status'] == 'queued':
+            self._pending.remove((job_id, record['url']))
+            record['status'] = 'cancelled'
+            record['result'] = {'status': 'cancelled', 'message': 'Download cancelled'}
+            self.downloader._set_job_state(job_id, CANCELLED)
+            self._publish('cancelled', self._describe(record))
+        return self._describe(record)
+
+    def get_job(self, job_id: int) -> Dict:
+        record = self.jobs.get(job_id)
+        if record is None:
+            raise HttpError(404, f'Job {job_id} not found')
+        return self._describe(record, with_progress=True)
+
+    def list_jobs(self, status: Optional[str] = None) -> Dict:
+        counts = {}
+        jobs = []
+        for record in self.jobs.values():
+            counts[record['status']] = counts.get(record['status'], 0) + 1
+            if status is None or record['status'] == status:
+                jobs.append(self._describe(record))
+        return {
+            'jobs': jobs,
+            'counts': counts,
+            'downloads': self.downloader.get_all_downloads_info(),
+            'totals': self.downloader.progress.get_totals(),
+            'connections': http_pool.get_stats(),
+        }
+
+    def _describe(self, record: Dict, with_progress: bool = False) -> Dict:
+        description = {key: record[key] for key in ('id', 'url', 'status', 'created')}
+        description['result'] = _public_result(record['result'])
+        if with_progress:
+            description['progress'] = self.downloader.progress.get(record['id'])
+        return description
+
+    async def _dispatch(self):
+        """Запускает задачи по мере освобождения слотов с учетом бюджетов хостов"""
+        plugins = self.downloader.plugin_manager
+        if plugins is None:
+            from downloader import get_plugin_manager
+            plugins = get_plugin_manager()
+
+        while True:
+            await self._slots.acquire()
+            while True:
+                delay = None
+                if self._pending:
+                    item, delay = self.downloader._next_ready_item(self._pending, plugins)
+                    if item is not None:
+                        break
+                self._wakeup.clear()
+                timeout = (delay or 0.1) if self._pending else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+            task = asyncio.ensure_future(self._run(item[0], item[1], plugins))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, job_id: int, url: str, plugins):
+        record = self.jobs[job_id]
+        record['status'] = 'downloading'
+        self._publish('started', self._describe(record))
+        options = dict(self.downloader.options, **record['options'])
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, self.downloader._set_job_state, job_id, DOWNLOADING)
+            result = await loop.run_in_executor(
+                self._executor,
+                partial(self.downloader.download, url, options=options, job_id=job_id)
+            )
+            await loop.run_in_executor(self._executor, self.downloader._finish_job, job_id, result, url)
+        except Exception as e:
+            result = {'status': 'error', 'message': f'Download failed: {str(e)}'}
+        finally:
+            plugins.release(url)
+            self._slots.release()
+            self._wakeup.set()
+
+        record['status'] = result['status']
+        record['result'] = result
+        self._publish('complete', self._describe(record))
+
+    async def _sample_progress(self):
+        """Раз в SSE_INTERVAL рассылает изменившийся прогресс активных задач"""
+        seen_version = None
+        sent = {}
+        while True:
+            await asyncio.sleep(SSE_INTERVAL)
+            if not self._subscribers:
+                continue
+            seen_version, jobs = self.downloader.progress.snapshot(seen_version)
+            if jobs is None:
+                continue
+            for job_id, job in jobs.items():
+                record = self.jobs.get(job_id)
+                if record is None or record['status'] not in ('downloading', 'cancelling'):
+                    sent.pop(job_id, None)
+                    continue
+                if sent.get(job_id) == job['updated']:
+                    continue
+                sent[job_id] = job['updated']
+                self._publish('progress', job)
+
+    def subscribe(self) -> asyncio.Queue:
+        events = asyncio.Queue(maxsize=SSE_CLIENT_BUFFER)
+        self._subscribers.add(events)
+        return events
+
+    def unsubscribe(self, events: asyncio.Queue):
+        self._subscribers.discard(events)
+
+    def _publish(self, event: str, data: Dict):
+        message = f'event: {event}\ndata: {json.dumps(data, default=str)}\n\n'.encode()
+        for events in self._subscribers:
+            if events.full():
+                # Медленный клиент теряет старые события, а не тормозит остальных
+                events.get_nowait()
+            events.put_nowait(message)
+
+
+class ApiServer:
+    """Минимальный HTTP/1.1 сервер на asyncio.
+
+    POST /jobs            {"url": ...} или {"urls": [...]}, опционально "options"
+    GET /jobs[?status=]   список задач, текущие загрузки и суммарный прогресс
+    GET /jobs/<id>        задача с сырыми цифрами прогресса
+    DELETE /jobs/<id>     отмена задачи (в очереди или во время загрузки)
+    GET /bandwidth        общий лимит скорости и цифры по классам приоритета
+    PUT /bandwidth        {"limit": байт/с или null, "weights": {"interactive": 4, "bulk": 1}}
+    GET /events           поток событий (server-sent events)
+    """
+
+    def __init__(self, service: JobService, host: str = '127.0.0.1', port: int = 8765):
+        self.service = service
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        await self.service.start()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        return self._server
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            await self.service.stop()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request = await self._read_request(reader, writer)
+                if request is None:
+                    break
+                method, path, query, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                if method == 'GET' and path == '/events':
+                    await self._stream_events(writer)
+                    break
+                if method == 'GET' and path == '/metrics':
+                    await self._send(writer, 200, self.service.downloader.metrics.render().encode(),
+                                     'text/plain; version=0.0.4; charset=utf-8', keep_alive)
+                    if not keep_alive:
+                        break
+                    continue
+                try:
+                    status, payload = await self._route(method, path, query, body)
+                except HttpError as e:
+                    status, payload = e.status, {'error': e.message}
+                await self._send_json(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader, writer):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            await self._send_json(writer, 400, {'error': 'Malformed request line'}, False)
+            return None
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            await self._send_json(writer, 400, {'error': 'Invalid Content-Length'}, False)
+            return None
+        if length > MAX_BODY_SIZE:
+            await self._send_json(writer, 413, {'error': 'Request body too large'}, False)
+            return None
+        body = await reader.readexactly(length) if length else b''
+
+        parts = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(parts.query).items()}
+        return method.upper(), parts.path.rstrip('/') or '/', query, headers, body
+
+    async def _route(self, method, path, query, body):
+        if path == '/jobs':
+            if method == 'POST':
+                return 202, await self._submit(body)
+            if method == 'GET':
+                return 200, self.service.list_jobs(query.get('status'))
+            raise HttpError(405, f'{method} is not allowed on {path}')
+
+        if path == '/bandwidth':
+            if method == 'GET':
+                return 200, self.service.downloader.bandwidth.get_stats()
+            if method == 'PUT':
+                return 200, self._set_bandwidth(body)
+            raise HttpError(405, f'{method} is not allowed on {path}')
+
+        if path == '/reports':
+            if method == 'GET':
+                return 200, self._report_summary(query)
+            raise HttpError(405, f'{method} is not allowed on {path}')
+
+        if path.startswith('/jobs/'):
+            try:
+                job_id = int(path[len('/jobs/'):])
+            except ValueError:
+                raise HttpError(404, f'Unknown path {path}')
+            if method == 'GET':
+                return 200, self.service.get_job(job_id)
+            if method == 'DELETE':
+                return 200, self.service.cancel(job_id)
+            raise HttpError(405, f'{method} is not allowed on {path}')
+
+        raise HttpError(404, f'Unknown path {path}')
+
+    def _read_json(self, body):
+        try:
+            data = json.loads(body or b'{}')
+        except ValueError:
+            raise HttpError(400, 'Body must be JSON')
+        if not isinstance(data, dict):
+            raise HttpError(400, 'Body must be a JSON object')
+        return data
+
+    def _set_bandwidth(self, body):
+        data = self._read_json(body)
+        governor = self.service.downloader.bandwidth
+        try:
+            if 'weights' in data:
+                governor.set_weights(data['weights'])
+            if 'limit' in data:
+                governor.set_limit(int(data['limit']) if data['limit'] else None)
+        except (TypeError, ValueError, AttributeError):
+            raise HttpError(400, "Expected numeric 'limit' and 'weights'")
+        return governor.get_stats()
+
+    def _report_summary(self, query):
+        """Сводка индекса отчетов: ?days=7&status=error&group_by=platform,error_class"""
+        reports = self.service.downloader.reports
+        if reports is None or reports.index is None:
+            raise HttpError(404, 'Reports are disabled')
+        try:
+            since = time.time() - float(query.get('days', 7)) * 86400
+        except ValueError:
+            raise HttpError(400, "Expected numeric 'days'")
+        group_by = query.get('group_by', 'platform,status').split(',')
+        return {
+            'since': since,
+            'rows': reports.index.query(since=since, status=query.get('status'),
+                                        platform=query.get('platform'), group_by=group_by),
+        }
+
+    async def _submit(self, body):
+        data = self._read_json(body)
+
+        urls = data.get('urls') or ([data['url']] if data.get('url') else [])
+        if not urls:
+            raise HttpError(400, "Expected 'url' or 'urls'")
+        options = dict(data.get('options') or {})
+        # Одиночные запросы срочные, пачки по умолчанию качаются фоном
+        options.setdefault('priority', BULK if data.get('urls') else INTERACTIVE)
+
+        jobs, rejected = [], []
+        for url in urls:
+            record = await self.service.submit(url, options) if isinstance(url, str) else None
+            if record is None:
+                rejected.append(url)
+            else:
+                jobs.append(self.service._describe(record))
+        return {'jobs': jobs, 'rejected': rejected}
+
+    async def _send_json(self, writer, status, payload, keep_alive=True):
+        body = json.dumps(payload, default=str, ensure_ascii=False).encode()
+        await self._send(writer, status, body, 'application/json; charset=utf-8', keep_alive)
+
+    async def _send(self, writer, status, body, content_type, keep_alive=True):
+        head = (
+            f'HTTP/1.1 {status} {HTTP_STATUS.get(status, "")}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'
+        )
+        writer.write(head.encode() + body)
+        await writer.drain()
+
+    async def _stream_events(self, writer):
+        writer.write(
+            b'HTTP/1.1 200 OK\r\n'
+            b'Content-Type: text/event-stream\r\n'
+            b'Cache-Control: no-cache\r\n'
+            b'Connection: keep-alive\r\n\r\n'
+        )
+        await writer.drain()
+        events = self.service.subscribe()
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(events.get(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    message = b': keepalive\n\n'
+                writer.write(message)
+                await writer.drain()
+        finally:
+            self.service.unsubscribe(events)
+
+
+async def serve(host='127.0.0.1', port=8765, workers=4, journal_path=None, options=None, report_dir=None,
+                profiling=None):
+    """Запускает API до остановки процесса; profiling — аргументы set_profiling (выборка задач)"""
+    queue = DownloadQueue(journal_path=journal_path)
+    if report_dir:
+        queue.downloader.set_reports(report_dir)
+    if profiling:
+        queue.downloader.set_profiling(**profiling)
+    if options:
+        queue.downloader.set_options(options)
+        if options.get('output_dir'):
+            queue.downloader.set_download_dir(options['output_dir'])
+    server = ApiServer(JobService(queue, workers), host, port)
+    await server.start()
+    print(f'Listening on http://{host}:{port}', flush=True)
+    await server.serve_forever()
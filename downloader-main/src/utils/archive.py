@@ -0,0 +1,53 @@
+import os
+import threading
+
+
+class DownloadArchive:
+    """Архив скачанных видео: строки "экстрактор id", как у yt-dlp --download-archive"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._keys = set()
+        # Ключи, которые сейчас качаются: дубли в одной пачке не качаем дважды
+        self._claimed = set()
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.strip().split(' ', 1)
+                    if len(parts) == 2:
+                        self._keys.add((parts[0], parts[1]))
+        else:
+            directory = os.path.dirname(os.path.abspath(path))
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._keys
+
+    def __len__(self):
+        with self._lock:
+            return len(self._keys)
+
+    def claim(self, key):
+        """Резервирует ключ; False, если видео уже в архиве или качается"""
+        with self._lock:
+            if key in self._keys or key in self._claimed:
+                return False
+            self._claimed.add(key)
+            return True
+
+    def release(self, key):
+        with self._lock:
+            self._claimed.discard(key)
+
+    def add(self, key):
+        """Записывает видео в архив"""
+        with self._lock:
+            if key in self._keys:
+                return
+            self._keys.add(key)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(f'{key[0]} {key[1]}\n')
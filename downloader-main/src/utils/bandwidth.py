@@ -0,0 +1,139 @@
+import threading
+import time
+
+# Классы приоритета
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+PRIORITIES = (INTERACTIVE, BULK)
+
+# Доля полосы пропорциональна весу класса
+DEFAULT_WEIGHTS = {INTERACTIVE: 4, BULK: 1}
+# Запас сверх измеренной скорости: задача может разогнаться, если канал освободился
+HEADROOM = 1.25
+# Как часто лимиты пересчитываются по отчетам о скорости (секунды)
+REBALANCE_INTERVAL = 0.5
+# Ниже этого лимит не опускается, чтобы загрузка не встала совсем
+MIN_RATE = 16 * 1024
+# Пауза дробится на такие куски, чтобы новый лимит и отмена действовали сразу
+PACE_SLICE = 0.1
+
+
+class BandwidthGovernor:
+    """Общий лимит скорости для всех активных загрузок с делением по приоритетам.
+
+    Лимит задачи выдерживается паузами в хуке прогресса (pace), а не через
+    ratelimit yt-dlp: тот усредняет скорость с начала загрузки, и снижение
+    лимита посреди файла останавливает задачу на секунды. Полосу, которую
+    срочные задачи не выбирают, забирают фоновые.
+    """
+
+    def __init__(self, limit=None, weights=None):
+        self._lock = threading.Lock()
+        self.limit = limit
+        self.weights = dict(DEFAULT_WEIGHTS)
+        if weights:
+            self.weights.update(weights)
+        self._jobs = {}
+        self._last_rebalance = 0.0
+
+    def set_limit(self, limit):
+        """Общий лимит в байтах/с (None или 0 — без ограничений)"""
+        with self._lock:
+            self.limit = limit or None
+            self._rebalance()
+
+    def set_weights(self, weights):
+        with self._lock:
+            self.weights.update({priority: max(1, int(weight)) for priority, weight in weights.items()})
+            self._rebalance()
+
+    def attach(self, job_id, priority):
+        with self._lock:
+            self._jobs[job_id] = {
+                'priority': priority if priority in self.weights else BULK,
+                'speed': None,
+                'rate': None,
+                'window': None,
+            }
+            self._rebalance()
+
+    def detach(self, job_id):
+        with self._lock:
+            if self._jobs.pop(job_id, None) is not None:
+                self._rebalance()
+
+    def pace(self, job_id, downloaded_bytes, speed=None):
+        """Сколько секунд задаче ждать, чтобы уложиться в свой лимит.
+        Вызывается из хука прогресса на каждом чанке; speed — скорость по данным yt-dlp"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return 0.0
+            now = time.monotonic()
+            if speed is not None:
+                job['speed'] = speed
+                if self.limit and now - self._last_rebalance >= REBALANCE_INTERVAL:
+                    self._rebalance()
+            rate = job['rate']
+            window = job['window']
+            if not rate:
+                job['window'] = None
+                return 0.0
+            if window is None or downloaded_bytes < window[1]:
+                job['window'] = (now, downloaded_bytes, rate)
+                return 0.0
+            started, start_bytes, window_rate = window
+            if window_rate != rate:
+                # При смене лимита переносится только перебор байт сверх старого лимита,
+                # недобор не копится: задача не рванет и не встанет на секунды
+                excess = (downloaded_bytes - start_bytes) - window_rate * (now - started)
+                start_bytes = downloaded_bytes - max(0.0, excess)
+                started = now
+                job['window'] = (started, start_bytes, rate)
+            return (downloaded_bytes - start_bytes) / rate - (now - started)
+
+    def get_stats(self):
+        """Лимит, веса и суммарные цифры по классам"""
+        with self._lock:
+            classes = {priority: {'jobs': 0, 'rate': 0, 'speed': 0} for priority in self.weights}
+            for job in self._jobs.values():
+                stats = classes[job['priority']]
+                stats['jobs'] += 1
+                stats['rate'] += job['rate'] or 0
+                stats['speed'] += job['speed'] or 0
+            return {'limit': self.limit, 'weights': dict(self.weights), 'classes': classes}
+
+    def _allocate(self, jobs):
+        """Взвешенное деление с учетом спроса: задача, которой хватает меньше
+        своей доли, получает столько, сколько качает, остаток делится между остальными"""
+        if not self.limit:
+            return {job_id: None for job_id in jobs}
+        rates = {}
+        budget = float(self.limit)
+        left = dict(jobs)
+        while left:
+            total_weight = sum(self.weights[job['priority']] for job in left.values())
+            capped = {}
+            for job_id, job in left.items():
+                share = budget * self.weights[job['priority']] / total_weight
+                if job['speed'] and job['speed'] * HEADROOM < share:
+                    capped[job_id] = job['speed'] * HEADROOM
+            if not capped:
+                for job_id, job in left.items():
+                    share = budget * self.weights[job['priority']] / total_weight
+                    rates[job_id] = max(MIN_RATE, int(share))
+                break
+            for job_id, demand in capped.items():
+                rates[job_id] = max(MIN_RATE, int(demand))
+                budget -= demand
+                del left[job_id]
+        return rates
+
+    def _rebalance(self):
+        self._last_rebalance = time.monotonic()
+        for job_id, rate in self._allocate(self._jobs).items():
+            self._jobs[job_id]['rate'] = rate
+
+
+# Общий бюджет процесса: его делят все загрузчики
+bandwidth = BandwidthGovernor()
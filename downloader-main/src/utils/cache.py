@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from utils.urls import strip_tracking
+
+# Время жизни метаданных по платформам (секунды).
+# Ссылки на медиа в info dict подписаны и протухают, поэтому TTL короче их срока
+PLATFORM_TTL = {
+    'youtube.com': 3600,
+    'vk.com': 1800,
+    'tiktok.com': 600,
+    'instagram.com': 600,
+    'facebook.com': 600,
+}
+DEFAULT_TTL = 900
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class MetadataCache:
+    """Дисковый кэш info dict от yt-dlp с TTL по платформам и вытеснением по размеру"""
+
+    def __init__(self, path, ttl=None, default_ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = dict(PLATFORM_TTL, **(ttl or {}))
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS metadata (
+                url TEXT PRIMARY KEY,
+                platform TEXT,
+                info TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS metadata_accessed ON metadata (accessed)')
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(url):
+        """Приводит URL к каноническому виду для ключа кэша"""
+        return strip_tracking(url)
+
+    def get_ttl(self, platform):
+        return self.ttl.get(platform, self.default_ttl)
+
+    def get(self, url):
+        """Возвращает info dict, если он еще свежий, иначе None"""
+        key = self.make_key(url)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT info, expires FROM metadata WHERE url = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute('DELETE FROM metadata WHERE url = ?', (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute('UPDATE metadata SET accessed = ? WHERE url = ?', (now, key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def set(self, url, info, platform=None):
+        """Сохраняет info dict и вытесняет давно не использованные записи"""
+        data = json.dumps(info, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO metadata (url, platform, info, size, expires, accessed) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (self.make_key(url), platform, data, len(data), now + self.get_ttl(platform), now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def invalidate(self, url):
+        with self._lock:
+            self._conn.execute('DELETE FROM metadata WHERE url = ?', (self.make_key(url),))
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute('DELETE FROM metadata WHERE expires < ?', (now,))
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM metadata').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Удаляем самые старые по последнему обращению, пока не влезем в лимит
+        for key, size in self._conn.execute(
+            'SELECT url, size FROM metadata ORDER BY accessed'
+        ).fetchall():
+            self._conn.execute('DELETE FROM metadata WHERE url = ?', (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
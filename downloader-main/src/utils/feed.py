@@ -0,0 +1,98 @@
+import queue
+import threading
+
+# Сколько раскрытых URL ждут загрузки: дальше пагинация плейлиста ждет (обратное давление)
+FEED_BUFFER = 256
+_DONE = object()
+
+
+class FeedClosed(Exception):
+    """Раскрытие прервано: источник закрыт или загрузка остановлена"""
+
+
+class ExpandError(Exception):
+    """Раскрыть URL не удалось: источник отдает ее вместо записей"""
+
+    def __init__(self, url, error):
+        super().__init__(f'{url}: {error}')
+        self.url = url
+        self.error = error
+
+
+class UrlFeed:
+    """Неблокирующий источник URL для download_iter.
+
+    Фоновый поток проходит по исходным URL и раскрывает каждый функцией
+    expand (плейлисты и каналы — постранично). Итератор отдает уже готовые
+    элементы, а пока их нет, но раскрытие продолжается, — None: загрузчик
+    продолжает работу с уже полученными записями, не дожидаясь следующей
+    страницы. Элемент — URL, (url, info) с уже полученными метаданными
+    или ExpandError для ссылки, которую раскрыть не удалось.
+    total — число исходных URL, если источник его знает.
+    """
+
+    def __init__(self, urls, expand, buffer=FEED_BUFFER, stop=None):
+        self.total = len(urls) if hasattr(urls, '__len__') else None
+        self._queue = queue.Queue(buffer)
+        # Может быть общим с expand: ожидание бюджета хоста прерывается при close
+        self._stop = stop or threading.Event()
+        self._done = False
+        # Исходные URL, раскрытые до конца: сами они в загрузку не идут
+        self.expanded = set()
+        self._thread = threading.Thread(target=self._run, args=(urls, expand), name='feed', daemon=True)
+        self._thread.start()
+
+    def _run(self, urls, expand):
+        try:
+            for url in urls:
+                if not self._expand(url, expand):
+                    return
+        finally:
+            self._put(_DONE, force=True)
+
+    def _expand(self, url, expand):
+        count = 0
+        passthrough = False
+        try:
+            for item in expand(url):
+                if not self._put(item):
+                    return False
+                count += 1
+                passthrough = (item if isinstance(item, str) else item[0]) == url
+        except FeedClosed:
+            return False
+        except Exception as e:
+            # Загрузчик отдаст ошибку результатом исходного URL; уже раскрытые записи качаются
+            return self._put(ExpandError(url, e))
+        if not (count == 1 and passthrough):
+            self.expanded.add(url)
+        return True
+
+    def _put(self, item, force=False):
+        while force or not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                if force and self._stop.is_set():
+                    return False
+        return False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._done:
+            raise StopIteration
+        try:
+            item = self._queue.get_nowait()
+        except queue.Empty:
+            return None
+        if item is _DONE:
+            self._done = True
+            raise StopIteration
+        return item
+
+    def close(self):
+        """Останавливает раскрытие; страница, которая уже загружается, дочитывается в фоне"""
+        self._stop.set()
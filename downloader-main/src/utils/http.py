@@ -0,0 +1,171 @@
+import json
+import threading
+import weakref
+
+# Сколько хостов держат свой пул соединений (CDN, страницы площадок, API)
+POOL_HOSTS = 32
+# Соединений на хост: загрузки всех потоков сверх этого ждут свободное соединение
+PER_HOST = 16
+# Ждать свободное соединение, а не открывать лишнее сверх лимита хоста
+POOL_BLOCK = True
+
+# Настройки TLS yt-dlp по умолчанию: с ними у нашей сессии общий пул с yt-dlp
+DEFAULT_TRANSPORT = (True, None, False, '{}', False)
+# Внутренности обработчика Requests в yt-dlp, на которые опирается attach
+_HANDLER_ATTRIBUTES = ('_create_instance', 'verify', 'source_address', 'prefer_system_certs',
+                       '_client_cert', 'legacy_ssl_support')
+
+
+def _new_stats():
+    return {'requests': 0, 'new': 0, 'reused': 0}
+
+
+class _SharedAdapter:
+    """Адаптер сессии поверх общего пула: считает переиспользование соединений
+    и не закрывает пул вместе с сессией, которой он отдан"""
+
+    def __init__(self, pool, adapter):
+        self.pool = pool
+        self.adapter = adapter
+
+    def send(self, request, **kwargs):
+        response = self.adapter.send(request, **kwargs)
+        connection = getattr(response.raw, 'connection', None)
+        self.pool._count(getattr(connection, 'sock', None))
+        return response
+
+    def close(self):
+        # Общий пул закрывается только через HttpPool.close
+        pass
+
+
+class HttpPool:
+    """Общий для процесса пул HTTP-соединений с keep-alive и лимитом на хост.
+
+    Через него идут метаданные, превью и медиа из всех рабочих потоков:
+    сессии yt-dlp (attach) и наша сессия (session) берут соединения из одних
+    пулов urllib3. Cookie и прокси остаются у каждой сессии свои и передаются
+    с запросом, поэтому общий пул их не смешивает. Пулы разделены по настройкам
+    TLS (проверка сертификата, клиентский сертификат, адрес источника).
+    """
+
+    def __init__(self, hosts=POOL_HOSTS, per_host=PER_HOST, block=POOL_BLOCK):
+        self.hosts = hosts
+        self.per_host = per_host
+        self.block = block
+        self._lock = threading.Lock()
+        self._adapters = {}
+        self._session = None
+        self._local = threading.local()
+        # Сокеты, по которым уже был запрос: повтор по ним — переиспользование
+        self._seen = weakref.WeakSet()
+        self.stats = _new_stats()
+
+    @property
+    def session(self):
+        """requests.Session для собственных запросов (раскрытие ссылок, сегменты)"""
+        with self._lock:
+            if self._session is not None:
+                return self._session
+        import requests
+
+        session = requests.Session()
+        session.adapters.clear()
+        adapter = self._get_adapter(DEFAULT_TRANSPORT, self._create_adapter)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        with self._lock:
+            if self._session is None:
+                self._session = session
+            return self._session
+
+    def _create_adapter(self):
+        from requests.adapters import HTTPAdapter
+
+        return HTTPAdapter(pool_connections=self.hosts, pool_maxsize=self.per_host, pool_block=self.block)
+
+    def _get_adapter(self, key, factory):
+        with self._lock:
+            adapter = self._adapters.get(key)
+            if adapter is None:
+                adapter = self._adapters[key] = _SharedAdapter(self, factory())
+            return adapter
+
+    def attach(self, ydl):
+        """Переводит HTTP-запросы экземпляра YoutubeDL на общий пул.
+        False — обработчика requests нет или внутренности yt-dlp не те, что ожидаются:
+        тогда yt-dlp ходит в сеть через свою сессию"""
+        handlers = getattr(getattr(ydl, '_request_director', None), 'handlers', None)
+        handler = handlers.get('Requests') if isinstance(handlers, dict) else None
+        if handler is None or not all(hasattr(handler, name) for name in _HANDLER_ATTRIBUTES):
+            return False
+        create_instance = handler._create_instance
+
+        def create_shared_instance(**kwargs):
+            session = create_instance(**kwargs)
+            legacy_ssl = kwargs.get('legacy_ssl_support')
+            try:
+                key = (
+                    handler.verify,
+                    handler.source_address,
+                    handler.prefer_system_certs,
+                    json.dumps(handler._client_cert, sort_keys=True),
+                    bool(handler.legacy_ssl_support if legacy_ssl is None else legacy_ssl),
+                )
+                adapter = self._get_adapter(key, lambda: self._resize(session.get_adapter('https://')))
+            except (AttributeError, TypeError, ValueError):
+                # Сессия или адаптер yt-dlp устроены иначе: остается его собственный пул
+                return session
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            return session
+
+        handler._create_instance = create_shared_instance
+        return True
+
+    def _resize(self, adapter):
+        """Адаптер yt-dlp со своим SSL-контекстом, но с размерами общего пула"""
+        adapter.init_poolmanager(self.hosts, self.per_host, block=self.block)
+        return adapter
+
+    def bind(self, stats):
+        """Привязывает счетчики задачи к текущему потоку; возвращает прежние"""
+        previous = getattr(self._local, 'stats', None)
+        self._local.stats = stats
+        return previous
+
+    def current(self):
+        return getattr(self._local, 'stats', None)
+
+    def new_stats(self):
+        return _new_stats()
+
+    def _count(self, sock):
+        with self._lock:
+            reused = sock is not None and sock in self._seen
+            if sock is not None and not reused:
+                self._seen.add(sock)
+            field = 'reused' if reused else 'new'
+            for stats in (self.stats, self.current()):
+                if stats is not None:
+                    stats['requests'] += 1
+                    stats[field] += 1
+
+    def get_stats(self):
+        """Запросы через общий пул, новые и переиспользованные соединения"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['pools'] = len(self._adapters)
+        return stats
+
+    def close(self):
+        """Закрывает все соединения пула"""
+        with self._lock:
+            adapters, self._adapters = self._adapters, {}
+            self._session = None
+        for adapter in adapters.values():
+            adapter.adapter.close()
+
+
+# Общий пул процесса: его используют все загрузчики, плагины и yt-dlp
+http_pool = HttpPool()
@@ -0,0 +1,196 @@
+import os
+import time
+import threading
+
+# Фазы задачи в порядке выполнения
+PHASES = ('extract', 'transfer', 'merge', 'postprocess', 'write')
+# Границы корзин гистограмм (секунды и байты/с)
+SECONDS_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+SPEED_BUCKETS = tuple(2 ** power * 1024 for power in range(6, 17, 2))
+BYTES_BUCKETS = tuple(2 ** power * 1024 * 1024 for power in range(0, 13, 2))
+# Как часто observe() перезаписывает текстовый файл для node_exporter (секунды)
+TEXTFILE_INTERVAL = 5.0
+PREFIX = 'downloader'
+
+
+class JobMetrics:
+    """Фазы, байты, скорость и повторы одной задачи.
+
+    Хуки прогресса и постобработки пишут сюда из потока загрузки;
+    snapshot() отдает простой словарь для результата и отчета.
+    """
+
+    def __init__(self, platform=None, preset=None):
+        self.platform = platform or ''
+        self.preset = preset or ''
+        self.started = time.time()
+        self.timings = {}
+        self.bytes = 0
+        self.peak_speed = 0
+        self.retries = 0
+        self._file_retries = 0
+        self.last_finished = None
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds):
+        with self._lock:
+            self.timings[phase] = self.timings.get(phase, 0.0) + max(0.0, seconds)
+
+    def retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def on_progress(self, d):
+        """Хук прогресса yt-dlp: пиковая скорость, повторы и время передачи файла"""
+        with self._lock:
+            if d['status'] == 'downloading':
+                self.peak_speed = max(self.peak_speed, d.get('speed') or 0)
+                # Загрузчик сегментов сообщает число повторов с начала файла
+                self._file_retries = max(self._file_retries, d.get('retries') or 0)
+            elif d['status'] == 'finished':
+                self.retries += self._file_retries
+                self._file_retries = 0
+                self.bytes += d.get('downloaded_bytes') or d.get('total_bytes') or 0
+                if d.get('elapsed') is not None:
+                    self.timings['transfer'] = self.timings.get('transfer', 0.0) + d['elapsed']
+                self.last_finished = time.time()
+
+    def finish(self):
+        """Запись: от конца передачи до конца задачи за вычетом склейки и постобработки
+        в этом промежутке (переименование .part, архив, метаданные)"""
+        with self._lock:
+            if self.last_finished is None or 'write' in self.timings:
+                return
+            inline = sum(self.timings.get(phase, 0.0) for phase in ('merge', 'postprocess'))
+            self.timings['write'] = max(0.0, time.time() - self.last_finished - inline)
+
+    def snapshot(self):
+        with self._lock:
+            transfer = self.timings.get('transfer')
+            return {
+                'platform': self.platform,
+                'preset': self.preset,
+                'started': self.started,
+                'timings': {phase: round(self.timings[phase], 3) for phase in PHASES if phase in self.timings},
+                'bytes': self.bytes,
+                'avg_speed': round(self.bytes / transfer) if transfer else None,
+                'peak_speed': round(self.peak_speed) or None,
+                'retries': self.retries,
+            }
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+class MetricsRegistry:
+    """Гистограммы фаз, скорости и размера по площадкам и пресетам.
+
+    Экспорт в текстовом формате Prometheus: render() для эндпоинта /metrics
+    и write_textfile() для textfile-коллектора node_exporter.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (имя, метки) -> гистограмма или значение счетчика
+        self._histograms = {}
+        self._counters = {}
+        self.textfile = None
+        self._written = 0.0
+        self._write_lock = threading.Lock()
+
+    def observe(self, job, status):
+        """Учитывает завершенную задачу (снимок JobMetrics)"""
+        if not job:
+            return
+        labels = (('platform', job.get('platform') or ''), ('preset', job.get('preset') or ''))
+        with self._lock:
+            self._inc('jobs_total', labels + (('status', status or ''),))
+            self._inc('bytes_total', labels, job.get('bytes') or 0)
+            self._inc('retries_total', labels, job.get('retries') or 0)
+            for phase, seconds in (job.get('timings') or {}).items():
+                self._observe('phase_seconds', labels + (('phase', phase),), seconds, SECONDS_BUCKETS)
+            if job.get('avg_speed'):
+                self._observe('avg_speed_bytes', labels, job['avg_speed'], SPEED_BUCKETS)
+            if job.get('peak_speed'):
+                self._observe('peak_speed_bytes', labels, job['peak_speed'], SPEED_BUCKETS)
+            if job.get('bytes'):
+                self._observe('job_bytes', labels, job['bytes'], BYTES_BUCKETS)
+            flush = self.textfile and time.time() - self._written >= TEXTFILE_INTERVAL
+        if flush:
+            self.write_textfile()
+
+    def _inc(self, name, labels, value=1):
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def _observe(self, name, labels, value, buckets):
+        key = (name, labels)
+        if key not in self._histograms:
+            self._histograms[key] = _Histogram(buckets)
+        self._histograms[key].observe(value)
+
+    def render(self):
+        """Текстовый формат экспозиции Prometheus 0.0.4"""
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f'# TYPE {PREFIX}_{name} counter')
+                for (key, labels), value in sorted(self._counters.items()):
+                    if key == name:
+                        lines.append(f'{PREFIX}_{name}{_labels(labels)} {value}')
+            for name in sorted({name for name, _ in self._histograms}):
+                lines.append(f'# TYPE {PREFIX}_{name} histogram')
+                for (key, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                    if key != name:
+                        continue
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{PREFIX}_{name}_bucket{_labels(labels + (("le", bound),))} {count}')
+                    lines.append(f'{PREFIX}_{name}_bucket{_labels(labels + (("le", "+Inf"),))} {histogram.count}')
+                    lines.append(f'{PREFIX}_{name}_sum{_labels(labels)} {histogram.sum}')
+                    lines.append(f'{PREFIX}_{name}_count{_labels(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def set_textfile(self, path):
+        """Путь .prom файла, который observe() обновляет раз в TEXTFILE_INTERVAL"""
+        self.textfile = path
+        if path:
+            self.write_textfile()
+
+    def write_textfile(self, path=None):
+        path = path or self.textfile
+        if not path:
+            return
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        # Через временный файл: коллектор не увидит недописанный файл
+        temp = f'{path}.{os.getpid()}.tmp'
+        with self._write_lock:
+            with open(temp, 'w', encoding='utf-8') as f:
+                f.write(self.render())
+            os.replace(temp, path)
+            self._written = time.time()
+
+
+# Общие метрики процесса
+metrics = MetricsRegistry()
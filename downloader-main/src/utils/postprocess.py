@@ -0,0 +1,174 @@
+import os
+import time
+import threading
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Оценка склейки до первых замеров: запуск ffmpeg и копирование потоков
+MERGE_STARTUP_SECONDS = 0.2
+MERGE_SECONDS_PER_MB = 0.004
+MERGE_CPU_PER_MB = 0.002
+MB = 1024 * 1024
+
+
+def _children_cpu():
+    """Процессорное время завершившихся дочерних процессов (ffmpeg)"""
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+def _ffmpeg(args):
+    cmd = ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error'] + args
+    completed = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.decode(errors='replace').strip() or 'ffmpeg failed')
+
+
+def _merge(step):
+    """Склеивает видео и аудио дорожки без перекодирования"""
+    args = []
+    for path in step['inputs']:
+        args += ['-i', path]
+    args += ['-c', 'copy', '-map', '0:v:0', '-map', '1:a:0', step['output']]
+    _ffmpeg(args)
+    for path in step['inputs']:
+        os.remove(path)
+    return step['output']
+
+
+def _extract_audio(step):
+    """Конвертирует звук в mp3 (аналог FFmpegExtractAudio)"""
+    quality = step.get('quality', '192')
+    _ffmpeg(['-i', step['input'], '-vn', '-c:a', 'libmp3lame', '-b:a', f'{quality}k', step['output']])
+    if step['input'] != step['output']:
+        os.remove(step['input'])
+    return step['output']
+
+
+def _remux(step):
+    """Перепаковывает контейнер (замена ExecAfterDownload из режима удаления водяных знаков)"""
+    path = step['input']
+    base, ext = os.path.splitext(path)
+    temp = f'{base}.remux{ext}'
+    _ffmpeg(['-i', path, '-c', 'copy', '-map', '0', temp])
+    os.replace(temp, path)
+    return path
+
+
+OPERATIONS = {
+    'merge': _merge,
+    'extract_audio': _extract_audio,
+    'remux': _remux,
+}
+
+
+def run_steps(steps):
+    """Выполняет цепочку ffmpeg-операций в дочернем процессе.
+    Каждый следующий шаг без явного input работает с результатом предыдущего"""
+    path = None
+    timings = {}
+    cpu_timings = {}
+    merged_bytes = 0
+    started = time.time()
+    try:
+        for step in steps:
+            step = dict(step)
+            step.setdefault('input', path)
+            step_started = time.time()
+            cpu_started = _children_cpu()
+            path = OPERATIONS[step['op']](step)
+            timings[step['op']] = timings.get(step['op'], 0) + time.time() - step_started
+            cpu_timings[step['op']] = cpu_timings.get(step['op'], 0) + _children_cpu() - cpu_started
+            if step['op'] == 'merge':
+                merged_bytes += os.path.getsize(path)
+    except Exception as e:
+        return {'status': 'error', 'message': f'Postprocessing failed: {str(e)}', 'timings': timings}
+
+    return {
+        'status': 'success',
+        'path': os.path.abspath(path) if path else None,
+        'seconds': time.time() - started,
+        'timings': timings,
+        'cpu_timings': cpu_timings,
+        'merged_bytes': merged_bytes,
+    }
+
+
+class MergeCostModel:
+    """Средняя цена склейки дорожек по замерам: время и CPU на мегабайт.
+
+    Нужна, чтобы оценить, сколько сэкономил выбор готового файла со звуком
+    вместо пары дорожек. CPU учитывается только там, где его можно измерить
+    (пул процессов постобработки); склейки yt-dlp дают только время.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.merges = 0
+        self.seconds = 0.0
+        self.bytes = 0
+        self.cpu_merges = 0
+        self.cpu_seconds = 0.0
+        self.cpu_bytes = 0
+
+    def record(self, seconds, size, cpu_seconds=None):
+        if not size:
+            return
+        with self._lock:
+            self.merges += 1
+            self.seconds += seconds
+            self.bytes += size
+            if cpu_seconds is not None:
+                self.cpu_merges += 1
+                self.cpu_seconds += cpu_seconds
+                self.cpu_bytes += size
+
+    def estimate(self, size):
+        """Ожидаемые время и CPU склейки файла размером size байт"""
+        mb = (size or 0) / MB
+        with self._lock:
+            if self.merges:
+                # Запуск ffmpeg не зависит от размера и вычитается из замеров
+                copying = max(0.0, self.seconds - MERGE_STARTUP_SECONDS * self.merges)
+                seconds_per_mb = copying / (self.bytes / MB)
+            else:
+                seconds_per_mb = MERGE_SECONDS_PER_MB
+            if self.cpu_merges:
+                cpu_per_mb = self.cpu_seconds / (self.cpu_bytes / MB)
+            else:
+                cpu_per_mb = MERGE_CPU_PER_MB
+        return {
+            'seconds': round(MERGE_STARTUP_SECONDS + seconds_per_mb * mb, 3),
+            'cpu_seconds': round(cpu_per_mb * mb, 3),
+            'measured': bool(self.merges),
+        }
+
+
+# Общая статистика склеек процесса
+merge_costs = MergeCostModel()
+
+
+class PostprocessStage:
+    """Отдельный пул процессов для ffmpeg с ограниченной очередью"""
+
+    def __init__(self, workers=None, queue_size=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size or self.workers * 2
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        # Поток загрузки ждет здесь, если очередь постобработки заполнена
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+
+    def submit(self, steps):
+        """Ставит цепочку в очередь; блокируется, пока в очереди нет места"""
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(run_steps, steps)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,193 @@
+import cProfile
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import tracemalloc
+
+MODES = ('cpu', 'memory', 'both')
+SCOPES = ('job', 'batch')
+# Доля задач, которые профилируются в режиме 'job'
+DEFAULT_SAMPLE = 0.1
+# Строк в снимке крупнейших выделений памяти
+TOP_ALLOCATIONS = 25
+# Глубина стека, которую запоминает tracemalloc для каждого выделения
+TRACEMALLOC_FRAMES = 10
+# С 3.12 cProfile работает через sys.monitoring: профилировщик один на процесс
+# и видит все потоки. До 3.12 он видит только поток, в котором включен
+GLOBAL_PROFILER = sys.version_info >= (3, 12)
+
+# Выделения самих профилировщиков и импорта не интересны
+_ALLOCATION_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, cProfile.__file__),
+    tracemalloc.Filter(False, pstats.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+)
+
+
+class _Handle:
+    """Профиль одной задачи или потока: cProfile и/или снимок памяти на старте"""
+
+    def __init__(self, name, profile=None, snapshot=None):
+        self.name = name
+        self.profile = profile
+        self.snapshot = snapshot
+        self.started = time.time()
+
+
+class JobProfiler:
+    """Выборочное профилирование задач (cProfile и tracemalloc).
+
+    В режиме 'job' профилируется доля sample задач (или задачи с
+    options['profile']); каждая пишет свои <prefix>_job<id>.pstats и
+    <prefix>_job<id>.alloc.txt. В режиме 'batch' профилируется весь
+    download_all: профили потоков складываются в один <prefix>_batch.pstats.
+    Профилируется поток задачи (экстрактор, хуки прогресса, ожидание ffmpeg
+    постпроцессорами yt-dlp); потоки сегментов и процессы ffmpeg-стадии — нет.
+    """
+
+    def __init__(self, directory=None, mode='cpu', scope='job', sample=DEFAULT_SAMPLE,
+                 top=TOP_ALLOCATIONS, prefix=None, seed=None):
+        if mode not in MODES:
+            raise ValueError(f'Unknown profiling mode: {mode}')
+        if scope not in SCOPES:
+            raise ValueError(f'Unknown profiling scope: {scope}')
+        self.directory = directory or os.path.join(os.getcwd(), 'data', 'reports')
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        self.mode = mode
+        self.scope = scope
+        self.sample = max(0.0, min(1.0, sample))
+        self.top = top
+        self.prefix = prefix or f"profile_{time.strftime('%Y%m%d_%H%M%S')}"
+        self.files = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        # Сколько профилей сейчас пользуются tracemalloc
+        self._tracing = 0
+        # tracemalloc мог включить кто-то другой (PYTHONTRACEMALLOC): тогда его не выключаем
+        self._started_tracing = False
+        self._batch = None
+        self._batch_stats = None
+
+    @property
+    def cpu(self):
+        return self.mode in ('cpu', 'both')
+
+    @property
+    def memory(self):
+        return self.mode in ('memory', 'both')
+
+    def start_job(self, job_id, force=False):
+        """Начинает профиль задачи, если она попала в выборку; None — не профилируется"""
+        if self.scope == 'batch':
+            return self.start_thread()
+        with self._lock:
+            sampled = force or self._random.random() < self.sample
+        if not sampled:
+            return None
+        return _Handle(f'job{job_id}', self._start_cpu(), self._start_memory())
+
+    def start_thread(self):
+        """Профиль текущего потока в составе партии (только до 3.12, дальше его видит общий)"""
+        if self._batch is None or not self.cpu or GLOBAL_PROFILER:
+            return None
+        profile = self._start_cpu()
+        return _Handle('thread', profile) if profile else None
+
+    def finish(self, handle):
+        """Завершает профиль; файлы задачи или None, если писать нечего"""
+        if handle is None:
+            return None
+        if handle.profile is not None:
+            handle.profile.disable()
+        if handle.name == 'thread':
+            self._add_to_batch(handle.profile)
+            return None
+        return self._write(handle)
+
+    def start_batch(self):
+        """Начинает профиль всего download_all в режиме 'batch'"""
+        if self.scope != 'batch':
+            return None
+        with self._lock:
+            self._batch_stats = None
+        self._batch = _Handle('batch', self._start_cpu(), self._start_memory())
+        return self._batch
+
+    def finish_batch(self, handle):
+        if handle is None:
+            return None
+        self._batch = None
+        if handle.profile is not None:
+            handle.profile.disable()
+            self._add_to_batch(handle.profile)
+        with self._lock:
+            handle.profile, self._batch_stats = self._batch_stats, None
+        return self._write(handle)
+
+    def _start_cpu(self):
+        if not self.cpu:
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # 3.12+: уже работает другой профилировщик (соседняя задача или отладчик)
+            return None
+        return profile
+
+    def _start_memory(self):
+        if not self.memory:
+            return None
+        with self._lock:
+            if self._tracing == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                self._started_tracing = True
+            self._tracing += 1
+        return tracemalloc.take_snapshot()
+
+    def _stop_memory(self):
+        with self._lock:
+            self._tracing -= 1
+            if self._tracing == 0 and self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+
+    def _add_to_batch(self, profile):
+        if profile is None:
+            return
+        with self._lock:
+            if self._batch_stats is None:
+                self._batch_stats = pstats.Stats(profile)
+            else:
+                self._batch_stats.add(profile)
+
+    def _write(self, handle):
+        files = {}
+        base = os.path.join(self.directory, f'{self.prefix}_{handle.name}')
+        if handle.profile is not None:
+            files['cpu'] = base + '.pstats'
+            handle.profile.dump_stats(files['cpu'])
+        if handle.snapshot is not None:
+            files['memory'] = base + '.alloc.txt'
+            self._write_allocations(handle, files['memory'])
+        with self._lock:
+            self.files.extend(files.values())
+        return files or None
+
+    def _write_allocations(self, handle, path):
+        """Крупнейшие выделения с начала профиля (включая соседние задачи в это время)"""
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces(_ALLOCATION_FILTERS)
+        self._stop_memory()
+        stats = snapshot.compare_to(handle.snapshot.filter_traces(_ALLOCATION_FILTERS), 'lineno')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f'# {handle.name}: {time.time() - handle.started:.2f}s, '
+                    f'traced {current / 1024 / 1024:.1f} MiB, peak {peak / 1024 / 1024:.1f} MiB\n')
+            for stat in stats[:self.top]:
+                f.write(f'{stat}\n')
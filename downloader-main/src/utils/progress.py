@@ -0,0 +1,121 @@
+import time
+import threading
+from collections import deque
+
+
+class ProgressStore:
+    """Потокобезопасное хранилище прогресса по id задачи.
+
+    Хуки загрузки пишут сюда сырые числа на каждый чанк, а интерфейс
+    сам опрашивает snapshot() с нужной частотой.
+    """
+
+    def __init__(self, keep_finished=1000):
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._finished = deque()
+        self.keep_finished = keep_finished
+        # Растет при каждом изменении: опрашивающий может пропустить кадр без изменений
+        self._version = 0
+
+    @property
+    def version(self):
+        """Номер версии без блокировки и копирования: чтение int атомарно"""
+        return self._version
+
+    def start(self, job_id, url):
+        with self._lock:
+            self._jobs[job_id] = {
+                'job_id': job_id,
+                'url': url,
+                'status': 'downloading',
+                'downloaded_bytes': 0,
+                'total_bytes': None,
+                'speed': None,
+                'eta': None,
+                'filename': None,
+                'started': time.time(),
+                'updated': time.time(),
+            }
+            self._version += 1
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            job['updated'] = time.time()
+            self._version += 1
+
+    def finish(self, job_id, status):
+        """Помечает задачу завершенной; старые завершенные записи вытесняются"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job['status'] = status
+            job['speed'] = None
+            job['eta'] = None
+            job['updated'] = time.time()
+            self._finished.append(job_id)
+            while len(self._finished) > self.keep_finished:
+                self._jobs.pop(self._finished.popleft(), None)
+            self._version += 1
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def find_by_url(self, url):
+        """Последняя задача для URL"""
+        with self._lock:
+            for job in reversed(list(self._jobs.values())):
+                if job['url'] == url:
+                    return dict(job)
+        return None
+
+    def snapshot(self, since=None):
+        """Копия состояния всех задач и номер версии.
+        Если версия не изменилась с since, копия не делается и вместо задач приходит None"""
+        with self._lock:
+            if since is not None and since == self._version:
+                return self._version, None
+            return self._version, {job_id: dict(job) for job_id, job in self._jobs.items()}
+
+    def get_totals(self):
+        """Суммарные байты и скорость по активным задачам"""
+        with self._lock:
+            active = [job for job in self._jobs.values() if job['status'] == 'downloading']
+            return {
+                'active': len(active),
+                'downloaded_bytes': sum(job['downloaded_bytes'] or 0 for job in active),
+                'total_bytes': sum(job['total_bytes'] or 0 for job in active),
+                'speed': sum(job['speed'] or 0 for job in active),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._jobs.clear()
+            self._finished.clear()
+            self._version += 1
+
+
+def format_bytes(value):
+    """Человекочитаемый размер: 1.5 MB"""
+    if value is None:
+        return 'N/A'
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(value) < 1024:
+            return f'{value:.1f} {unit}'
+        value /= 1024
+    return f'{value:.1f} TB'
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return 'N/A'
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours:d}:{minutes:02d}:{seconds:02d}' if hours else f'{minutes:02d}:{seconds:02d}'
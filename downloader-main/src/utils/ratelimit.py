@@ -0,0 +1,93 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Токен-бакет: не более rate запросов в секунду с запасом burst"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_consume(self, tokens=1):
+        """Забирает токен, если он есть"""
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def delay(self, tokens=1):
+        """Возвращает, сколько секунд ждать до появления токена"""
+        self._refill()
+        if self.tokens >= tokens:
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+
+class HostLimiter:
+    """Ограничивает число одновременных загрузок и частоту запросов к каждому хосту"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _get_host(self, host, max_concurrent=None, rate=None, burst=1):
+        state = self._hosts.get(host)
+        if state is None:
+            state = {
+                'active': 0,
+                'max_concurrent': max_concurrent,
+                'bucket': TokenBucket(rate, burst) if rate else None,
+            }
+            self._hosts[host] = state
+        return state
+
+    def configure(self, host, max_concurrent=None, rate=None, burst=1):
+        """Задает (или меняет) бюджет хоста"""
+        with self._lock:
+            state = self._get_host(host)
+            state['max_concurrent'] = max_concurrent
+            state['bucket'] = TokenBucket(rate, burst) if rate else None
+
+    def try_acquire(self, host, max_concurrent=None, rate=None, burst=1):
+        """Занимает слот хоста без ожидания; False, если бюджет исчерпан"""
+        with self._lock:
+            state = self._get_host(host, max_concurrent, rate, burst)
+            limit = state['max_concurrent']
+            if limit is not None and state['active'] >= limit:
+                return False
+            if state['bucket'] is not None and not state['bucket'].try_consume():
+                return False
+            state['active'] += 1
+            return True
+
+    def release(self, host):
+        """Освобождает слот хоста"""
+        with self._lock:
+            state = self._hosts.get(host)
+            if state and state['active'] > 0:
+                state['active'] -= 1
+
+    def delay(self, host):
+        """Сколько ждать до следующего токена (0, если хост ждет свободный слот)"""
+        with self._lock:
+            state = self._hosts.get(host)
+            if not state or state['bucket'] is None:
+                return 0.0
+            limit = state['max_concurrent']
+            if limit is not None and state['active'] >= limit:
+                return 0.0
+            return state['bucket'].delay()
+
+    def get_stats(self):
+        """Возвращает число активных загрузок по хостам"""
+        with self._lock:
+            return {host: state['active'] for host, state in self._hosts.items()}
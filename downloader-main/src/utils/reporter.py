@@ -1,6 +1,8 @@
 import os
 import time
 import json
+import sqlite3
+import threading
 
 class Reporter:
     def save_report(self, results):
@@ -42,4 +44,208 @@ class Reporter:
             return True
         except Exception as e:
             print(f"Error saving report: {e}")
-            return False
\ No newline at end of file
+            return False
+
+# Новый файл отчета начинается, когда текущий дорастает до этого размера
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+INDEX_NAME = 'index.sqlite'
+# Поля результата, которые не пишутся в отчет (future постобработки и т.п.)
+SKIPPED_FIELDS = ('postprocess',)
+
+
+def make_record(url, result, job=None, platform=None, job_id=None):
+    """Строка отчета: итог задачи, время, байты и класс ошибки"""
+    now = time.time()
+    job = job or {}
+    started = job.get('started')
+    downloaded = job.get('downloaded_bytes') or 0
+    path = result.get('path')
+    if not downloaded and path and os.path.exists(path):
+        downloaded = os.path.getsize(path)
+    record = {
+        'ts': now,
+        'url': url,
+        'platform': platform,
+        'job_id': job_id,
+        'status': result.get('status'),
+        'started': started,
+        'elapsed': round(now - started, 3) if started else None,
+        'bytes': downloaded,
+        'error_class': result.get('error_class'),
+    }
+    for key, value in result.items():
+        if key not in record and key not in SKIPPED_FIELDS:
+            record[key] = value
+    return record
+
+
+class ReportWriter:
+    """Пишет отчет построчно в JSONL по мере завершения задач.
+
+    Каждая строка сразу сбрасывается на диск, поэтому падение не теряет отчет,
+    а результаты не копятся в памяти до конца пачки. Файлы ротируются по
+    размеру; сводка по дням, площадкам и ошибкам попадает в ReportIndex.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES, index=True):
+        self.directory = directory or os.path.join(os.getcwd(), 'data', 'reports')
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        self.max_bytes = max_bytes
+        self.index = ReportIndex(os.path.join(self.directory, INDEX_NAME)) if index else None
+        self.session = time.strftime('%Y%m%d_%H%M%S')
+        self.path = None
+        self._part = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        suffix = f'.{self._part}' if self._part else ''
+        self.path = os.path.join(self.directory, f'report_{self.session}{suffix}.jsonl')
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._part += 1
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            if self._file is None:
+                self._open()
+            elif self._file.tell() + len(line) > self.max_bytes:
+                self._file.close()
+                self._open()
+            self._file.write(line)
+            self._file.flush()
+            path, size = self.path, self._file.tell()
+        if self.index:
+            self.index.add(record, path, size)
+
+    def add_result(self, url, result, job=None, platform=None, job_id=None):
+        self.write(make_record(url, result, job, platform, job_id))
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class ReportIndex:
+    """Компактная сводка прошлых отчетов в SQLite: счетчики по дням,
+    площадкам, статусам и классам ошибок. Отвечает на вопросы вроде
+    «ошибки по площадкам за неделю», не перечитывая сами отчеты"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS daily (
+                day TEXT NOT NULL,
+                platform TEXT NOT NULL,
+                status TEXT NOT NULL,
+                error_class TEXT NOT NULL,
+                items INTEGER NOT NULL,
+                bytes INTEGER NOT NULL,
+                seconds REAL NOT NULL,
+                PRIMARY KEY (day, platform, status, error_class)
+            )
+        ''')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                first REAL NOT NULL,
+                last REAL NOT NULL,
+                items INTEGER NOT NULL,
+                size INTEGER NOT NULL
+            )
+        ''')
+        self._conn.commit()
+
+    def add(self, record, path, size):
+        with self._lock:
+            self._insert(record, path, size)
+            self._conn.commit()
+
+    def _insert(self, record, path, size):
+        ts = record.get('ts') or time.time()
+        key = (
+            time.strftime('%Y-%m-%d', time.localtime(ts)),
+            record.get('platform') or '',
+            record.get('status') or '',
+            record.get('error_class') or '',
+        )
+        self._conn.execute('''
+            INSERT INTO daily (day, platform, status, error_class, items, bytes, seconds)
+            VALUES (?, ?, ?, ?, 1, ?, ?)
+            ON CONFLICT (day, platform, status, error_class) DO UPDATE SET
+                items = items + 1, bytes = bytes + excluded.bytes, seconds = seconds + excluded.seconds
+        ''', key + (record.get('bytes') or 0, record.get('elapsed') or 0))
+        self._conn.execute('''
+            INSERT INTO files (path, first, last, items, size) VALUES (?, ?, ?, 1, ?)
+            ON CONFLICT (path) DO UPDATE SET last = excluded.last, items = items + 1, size = excluded.size
+        ''', (os.path.abspath(path), ts, ts, size))
+
+    def query(self, since=None, until=None, status=None, platform=None, group_by=('platform', 'status')):
+        """Суммы items/bytes/seconds, сгруппированные по group_by
+        (day, platform, status, error_class); since/until — timestamp"""
+        columns = [column for column in group_by if column in ('day', 'platform', 'status', 'error_class')]
+        where, params = [], []
+        if since is not None:
+            where.append('day >= ?')
+            params.append(time.strftime('%Y-%m-%d', time.localtime(since)))
+        if until is not None:
+            where.append('day <= ?')
+            params.append(time.strftime('%Y-%m-%d', time.localtime(until)))
+        if status is not None:
+            where.append('status = ?')
+            params.append(status)
+        if platform is not None:
+            where.append('platform = ?')
+            params.append(platform)
+        select = ', '.join(columns + ['SUM(items)', 'SUM(bytes)', 'SUM(seconds)'])
+        sql = f'SELECT {select} FROM daily'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        if columns:
+            sql += ' GROUP BY ' + ', '.join(columns) + ' ORDER BY ' + ', '.join(columns)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            dict(zip(columns, row[:len(columns)]),
+                 items=row[-3] or 0, bytes=row[-2] or 0, seconds=row[-1] or 0.0)
+            for row in rows
+        ]
+
+    def failures(self, days=7):
+        """Ошибки по площадкам и классам за последние days дней"""
+        return self.query(since=time.time() - days * 86400, status='error',
+                          group_by=('platform', 'error_class'))
+
+    def files(self):
+        with self._lock:
+            rows = self._conn.execute('SELECT path, first, last, items, size FROM files ORDER BY first').fetchall()
+        return [dict(zip(('path', 'first', 'last', 'items', 'size'), row)) for row in rows]
+
+    def rebuild(self, directory):
+        """Пересобирает сводку по всем JSONL отчетам каталога; старые txt пропускаются"""
+        with self._lock:
+            self._conn.execute('DELETE FROM daily')
+            self._conn.execute('DELETE FROM files')
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith('.jsonl'):
+                    continue
+                path = os.path.join(directory, name)
+                size = os.path.getsize(path)
+                with open(path, encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            # Недописанная строка после падения
+                            continue
+                        self._insert(record, path, size)
+            self._conn.commit()
@@ -0,0 +1,286 @@
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.http import http_pool
+
+# Соединений на файл по умолчанию
+DEFAULT_CONNECTIONS = 4
+# Меньше этого сегмент не делится: на коротких клипах лишние соединения только мешают
+MIN_SEGMENT_SIZE = 1024 * 1024
+CHUNK_SIZE = 256 * 1024
+TIMEOUT = 30
+RETRIES = 3
+# Рядом с .part хранятся границы сегментов и докачанные смещения: прерванная загрузка продолжается
+CONTROL_SUFFIX = '.segments'
+# Как часто смещения сегментов сбрасываются на диск (секунды)
+SAVE_INTERVAL = 1.0
+
+_CONTENT_RANGE_RE = re.compile(r'bytes (\d+)-(\d+)/(\d+)')
+
+
+class RangeNotSupported(Exception):
+    pass
+
+
+class SegmentedDownloader:
+    """Качает прогрессивный файл диапазонами байт в несколько соединений.
+
+    Сегменты пишутся по своим смещениям в заранее выделенный .part файл,
+    а их границы и докачанные смещения — в <.part>.segments. Прерванная
+    загрузка продолжает каждый сегмент с его места; .part без этого файла
+    (от загрузчика yt-dlp) считается сплошным и докачивается с конца.
+    Если сервер не отдает Range, файл качается одним потоком. Хуки получают
+    словари в формате progress_hooks yt-dlp, поэтому прогресс, регулятор
+    полосы и отмена работают так же, как при обычной загрузке.
+    """
+
+    def __init__(self, connections=DEFAULT_CONNECTIONS, session=None, chunk_size=CHUNK_SIZE):
+        self.connections = max(1, connections)
+        self.chunk_size = chunk_size
+        self._session = session
+
+    @property
+    def session(self):
+        # По умолчанию соединения берутся из общего пула процесса
+        return self._session or http_pool.session
+
+    def download(self, url, path, headers=None, hooks=(), proxy=None):
+        """Скачивает url в path (докачивая оставшийся .part) и возвращает число байт"""
+        tmp_path = path + '.part'
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        state = _TransferState(path, tmp_path, hooks)
+        request = {
+            'headers': dict(headers or {}),
+            'proxies': {'http': proxy, 'https': proxy} if proxy else None,
+            'timeout': TIMEOUT,
+            # Счетчики соединений задачи переходят в потоки сегментов
+            'stats': http_pool.current(),
+        }
+
+        # Пробный запрос первого байта заодно узнает размер файла
+        probe = self.session.get(url, headers=dict(request['headers'], Range='bytes=0-0'),
+                                 stream=True, proxies=request['proxies'], timeout=TIMEOUT)
+        probe.raise_for_status()
+        match = _CONTENT_RANGE_RE.match(probe.headers.get('Content-Range', ''))
+        if probe.status_code != 206 or not match:
+            # Range не поддерживается: тело этого же ответа и есть весь файл
+            state.total_bytes = int(probe.headers.get('Content-Length') or 0) or None
+            with open(tmp_path, 'wb') as f:
+                self._write_response(probe, f, state, {'position': 0})
+            return state.finish()
+        probe.close()
+
+        total = int(match.group(3))
+        state.total_bytes = total
+        segments = self._resume(tmp_path, total)
+        if segments is None:
+            segments = self._split(0, total)
+            # Файл смещений пишется до выделения .part: иначе выделенный файл
+            # после падения выглядел бы скачанным
+            state.segments = segments
+            state.save()
+            with open(tmp_path, 'wb') as f:
+                f.truncate(total)
+        else:
+            state.segments = segments
+            state.resume(sum(segment['position'] - segment['start'] for segment in segments))
+
+        try:
+            remaining = [segment for segment in segments if segment['position'] <= segment['end']]
+            if len(remaining) <= 1:
+                for segment in remaining:
+                    self._download_segment(url, request, segment, state)
+                return state.finish()
+
+            with ThreadPoolExecutor(max_workers=len(remaining), thread_name_prefix='segment') as pool:
+                futures = [pool.submit(self._download_segment, url, request, segment, state)
+                           for segment in remaining]
+                for future in futures:
+                    exception = future.exception()
+                    if exception is not None:
+                        state.abort.set()
+                        # Наружу уходит первая ошибка; остальные потоки уже остановлены
+                        for other in futures:
+                            other.exception()
+                        raise exception
+            return state.finish()
+        finally:
+            # Смещения сохраняются и при ошибке, и при отмене; после успеха файл удален
+            if os.path.exists(tmp_path):
+                state.save()
+
+    def _resume(self, tmp_path, total):
+        """Сегменты прерванной загрузки того же размера или None, если качать с нуля"""
+        if not os.path.exists(tmp_path):
+            return None
+        try:
+            with open(tmp_path + CONTROL_SUFFIX, encoding='utf-8') as f:
+                control = json.load(f)
+        except FileNotFoundError:
+            # .part загрузчика yt-dlp (или потоковой загрузки): байты идут подряд с начала
+            size = os.path.getsize(tmp_path)
+            if not 0 < size < total:
+                return None
+            with open(tmp_path, 'r+b') as f:
+                f.truncate(total)
+            return [{'start': 0, 'end': size - 1, 'position': size}] + self._split(size, total)
+        except (OSError, ValueError):
+            return None
+        if control.get('total') != total or os.path.getsize(tmp_path) != total:
+            return None
+        return control['segments']
+
+    def _split(self, offset, total):
+        """Делит диапазон [offset, total) на сегменты; position — следующий байт сегмента"""
+        size = total - offset
+        count = max(1, min(self.connections, size // MIN_SEGMENT_SIZE))
+        step = size // count
+        segments = []
+        for i in range(count):
+            start = offset + i * step
+            end = total - 1 if i == count - 1 else start + step - 1
+            segments.append({'start': start, 'end': end, 'position': start})
+        return segments
+
+    def _download_segment(self, url, request, segment, state):
+        previous = http_pool.bind(request['stats'])
+        try:
+            self._fetch_segment(url, request, segment, state)
+        finally:
+            http_pool.bind(previous)
+
+    def _fetch_segment(self, url, request, segment, state):
+        start, end = segment['start'], segment['end']
+        for attempt in range(RETRIES):
+            position = segment['position']
+            try:
+                response = self.session.get(
+                    url, headers=dict(request['headers'], Range=f'bytes={position}-{end}'),
+                    stream=True, proxies=request['proxies'], timeout=request['timeout']
+                )
+                if response.status_code != 206:
+                    response.close()
+                    raise RangeNotSupported(f'HTTP {response.status_code} for range {position}-{end}')
+                # Без буфера Python: сохраненное смещение не опережает записанные байты
+                with open(state.tmp_path, 'r+b', buffering=0) as f:
+                    f.seek(position)
+                    self._write_response(response, f, state, segment)
+                if segment['position'] > end or state.abort.is_set():
+                    return
+            except RangeNotSupported:
+                raise
+            except OSError:
+                # Обрыв соединения: докачиваем сегмент с места остановки
+                if state.abort.is_set() or attempt == RETRIES - 1:
+                    raise
+                state.retry()
+        raise IOError(f'Segment {start}-{end} is incomplete')
+
+    def _write_response(self, response, f, state, progress):
+        """Пишет тело ответа; progress['position'] сдвигается после каждого чанка,
+        чтобы повтор после обрыва продолжил с нужного места"""
+        try:
+            for chunk in response.iter_content(self.chunk_size):
+                if state.abort.is_set():
+                    break
+                f.write(chunk)
+                progress['position'] += len(chunk)
+                state.advance(len(chunk))
+        finally:
+            response.close()
+
+
+class _TransferState:
+    """Общий счетчик байт сегментов и вызов хуков прогресса"""
+
+    def __init__(self, path, tmp_path, hooks):
+        self.path = path
+        self.tmp_path = tmp_path
+        self.hooks = list(hooks)
+        self.total_bytes = None
+        self.downloaded_bytes = 0
+        # Байты, скачанные до перезапуска: в скорость не входят
+        self.resumed_bytes = 0
+        self.segments = None
+        self.retries = 0
+        self._saved = 0.0
+        self.started = time.time()
+        self.abort = threading.Event()
+        # Хуки вызываются по очереди: пауза регулятора полосы в одном потоке
+        # придерживает и остальные сегменты
+        self._lock = threading.Lock()
+
+    def retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def resume(self, size):
+        self.downloaded_bytes = self.resumed_bytes = size
+
+    def save(self):
+        """Сбрасывает смещения сегментов в файл рядом с .part"""
+        if self.segments is None:
+            return
+        with self._lock:
+            control = {'total': self.total_bytes, 'segments': [dict(segment) for segment in self.segments]}
+            self._saved = time.time()
+        tmp = self.tmp_path + CONTROL_SUFFIX + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(control, f)
+        os.replace(tmp, self.tmp_path + CONTROL_SUFFIX)
+
+    def advance(self, size):
+        with self._lock:
+            self.downloaded_bytes += size
+            elapsed = time.time() - self.started
+            done = self.downloaded_bytes - self.resumed_bytes
+            speed = done / elapsed if elapsed > 0 else None
+            eta = None
+            if speed and self.total_bytes:
+                eta = (self.total_bytes - self.downloaded_bytes) / speed
+            self._call_hooks({
+                'status': 'downloading',
+                'filename': self.path,
+                'tmpfilename': self.tmp_path,
+                'downloaded_bytes': self.downloaded_bytes,
+                'total_bytes': self.total_bytes,
+                'speed': speed,
+                'eta': eta,
+                'elapsed': elapsed,
+                'retries': self.retries,
+            })
+            save = self.segments is not None and time.time() - self._saved >= SAVE_INTERVAL
+        if save:
+            self.save()
+
+    def finish(self):
+        if self.abort.is_set():
+            raise IOError('Download aborted')
+        if self.total_bytes and self.downloaded_bytes < self.total_bytes:
+            raise IOError(f'Downloaded {self.downloaded_bytes} of {self.total_bytes} bytes')
+        os.replace(self.tmp_path, self.path)
+        if self.segments is not None:
+            os.remove(self.tmp_path + CONTROL_SUFFIX)
+        self._call_hooks({
+            'status': 'finished',
+            'filename': self.path,
+            'downloaded_bytes': self.downloaded_bytes,
+            'total_bytes': self.downloaded_bytes,
+            'elapsed': time.time() - self.started,
+        })
+        return self.downloaded_bytes
+
+    def _call_hooks(self, d):
+        try:
+            for hook in self.hooks:
+                hook(d)
+        except BaseException:
+            # Исключение из хука (например, отмена) останавливает все сегменты
+            self.abort.set()
+            raise
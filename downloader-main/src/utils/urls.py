@@ -0,0 +1,123 @@
+import itertools
+from functools import lru_cache
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+# Параметры, которые добавляют площадки и мессенджеры при шаринге
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'yclid', 'igshid', 'igsh', 'si', 'feature', 'pp',
+    'is_from_webapp', 'is_copy_url', 'sender_device', 'sender_web_id',
+    'share_app_id', 'share_author_id', 'share_link_id', 'share_item_id',
+    'social_sharing', 'tt_from', 'u_code', 'timestamp', 'checksum',
+    'mibextid', 'ref', 'ref_src', '_r', '_t', 'rdid',
+}
+TRACKING_PREFIXES = ('utm_',)
+
+# Короткие ссылки, которые нужно раскрыть запросом, чтобы узнать id видео
+SHORT_LINK_HOSTS = {'vm.tiktok.com', 'vt.tiktok.com', 'vk.cc', 'fb.watch', 'on.soundcloud.com'}
+
+# Зеркала и мобильные версии, приводимые к адресу, который понимают экстракторы
+HOST_ALIASES = {
+    'youtube.com': 'www.youtube.com',
+    'm.youtube.com': 'www.youtube.com',
+    'tiktok.com': 'www.tiktok.com',
+    'm.tiktok.com': 'www.tiktok.com',
+    'www.vk.com': 'vk.com',
+    'm.vk.com': 'vk.com',
+    'facebook.com': 'www.facebook.com',
+    'm.facebook.com': 'www.facebook.com',
+    'instagram.com': 'www.instagram.com',
+}
+
+# Группы _VALID_URL, в которых экстракторы держат id видео (VK — videoid)
+ID_GROUPS = ('id', 'video_id', 'videoid')
+
+
+def strip_tracking(url):
+    """Убирает трекинг-параметры и якорь, приводит хост к основному, не обращаясь к сети"""
+    parts = urlparse(url.strip())
+    netloc = parts.netloc.lower()
+    netloc = HOST_ALIASES.get(netloc, netloc)
+
+    path = parts.path
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in TRACKING_PARAMS and not key.startswith(TRACKING_PREFIXES)
+    ]
+
+    # youtu.be/ID -> youtube.com/watch?v=ID
+    if netloc == 'youtu.be' and path.strip('/'):
+        query = [('v', path.strip('/'))] + [(k, v) for k, v in query if k != 'v']
+        netloc, path = 'www.youtube.com', '/watch'
+    elif path != '/':
+        path = path.rstrip('/')
+
+    return urlunparse((parts.scheme.lower() or 'https', netloc, path, '', urlencode(query), ''))
+
+
+@lru_cache(maxsize=4096)
+def resolve_short_link(url, timeout=10):
+    """Раскрывает короткую ссылку (vm.tiktok.com и т.п.) по редиректам"""
+    import requests
+    from utils.http import http_pool
+
+    try:
+        response = http_pool.session.head(url, allow_redirects=True, timeout=timeout)
+        return response.url
+    except requests.RequestException:
+        return url
+
+
+def canonicalize_url(url, resolve=True):
+    """Канонический URL: раскрытая короткая ссылка без трекинг-параметров"""
+    if resolve and urlparse(url.strip()).netloc.lower() in SHORT_LINK_HOSTS:
+        url = resolve_short_link(url.strip())
+    return strip_tracking(url)
+
+
+def _fallback_id(ie, url):
+    """id из другой группы _VALID_URL: get_temp_id знает только группу 'id'"""
+    match = ie._match_valid_url(url)
+    if match is None:
+        return None
+    groups = match.groupdict()
+    return next((groups[name] for name in ID_GROUPS if groups.get(name)), None)
+
+
+@lru_cache(maxsize=16384)
+def get_video_key(url):
+    """Возвращает (экстрактор, id видео) без загрузки страницы или None"""
+    from yt_dlp.extractor import gen_extractor_classes
+
+    for ie in gen_extractor_classes():
+        if ie.ie_key() == 'Generic' or not ie.suitable(url):
+            continue
+        try:
+            video_id = ie.get_temp_id(url) or _fallback_id(ie, url)
+        except Exception:
+            video_id = None
+        if video_id:
+            return ie.ie_key().lower(), str(video_id)
+        return None
+    return None
+
+
+@lru_cache(maxsize=16384)
+def get_return_type(url, extractors=()):
+    """Что вернет экстрактор без загрузки страницы: 'video', 'playlist', 'any' или None (неизвестно).
+    extractors — дополнительные классы, которые проверяются раньше встроенных (как в пуле YoutubeDL)"""
+    from yt_dlp.extractor import gen_extractor_classes
+
+    for ie in itertools.chain(extractors, gen_extractor_classes()):
+        if ie.ie_key() == 'Generic' or not ie.suitable(url):
+            continue
+        return ie._RETURN_TYPE
+    return None
+
+
+def make_archive_key(info):
+    """Ключ архива по info dict от yt-dlp (совпадает с форматом --download-archive)"""
+    extractor = info.get('extractor_key') or info.get('ie_key')
+    video_id = info.get('id')
+    if not extractor or not video_id:
+        return None
+    return extractor.lower(), str(video_id)
@@ -0,0 +1,126 @@
+import json
+import threading
+from contextlib import contextmanager
+
+from utils.http import http_pool
+
+# Опции, которые меняются от задачи к задаче и не влияют на ключ пула
+PER_ITEM_OPTIONS = ('outtmpl', 'progress_hooks', 'postprocessor_hooks')
+
+
+class _PooledYDL:
+    """Прогретый YoutubeDL, хуки которого подменяются на время аренды"""
+
+    def __init__(self, opts, extractors=()):
+        import yt_dlp
+
+        self.progress_hooks = []
+        self.postprocessor_hooks = []
+        base_opts = {k: v for k, v in opts.items() if k not in PER_ITEM_OPTIONS}
+        base_opts['progress_hooks'] = [self._on_progress]
+        base_opts['postprocessor_hooks'] = [self._on_postprocess]
+        self.ydl = yt_dlp.YoutubeDL(base_opts)
+        # Метаданные, превью и медиа идут через общий пул соединений процесса
+        http_pool.attach(self.ydl)
+        if extractors:
+            self._add_extractors(extractors)
+        self.default_outtmpl = self.ydl.params['outtmpl']['default']
+
+    def _add_extractors(self, extractors):
+        # Свои экстракторы проверяются раньше встроенных: Generic принимает любой URL
+        for ie in extractors:
+            self.ydl.add_info_extractor(ie())
+        own = [ie.ie_key() for ie in extractors]
+        ies = self.ydl._ies
+        self.ydl._ies = {**{key: ies[key] for key in own},
+                         **{key: ie for key, ie in ies.items() if key not in own}}
+
+    def _on_progress(self, d):
+        for hook in self.progress_hooks:
+            hook(d)
+
+    def _on_postprocess(self, d):
+        for hook in self.postprocessor_hooks:
+            hook(d)
+
+    def prepare(self, opts):
+        """Применяет опции конкретной задачи"""
+        outtmpl = opts.get('outtmpl')
+        if isinstance(outtmpl, dict):
+            self.ydl.params['outtmpl'].update(outtmpl)
+        elif outtmpl:
+            self.ydl.params['outtmpl']['default'] = outtmpl
+        self.progress_hooks = list(opts.get('progress_hooks', []))
+        self.postprocessor_hooks = list(opts.get('postprocessor_hooks', []))
+
+    def reset(self):
+        self.ydl.params['outtmpl']['default'] = self.default_outtmpl
+        self.progress_hooks = []
+        self.postprocessor_hooks = []
+
+
+class YDLPool:
+    """Пул экземпляров yt_dlp.YoutubeDL, сгруппированных по эффективным опциям"""
+
+    def __init__(self, max_idle_per_key=8):
+        self.max_idle_per_key = max_idle_per_key
+        self._lock = threading.Lock()
+        self._idle = {}
+        # Дополнительные классы InfoExtractor для всех новых экземпляров
+        self.extractors = []
+        self.stats = {'created': 0, 'reused': 0}
+
+    @staticmethod
+    def make_key(opts):
+        """Ключ пула: все опции, кроме шаблона имени и хуков"""
+        shared = {k: v for k, v in opts.items() if k not in PER_ITEM_OPTIONS}
+        return json.dumps(shared, sort_keys=True, default=repr)
+
+    def _acquire(self, key, opts):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.stats['reused'] += 1
+                return idle.pop()
+            self.stats['created'] += 1
+        return _PooledYDL(opts, self.extractors)
+
+    def add_extractor(self, ie):
+        """Регистрирует класс InfoExtractor (например, фейковый для бенчмарков)
+        во всех экземплярах пула; уже прогретые экземпляры закрываются"""
+        with self._lock:
+            if ie not in self.extractors:
+                self.extractors.append(ie)
+        self.clear()
+
+    def _release(self, key, pooled):
+        pooled.reset()
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_key:
+                idle.append(pooled)
+                return
+        pooled.ydl.close()
+
+    @contextmanager
+    def lease(self, opts):
+        """Выдает YoutubeDL в монопольное пользование на время одной задачи"""
+        key = self.make_key(opts)
+        pooled = self._acquire(key, opts)
+        pooled.prepare(opts)
+        try:
+            yield pooled.ydl
+        finally:
+            self._release(key, pooled)
+
+    def clear(self):
+        """Закрывает все простаивающие экземпляры"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for instances in idle.values():
+            for pooled in instances:
+                pooled.ydl.close()
+
+
+# Общий пул процесса: его используют все загрузчики и плагины
+ydl_pool = YDLPool()
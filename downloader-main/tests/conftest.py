@@ -0,0 +1,191 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Модули src импортируют друг друга как верхнеуровневые (utils.*, core.*), benchmarks — из корня
+for path in (os.path.join(ROOT, 'src'), ROOT):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+FAKE_FFMPEG = '''
+import os
+import sys
+
+# Понимает ровно те аргументы, которые передают utils.postprocess и core.format_detector
+FLAGS = {'-y', '-hide_banner', '-nostdin', '-vn'}
+args = sys.argv[1:]
+with open(os.environ['FAKE_FFMPEG_LOG'], 'a', encoding='utf-8') as log:
+    log.write(' '.join(args) + '\\n')
+inputs, output, i = [], None, 0
+while i < len(args):
+    if args[i] == '-i':
+        inputs.append(args[i + 1])
+        i += 2
+    elif args[i] in FLAGS:
+        i += 1
+    elif args[i].startswith('-'):
+        i += 2
+    else:
+        output = args[i]
+        i += 1
+data = []
+for number, path in enumerate(inputs):
+    try:
+        with open(path, 'rb') as f:
+            data.append(f.read())
+    except OSError:
+        sys.exit(f'{path}: No such file or directory')
+    print(f"Input #{number}, mov,mp4, from '{path}':", file=sys.stderr)
+    # Файл с числом внутри изображает видео такой длительности
+    try:
+        seconds = float(data[-1])
+    except ValueError:
+        continue
+    print(f'  Duration: 00:{int(seconds // 60):02d}:{seconds % 60:05.2f}, start: 0.000000', file=sys.stderr)
+if output is None:
+    sys.exit('At least one output file must be specified')
+with open(output, 'wb') as f:
+    f.write(b''.join(data))
+'''
+
+FAKE_FFPROBE = '''
+import os
+import sys
+
+with open(os.environ['FAKE_FFMPEG_LOG'], 'a', encoding='utf-8') as log:
+    log.write('ffprobe ' + sys.argv[-1] + '\\n')
+try:
+    with open(sys.argv[-1], 'rb') as f:
+        print(float(f.read()))
+except (OSError, ValueError):
+    sys.exit(1)
+'''
+
+
+class FakeFFmpeg:
+    def __init__(self, log):
+        self.log = log
+
+    def calls(self):
+        if not os.path.exists(self.log):
+            return []
+        with open(self.log, encoding='utf-8') as f:
+            return f.read().splitlines()
+
+
+@pytest.fixture
+def ffmpeg(tmp_path, monkeypatch):
+    """ffmpeg/ffprobe на PATH, которые копируют входы и сообщают длительность из содержимого файла"""
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    for name, source in (('ffmpeg', FAKE_FFMPEG), ('ffprobe', FAKE_FFPROBE)):
+        script = bin_dir / name
+        script.write_text(f'#!{sys.executable}\n{source}', encoding='utf-8')
+        script.chmod(0o755)
+    monkeypatch.setenv('PATH', str(bin_dir) + os.pathsep + os.environ.get('PATH', ''))
+    monkeypatch.setenv('FAKE_FFMPEG_LOG', str(tmp_path / 'ffmpeg.log'))
+    return FakeFFmpeg(str(tmp_path / 'ffmpeg.log'))
+
+
+class _LocalHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        payload = server.payload
+        ranged = server.ranges and 'Range' in self.headers
+        with server.lock:
+            server.requests += 1
+            # Пробный запрос первого байта не рвется
+            drop = server.drops > 0 and ranged and self.headers['Range'] != 'bytes=0-0'
+            if drop:
+                server.drops -= 1
+        start, end = 0, len(payload) - 1
+        if ranged:
+            first, _, last = self.headers['Range'][len('bytes='):].partition('-')
+            start, end = int(first), min(int(last or end), end)
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(payload)}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        body = payload[start:end + 1]
+        if drop:
+            # Соединение рвется посреди ответа
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+class LocalServer(ThreadingHTTPServer):
+    """HTTP/1.1 сервер с keep-alive, который отдает payload по любому пути.
+    ranges=False — Range игнорируется, drops — сколько ответов на Range оборвать"""
+    daemon_threads = True
+
+    def __init__(self, payload, ranges=True, drops=0):
+        super().__init__(('127.0.0.1', 0), _LocalHandler)
+        self.payload = payload
+        self.ranges = ranges
+        self.drops = drops
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.base_url = f'http://127.0.0.1:{self.server_address[1]}'
+        self.url = f'{self.base_url}/media/a.mp4'
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+@pytest.fixture
+def local_server():
+    return LocalServer
+
+
+@pytest.fixture(scope='session')
+def media_server():
+    """Локальный FakeMediaServer: /watch/<id> отдает маленький mp4"""
+    from benchmarks.fake_server import FakeMediaServer
+
+    with FakeMediaServer(size=64 * 1024) as server:
+        yield server
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Архив, кэши и отчеты по умолчанию пишутся в data/ текущего каталога"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def media_downloader(workdir):
+    """VideoDownloader, который качает с media_server через FakeMediaIE"""
+    from benchmarks.fake_extractor import FakeMediaIE
+    from downloader import VideoDownloader
+    from utils.ydl_pool import ydl_pool
+
+    ydl_pool.add_extractor(FakeMediaIE)
+    output = str(workdir / 'out')
+    instance = VideoDownloader(max_workers=2)
+    instance.set_download_dir(output)
+    instance.set_options({
+        'quality': '720p',
+        'output_dir': output,
+        'metadata_cache': False,
+    })
+    return instance
@@ -0,0 +1,26 @@
+from utils.archive import DownloadArchive
+
+
+def test_lines_use_download_archive_format(tmp_path):
+    path = tmp_path / 'archive' / 'archive.txt'
+    archive = DownloadArchive(str(path))
+    archive.add(('youtube', 'dQw4w9WgXcQ'))
+    archive.add(('youtube', 'dQw4w9WgXcQ'))
+
+    assert path.read_text(encoding='utf-8') == 'youtube dQw4w9WgXcQ\n'
+    assert ('youtube', 'dQw4w9WgXcQ') in DownloadArchive(str(path))
+
+
+def test_claim_blocks_duplicates_in_flight(tmp_path):
+    archive = DownloadArchive(str(tmp_path / 'archive.txt'))
+    key = ('vk', '-1_2')
+
+    assert archive.claim(key)
+    assert not archive.claim(key)
+    # Неудачная загрузка освобождает ключ для повтора
+    archive.release(key)
+    assert archive.claim(key)
+    archive.add(key)
+    archive.release(key)
+    assert not archive.claim(key)
+    assert len(archive) == 1
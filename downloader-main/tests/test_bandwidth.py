@@ -0,0 +1,111 @@
+import pytest
+
+from utils import bandwidth as bandwidth_module
+from utils.bandwidth import BULK, INTERACTIVE, MIN_RATE, BandwidthGovernor
+
+KB = 1024
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(bandwidth_module.time, 'monotonic', clock)
+    return clock
+
+
+def _rates(governor):
+    return {job_id: job['rate'] for job_id, job in governor._jobs.items()}
+
+
+def test_no_limit_means_no_pauses(clock):
+    governor = BandwidthGovernor()
+    governor.attach(1, BULK)
+
+    assert governor.pace(1, 0) == 0
+    assert governor.pace(1, 10 * 1024 * KB) == 0
+
+
+def test_limit_is_split_by_class_weight(clock):
+    governor = BandwidthGovernor(limit=500 * KB)
+    governor.attach('ui', INTERACTIVE)
+    governor.attach('bg', BULK)
+
+    assert _rates(governor) == {'ui': 400 * KB, 'bg': 100 * KB}
+    governor.detach('ui')
+    assert _rates(governor) == {'bg': 500 * KB}
+
+
+def test_unused_share_goes_to_other_jobs(clock):
+    governor = BandwidthGovernor(limit=500 * KB)
+    governor.attach('ui', INTERACTIVE)
+    governor.attach('bg', BULK)
+    clock.now += 1
+    # Срочная задача упирается в сервер и берет меньше своей доли
+    governor.pace('ui', 0, speed=80 * KB)
+
+    assert _rates(governor) == {'ui': 100 * KB, 'bg': 400 * KB}
+
+
+def test_rate_never_drops_below_minimum(clock):
+    governor = BandwidthGovernor(limit=1)
+    governor.attach(1, BULK)
+
+    assert _rates(governor) == {1: MIN_RATE}
+
+
+def test_pace_holds_job_to_its_rate(clock):
+    governor = BandwidthGovernor(limit=100 * KB)
+    governor.attach(1, BULK)
+    governor.pace(1, 0)
+
+    clock.now += 0.5
+    assert governor.pace(1, 50 * KB) == pytest.approx(0)
+    # Сто килобайт за полсекунды: нужно подождать еще полсекунды
+    assert governor.pace(1, 100 * KB) == pytest.approx(0.5)
+
+
+def test_lowering_limit_mid_file_does_not_stall(clock):
+    governor = BandwidthGovernor(limit=100 * KB)
+    governor.attach(1, BULK)
+    governor.pace(1, 0)
+    clock.now += 1
+    governor.pace(1, 100 * KB)
+
+    governor.set_limit(50 * KB)
+    governor.pace(1, 100 * KB)
+    # Пауза считается по новому лимиту от момента смены, а не от начала файла
+    assert governor.pace(1, 150 * KB) == pytest.approx(1.0)
+
+
+def test_raising_limit_does_not_allow_catch_up_burst(clock):
+    governor = BandwidthGovernor(limit=100 * KB)
+    governor.attach(1, BULK)
+    governor.pace(1, 0)
+    # Две секунды сервер отдавал медленнее лимита
+    clock.now += 2
+    governor.pace(1, 50 * KB)
+
+    governor.set_limit(200 * KB)
+    governor.pace(1, 50 * KB)
+    assert governor.pace(1, 250 * KB) == pytest.approx(1.0)
+
+
+def test_stats_by_class(clock):
+    governor = BandwidthGovernor(limit=500 * KB, weights={INTERACTIVE: 3})
+    governor.attach('ui', INTERACTIVE)
+    governor.attach('bg', 'unknown')
+
+    stats = governor.get_stats()
+
+    assert stats['weights'] == {INTERACTIVE: 3, BULK: 1}
+    assert stats['classes'][INTERACTIVE] == {'jobs': 1, 'rate': 375 * KB, 'speed': 0}
+    # Неизвестный класс считается фоновым
+    assert stats['classes'][BULK]['jobs'] == 1
@@ -0,0 +1,26 @@
+from benchmarks.run import compare, percentile, run_batch
+
+
+def test_percentile_uses_nearest_rank():
+    assert percentile([], 50) is None
+    assert percentile([3, 1, 2, 4], 50) == 2
+    assert percentile(list(range(1, 101)), 99) == 99
+
+
+def test_run_batch_downloads_from_fake_server(media_server, workdir):
+    result = run_batch(media_server.base_url, 3, workers=2)
+
+    assert result['items'] == 3
+    assert result['statuses'] == {'success': 3}
+    assert result['bytes'] == 3 * media_server.size
+    assert result['latency_p50'] is not None
+
+
+def test_compare_marks_direction_of_change():
+    baseline = {'batches': [{'items': 10, 'items_per_s': 20.0, 'latency_p99': 0.5}]}
+    current = {'batches': [{'items': 10, 'items_per_s': 25.0, 'latency_p99': 1.0},
+                           {'items': 1000, 'items_per_s': 5.0}]}
+
+    lines = compare(current, baseline)
+
+    assert lines == ['   10 items: items_per_s 20.0 -> 25.0 (+25.0% +), latency_p99 0.5 -> 1.0 (+100.0% -)']
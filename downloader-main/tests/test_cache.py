@@ -0,0 +1,63 @@
+import pytest
+
+from utils import cache as cache_module
+from utils.cache import MetadataCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module.time, 'time', clock)
+    return clock
+
+
+def test_returns_info_until_platform_ttl_expires(tmp_path, clock):
+    cache = MetadataCache(str(tmp_path / 'meta.sqlite'), ttl={'tiktok.com': 60})
+    cache.set('https://www.tiktok.com/@a/video/1', {'id': '1'}, 'tiktok.com')
+    cache.set('https://example.com/v/2', {'id': '2'})
+
+    clock.now += 59
+    assert cache.get('https://www.tiktok.com/@a/video/1') == {'id': '1'}
+    clock.now += 2
+    assert cache.get('https://www.tiktok.com/@a/video/1') is None
+    # Для неизвестной площадки действует общий TTL
+    assert cache.get('https://example.com/v/2') == {'id': '2'}
+
+
+def test_survives_reopen(tmp_path, clock):
+    path = str(tmp_path / 'meta.sqlite')
+    MetadataCache(path).set('https://example.com/v/1', {'id': '1', 'title': 'Видео'})
+
+    assert MetadataCache(path).get('https://example.com/v/1') == {'id': '1', 'title': 'Видео'}
+
+
+def test_evicts_least_recently_used_over_size_limit(tmp_path, clock):
+    cache = MetadataCache(str(tmp_path / 'meta.sqlite'), max_bytes=250)
+    payload = 'x' * 100
+    for name in ('a', 'b'):
+        cache.set(f'https://example.com/{name}', {'data': payload})
+        clock.now += 1
+    # Обращение к a делает вытесняемой b
+    cache.get('https://example.com/a')
+    clock.now += 1
+    cache.set('https://example.com/c', {'data': payload})
+
+    assert cache.get('https://example.com/a') is not None
+    assert cache.get('https://example.com/b') is None
+    assert cache.get('https://example.com/c') is not None
+
+
+def test_invalidate(tmp_path, clock):
+    cache = MetadataCache(str(tmp_path / 'meta.sqlite'))
+    cache.set('https://example.com/v/1', {'id': '1'})
+    cache.invalidate('https://example.com/v/1')
+
+    assert cache.get('https://example.com/v/1') is None
@@ -0,0 +1,88 @@
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import cli
+from downloader import VideoDownloader
+
+
+def _fake_download(self, url, callback=None, *args, **kwargs):
+    if 'bad' in url:
+        return {'status': 'error', 'message': 'Download failed: boom'}
+    return {'status': 'success', 'path': f'/videos/{url.rsplit("/", 1)[-1]}.mp4'}
+
+
+@pytest.fixture
+def batch(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(VideoDownloader, 'download', _fake_download)
+
+    def run(*lines, args=()):
+        source = tmp_path / 'urls.txt'
+        source.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+        return cli.main(['batch', str(source), '-o', str(tmp_path / 'out'), *args])
+    return run
+
+
+def test_read_urls_skips_blank_lines_and_comments(tmp_path, monkeypatch):
+    source = tmp_path / 'urls.txt'
+    source.write_text('# список\nhttps://a\n\n  https://b  \n', encoding='utf-8')
+    monkeypatch.setattr(sys, 'stdin', io.StringIO('https://c\n#https://d\n'))
+
+    assert list(cli.read_urls(str(source))) == ['https://a', 'https://b']
+    assert list(cli.read_urls('-')) == ['https://c']
+
+
+def test_batch_prints_each_item_and_fails_on_errors(batch, capsys):
+    code = batch('https://example.com/watch/good', 'https://example.com/watch/bad')
+
+    out, err = capsys.readouterr()
+    assert code == 1
+    assert 'success: https://example.com/watch/good /videos/good.mp4' in out
+    assert 'error: https://example.com/watch/bad Download failed: boom' in out
+    assert 'Done: error 1, success 1' in err
+
+
+def test_batch_succeeds_when_everything_downloads(batch, capsys):
+    assert batch('https://example.com/watch/a', 'https://example.com/watch/b', args=('-w', '2')) == 0
+    assert 'Done: success 2' in capsys.readouterr().err
+
+
+def test_empty_source_is_not_an_error(batch, capsys):
+    assert batch('# ничего') == 0
+    assert 'Queue is empty' in capsys.readouterr().err
+
+
+def test_import_does_not_load_yt_dlp():
+    code = f'''
+import sys
+sys.path.insert(0, {os.path.dirname(cli.__file__)!r})
+import cli, downloader
+cli.build_parser()
+print(sorted(name for name in sys.modules if name.split('.')[0] in ('yt_dlp', 'PyQt5')))
+'''
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+
+    assert output.strip() == '[]'
+
+
+def test_batch_writes_jsonl_report(batch, tmp_path):
+    batch('https://example.com/watch/good', 'https://example.com/watch/bad', args=('--report-dir', 'reports'))
+
+    records = []
+    for report in (tmp_path / 'reports').glob('*.jsonl'):
+        records += [json.loads(line) for line in report.read_text(encoding='utf-8').splitlines()]
+    assert sorted(record['status'] for record in records) == ['error', 'success']
+
+
+def test_report_errors_go_to_stderr(capsys):
+    cli._print_event('item_complete', 0, 1, 'https://example.com/watch/1',
+                     {'status': 'success', 'path': '/videos/1.mp4', 'report_error': 'Error writing report: disk full'})
+
+    out, err = capsys.readouterr()
+    assert out == '[1/1] success: https://example.com/watch/1 /videos/1.mp4\n'
+    assert err == 'Error writing report: disk full\n'
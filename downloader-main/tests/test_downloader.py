@@ -0,0 +1,389 @@
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import pytest
+
+from download_queue.tasks import DONE, FAILED
+from downloader import PluginManager, VideoDownloader
+
+
+class FakeDownloads:
+    """Подменяет download: считает одновременные загрузки и отдает заданные результаты"""
+
+    def __init__(self, delays=None, failures=()):
+        self.delays = delays or {}
+        self.failures = set(failures)
+        self.active = 0
+        self.peak = 0
+        self.hosts = {}
+        self.host_peaks = {}
+        self.started = []
+        self.infos = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, url, callback=None, options=None, info=None, *args, **kwargs):
+        host = urlparse(url).netloc
+        with self._lock:
+            self.infos[url] = info
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            self.hosts[host] = self.hosts.get(host, 0) + 1
+            self.host_peaks[host] = max(self.host_peaks.get(host, 0), self.hosts[host])
+            self.started.append(url)
+        try:
+            time.sleep(self.delays.get(url, 0.05))
+            if url in self.failures:
+                raise RuntimeError('boom')
+            return {'status': 'success', 'path': None}
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.hosts[host] -= 1
+
+
+def _urls(count):
+    # Разные хосты: бюджет одного хоста не ограничивает пул
+    return [f'https://host{i}.example.com/watch/{i}' for i in range(count)]
+
+
+@pytest.fixture
+def downloader(tmp_path):
+    instance = VideoDownloader(max_workers=3)
+    instance.set_download_dir(str(tmp_path))
+    return instance
+
+
+def test_download_all_runs_up_to_max_workers(downloader):
+    fake = FakeDownloads()
+    downloader.download = fake
+    urls = _urls(9)
+    for url in urls:
+        downloader.add_to_queue(url)
+
+    results = downloader.download_all()
+
+    assert sorted(results) == sorted(urls)
+    assert all(result['status'] == 'success' for result in results.values())
+    assert fake.peak == 3
+    assert downloader.queue == []
+    assert not downloader.is_downloading
+
+
+def test_results_are_reported_as_items_finish(downloader):
+    slow, *fast = _urls(4)
+    downloader.download = FakeDownloads(delays={slow: 0.5})
+    for url in [slow] + fast:
+        downloader.add_to_queue(url)
+    completed = []
+
+    downloader.download_all(lambda event, *args: completed.append(args[2]) if event == 'item_complete' else None)
+
+    # Медленная первая загрузка не задерживает итоги остальных
+    assert completed[-1] == slow
+    assert sorted(completed[:-1]) == sorted(fast)
+
+
+def test_download_exception_becomes_error_result(downloader):
+    good, bad = _urls(2)
+    downloader.download = FakeDownloads(failures={bad})
+    downloader.add_to_queue(good)
+    downloader.add_to_queue(bad)
+
+    results = downloader.download_all()
+
+    assert results[good]['status'] == 'success'
+    assert results[bad]['status'] == 'error'
+    assert 'boom' in results[bad]['message']
+
+
+def test_stop_keeps_new_items_from_starting(downloader):
+    fake = FakeDownloads()
+    downloader.download = fake
+    for url in _urls(12):
+        downloader.add_to_queue(url)
+
+    def on_event(event, *args):
+        if event == 'item_complete':
+            downloader.stop_download()
+
+    results = downloader.download_all(on_event, max_workers=2)
+
+    # Запущенные загрузки доходят до конца, новые не начинаются
+    assert len(fake.started) < 12
+    assert len(results) == len(fake.started)
+
+
+def test_host_budget_does_not_hold_up_other_hosts(tmp_path):
+    plugins = PluginManager()
+    plugins.set_limits('slow.example.com', max_concurrent=1)
+    downloader = VideoDownloader(max_workers=4, plugin_manager=plugins)
+    slow = [f'https://slow.example.com/watch/{i}' for i in range(3)]
+    fast = _urls(3)
+    fake = FakeDownloads(delays={url: 0.2 for url in slow})
+    downloader.download = fake
+    for url in slow + fast:
+        downloader.add_to_queue(url)
+    completed = []
+
+    downloader.download_all(lambda event, *args: completed.append(args[2]) if event == 'item_complete' else None)
+
+    assert fake.host_peaks['slow.example.com'] == 1
+    # Очередь к медленному хосту не задерживает остальные площадки
+    assert sorted(completed[:3]) == sorted(fast)
+    # Все слоты хостов освобождены
+    assert set(plugins.limiter.get_stats().values()) == {0}
+
+
+
+@pytest.mark.parametrize('pipeline', [False, True])
+def test_closing_download_iter_releases_host_slots(tmp_path, pipeline):
+    plugins = PluginManager()
+    downloader = VideoDownloader(max_workers=2, plugin_manager=plugins)
+    urls = _urls(8)
+    urls[0] = 'https://quick.example.com/watch/0'
+    fake = FakeDownloads(delays={url: 0.3 for url in urls[1:]})
+    fake.delays[urls[0]] = 0.01
+    downloader.download = fake
+    # Метаданные приходят не сразу: при закрытии часть задач еще в стадии resolve
+    downloader.resolve = lambda url, **kwargs: time.sleep(0.01 if url == urls[0] else 0.3) or \
+        {'status': 'resolved', 'info': {'id': url}}
+
+    items = downloader.download_iter(urls, pipeline=pipeline, expand=False)
+    next(items)
+    items.close()
+
+    # Задачи, брошенные в работе, в resolve и в очереди на загрузку, возвращают слоты хостов
+    assert set(plugins.limiter.get_stats().values()) <= {0}
+
+def test_pipeline_resolves_ahead_of_transfers(downloader):
+    urls = _urls(4)
+    resolved = []
+    # Метаданные готовы сразу, передача медленная
+    downloader.resolve = lambda url, **kwargs: resolved.append(url) or {'status': 'resolved', 'info': {'id': url}}
+    fake = FakeDownloads(delays={url: 0.2 for url in urls})
+    downloader.download = fake
+    for url in urls:
+        downloader.add_to_queue(url)
+    completed = []
+
+    def on_event(event, *args):
+        if event == 'item_complete':
+            completed.append(len(resolved))
+
+    results = downloader.download_all(on_event, max_workers=1, pipeline=True)
+
+    assert all(result['status'] == 'success' for result in results.values())
+    # Загрузчик получает готовые метаданные, экстрактор второй раз не вызывается
+    assert fake.infos == {url: {'id': url} for url in urls}
+    assert completed[0] > 1
+
+
+def test_journal_records_outcomes_and_keeps_failures_queued(downloader, tmp_path):
+    downloader.set_journal(str(tmp_path / 'queue.sqlite'))
+    good, bad = _urls(2)
+    downloader.download = FakeDownloads(failures={bad})
+    downloader.add_to_queue(good)
+    downloader.add_to_queue(bad)
+
+    downloader.download_all()
+
+    assert downloader.journal.get_counts() == {DONE: 1, FAILED: 1}
+    assert downloader.queue == [bad]
+
+
+
+def test_journal_excludes_only_unfinished_jobs_of_same_url(downloader, tmp_path):
+    downloader.set_journal(str(tmp_path / 'queue.sqlite'))
+    ensure = downloader.journal.ensure
+    excluded = []
+    downloader.journal.ensure = lambda url, exclude=(): excluded.append((url, list(exclude))) or ensure(url, exclude)
+    dup, other = _urls(2)
+    downloader.download = FakeDownloads(delays={dup: 0.2})
+
+    # Второй dup берется, пока качается первый, третий — когда первый уже завершен
+    list(downloader.download_iter([dup, other, dup, dup], max_workers=2, window=2, expand=False))
+
+    assert excluded == [(dup, []), (other, []), (dup, [1]), (dup, [3])]
+    assert downloader.journal.get_counts() == {DONE: 4}
+
+
+def test_report_error_travels_with_the_result(downloader, capsys):
+    class BrokenReports:
+        def add_result(self, *args):
+            raise OSError('disk full')
+
+    downloader.reports = BrokenReports()
+    downloader.download = FakeDownloads()
+    completed = []
+
+    items = list(downloader.download_iter(_urls(1), lambda event, *args: completed.append(args[3])
+                                          if event == 'item_complete' else None, expand=False))
+
+    assert items[0][2]['status'] == 'success'
+    assert completed[0]['report_error'] == 'Error writing report: disk full'
+    assert capsys.readouterr().out == ''
+
+def test_resume_requeues_interrupted_jobs(tmp_path):
+    path = str(tmp_path / 'queue.sqlite')
+    downloader = VideoDownloader()
+    downloader.set_journal(path)
+    downloader.add_to_queue('https://example.com/watch?v=interrupted')
+    failed = downloader.journal.add('https://example.com/watch?v=failed')
+    downloader.journal.set_state(failed, FAILED, message='boom')
+
+    # Новый процесс: очередь пуста, журнал тот же
+    restarted = VideoDownloader()
+    restarted.set_journal(path)
+
+    assert restarted.resume() == 2
+    assert restarted.queue == ['https://example.com/watch?v=interrupted', 'https://example.com/watch?v=failed']
+
+
+def test_archived_video_is_skipped_without_extraction(tmp_path):
+    archive = tmp_path / 'archive.txt'
+    archive.write_text('youtube dQw4w9WgXcQ\n', encoding='utf-8')
+    downloader = VideoDownloader()
+    downloader.set_options({'download_archive': str(archive)})
+    # Без пула YoutubeDL любой вызов экстрактора закончился бы ошибкой
+    downloader.ydl_pool = None
+
+    result = downloader.download('https://youtu.be/dQw4w9WgXcQ?si=share')
+
+    assert result['status'] == 'skipped'
+    assert result['key'] == 'youtube dQw4w9WgXcQ'
+
+
+def test_cancel_interrupts_job_at_next_chunk():
+    from yt_dlp.utils import DownloadCancelled
+
+    downloader = VideoDownloader()
+    chunk = {'status': 'downloading', 'downloaded_bytes': 1024, 'tmpfilename': 'clip.mp4.part'}
+    downloader._progress_hook(7, chunk)
+    downloader.cancel(7)
+
+    with pytest.raises(DownloadCancelled):
+        downloader._progress_hook(7, chunk)
+    # Другие задачи продолжают качаться
+    downloader._progress_hook(8, chunk)
+
+
+def test_cancelled_job_does_not_start():
+    downloader = VideoDownloader()
+    downloader.ydl_pool = None
+    downloader.cancel(3)
+
+    assert downloader.download('https://example.com/watch/1', job_id=3)['status'] == 'cancelled'
+
+
+def test_partial_files_are_kept_unless_asked(tmp_path):
+    part = tmp_path / 'clip.mp4.part'
+    part.write_bytes(b'x')
+    downloader = VideoDownloader()
+
+    downloader._cleanup_partial([str(part)], {})
+    assert part.exists()
+    downloader._cleanup_partial([str(part)], {'partial_files': 'delete'})
+    assert not part.exists()
+
+
+def _site_urls(server, *ids):
+    return [f'{server.base_url}/watch/{video_id}' for video_id in ids]
+
+
+def test_download_all_downloads_queue(media_downloader, media_server):
+    urls = _site_urls(media_server, 'all-a', 'all-b', 'all-c')
+    for url in urls:
+        assert media_downloader.add_to_queue(url)
+    events = []
+
+    results = media_downloader.download_all(lambda event, *args: events.append((event, args)))
+
+    assert sorted(results) == sorted(urls)
+    assert all(result['status'] == 'success' for result in results.values())
+    assert all(os.path.getsize(result['path']) == media_server.size for result in results.values())
+    assert media_downloader.queue == []
+    completed = [args for event, args in events if event == 'item_complete']
+    assert len(completed) == 3
+    # total — длина очереди, а не None
+    assert {args[1] for args in completed} == {3}
+    assert events[-1][0] == 'complete'
+
+
+def test_download_all_keeps_failed_urls_in_queue(media_downloader, media_server):
+    good = _site_urls(media_server, 'kept-ok')[0]
+    # Порт 1 закрыт: экстрактор не получит метаданные
+    bad = 'http://127.0.0.1:1/watch/kept-bad'
+    media_downloader.add_to_queue(good)
+    media_downloader.add_to_queue(bad)
+
+    results = media_downloader.download_all()
+
+    assert results[good]['status'] == 'success'
+    assert results[bad]['status'] == 'error'
+    assert media_downloader.queue == [bad]
+
+
+def test_download_iter_reports_invalid_urls(media_downloader, media_server):
+    items = list(media_downloader.download_iter(['not a url'] + _site_urls(media_server, 'iter-valid')))
+
+    statuses = {url: result['status'] for _, url, result in items}
+    assert statuses['not a url'] == 'error'
+    assert [result['error_class'] for _, url, result in items if url == 'not a url'] == ['invalid_url']
+    assert list(statuses.values()).count('success') == 1
+
+
+def test_download_iter_reads_source_within_window(media_downloader, media_server):
+    urls = _site_urls(media_server, *(f'window-{i}' for i in range(12)))
+    read = []
+
+    def source():
+        for url in urls:
+            read.append(url)
+            yield url
+
+    ahead = []
+    finished = 0
+    for _ in media_downloader.download_iter(source(), max_workers=1, window=3, expand=False):
+        finished += 1
+        ahead.append(len(read) - finished)
+
+    assert finished == len(urls)
+    # Из источника читается не больше window URL сверх уже завершенных
+    assert max(ahead) <= 3
+
+
+def test_closing_download_iter_stops_batch(media_downloader, media_server):
+    urls = _site_urls(media_server, *(f'close-{i}' for i in range(8)))
+    items = media_downloader.download_iter(urls, max_workers=1, window=2)
+
+    next(items)
+    items.close()
+
+    assert media_downloader._stop_flag
+    assert not media_downloader.is_downloading
+    downloaded = [name for name in os.listdir(media_downloader.download_dir) if name.endswith('.mp4')]
+    assert len(downloaded) < len(urls)
+
+
+def test_per_call_options_disable_metadata_cache(media_downloader, media_server, workdir):
+    url = _site_urls(media_server, 'cache-off')[0]
+    options = dict(media_downloader.options, metadata_cache=True,
+                   metadata_cache_path=str(workdir / 'cache' / 'meta.sqlite'))
+
+    assert media_downloader.download(url, options=options)['status'] == 'success'
+    assert os.path.exists(workdir / 'cache' / 'meta.sqlite')
+    assert media_downloader._get_metadata_cache(dict(options, metadata_cache=False)) is None
+
+
+def test_duplicate_urls_get_separate_journal_jobs(media_downloader, media_server, workdir):
+    media_downloader.set_journal(str(workdir / 'queue.sqlite'))
+    url = _site_urls(media_server, 'dup')[0]
+    media_downloader.add_to_queue(url)
+    media_downloader.add_to_queue(url)
+
+    # Один поток: оба дубля пишут один и тот же файл
+    list(media_downloader.download_iter(list(media_downloader.queue), max_workers=1))
+
+    assert media_downloader.journal.get_counts() == {DONE: 2}
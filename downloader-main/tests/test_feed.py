@@ -0,0 +1,196 @@
+import threading
+import time
+
+import pytest
+from yt_dlp.extractor.common import InfoExtractor
+
+from benchmarks.fake_extractor import FakeMediaIE
+from download_queue.tasks import DONE, FAILED
+from utils.feed import UrlFeed
+
+# Вторая страница «канала» отдается только после того, как скачана первая запись
+second_page = threading.Event()
+
+
+class FakeChannelIE(InfoExtractor):
+    IE_NAME = 'test:channel'
+    _RETURN_TYPE = 'playlist'
+    _VALID_URL = r'(?P<base>https?://127\.0\.0\.1:\d+)/channel/(?P<id>[\w-]+)'
+
+    def _real_extract(self, url):
+        base, channel_id = self._match_valid_url(url).group('base', 'id')
+
+        def entries():
+            for page in range(2):
+                if page and not second_page.wait(10):
+                    raise AssertionError('second page requested before any entry was downloaded')
+                for k in range(2):
+                    yield self.url_result(f'{base}/watch/{channel_id}-{page}-{k}', FakeMediaIE)
+
+        return self.playlist_result(entries(), channel_id)
+
+
+class FakePostIE(FakeMediaIE):
+    """Ссылка, которая может оказаться и плейлистом, и одним видео"""
+    IE_NAME = 'test:post'
+    _RETURN_TYPE = 'any'
+    _VALID_URL = r'(?P<base>https?://127\.0\.0\.1:\d+)/post/(?P<id>[\w-]+)'
+
+
+def _drain(feed, timeout=5):
+    items = []
+    deadline = time.time() + timeout
+    for item in feed:
+        if item is None:
+            assert time.time() < deadline
+            time.sleep(0.01)
+            continue
+        items.append(item)
+    return items
+
+
+def test_feed_expands_in_background():
+    expansions = {'list': ['a', 'b'], 'single': ['single']}
+    feed = UrlFeed(['list', 'single', 'plain'], lambda url: iter(expansions.get(url, [url])))
+
+    assert _drain(feed) == ['a', 'b', 'single', 'plain']
+    # Ссылка, которая отдала сама себя, раскрытой не считается
+    assert feed.expanded == {'list'}
+    assert feed.total == 3
+
+
+def test_feed_reports_failed_expansion(capsys):
+    def expand(url):
+        if url == 'broken':
+            raise RuntimeError('offline')
+        yield url
+
+    feed = UrlFeed(['broken', 'plain'], expand)
+    error, plain = _drain(feed)
+
+    assert (error.url, str(error.error), plain) == ('broken', 'offline', 'plain')
+    assert feed.expanded == set()
+    assert capsys.readouterr().out == ''
+
+
+def test_failed_expansion_becomes_error_result(media_downloader, media_server, workdir, monkeypatch):
+    media_downloader.set_journal(str(workdir / 'queue.sqlite'))
+    broken, plain = f'{media_server.base_url}/channel/broken', f'{media_server.base_url}/watch/after-broken'
+    expand = media_downloader.expand
+
+    def failing_expand(url, **kwargs):
+        if url == broken:
+            raise RuntimeError('offline')
+        return expand(url, **kwargs)
+
+    monkeypatch.setattr(media_downloader, 'expand', failing_expand)
+    completed = []
+
+    items = list(media_downloader.download_iter(
+        [broken, plain], lambda event, *args: completed.append(args[2:]) if event == 'item_complete' else None))
+
+    statuses = {url: result['status'] for _, url, result in items}
+    assert statuses == {broken: 'error', plain: 'success'}
+    assert [(url, result['error_class']) for url, result in completed if url == broken] == [(broken, 'RuntimeError')]
+    assert media_downloader.journal.get_counts() == {DONE: 1, FAILED: 1}
+
+
+def test_feed_close_stops_expansion():
+    produced = []
+
+    def expand(url):
+        for i in range(1000):
+            produced.append(i)
+            yield f'{url}-{i}'
+
+    feed = UrlFeed(['list'], expand, buffer=2)
+    time.sleep(0.1)
+    feed.close()
+    time.sleep(0.3)
+
+    assert len(produced) < 10
+
+
+@pytest.fixture
+def expanding(media_downloader):
+    from utils.ydl_pool import ydl_pool
+
+    ydl_pool.add_extractor(FakeChannelIE)
+    ydl_pool.add_extractor(FakePostIE)
+    second_page.clear()
+    return media_downloader
+
+
+def test_download_all_expands_playlists_lazily(expanding, media_server):
+    base = media_server.base_url
+    channel, post, plain = f'{base}/channel/ch', f'{base}/post/p1', f'{base}/watch/plain'
+    for url in (channel, post, plain):
+        expanding.add_to_queue(url)
+    totals = set()
+
+    def on_event(event, *args):
+        if event == 'item_complete':
+            totals.add(args[1])
+            second_page.set()
+
+    results = expanding.download_all(on_event)
+
+    entries = [f'{base}/watch/ch-{page}-{k}' for page in range(2) for k in range(2)]
+    assert sorted(results) == sorted(entries + [post, plain])
+    assert all(result['status'] == 'success' for result in results.values())
+    # Раскрытый канал не остается в очереди, а total — длина исходной очереди
+    assert expanding.queue == []
+    assert totals == {3}
+
+
+@pytest.mark.parametrize('pipeline', [False, True])
+def test_single_video_from_probe_is_extracted_once(expanding, media_server, monkeypatch, pipeline):
+    post = f'{media_server.base_url}/post/p2-{int(pipeline)}'
+    from downloader import get_plugin_manager
+
+    extracted = []
+    real_extract = FakePostIE._real_extract
+    monkeypatch.setattr(FakePostIE, '_real_extract', lambda self, url: extracted.append(url) or real_extract(self, url))
+    acquired = []
+    plugins = get_plugin_manager()
+    try_acquire = plugins.try_acquire
+    monkeypatch.setattr(plugins, 'try_acquire', lambda url: acquired.append(url) or try_acquire(url))
+
+    items = list(expanding.download_iter([post], pipeline=pipeline))
+
+    assert [(url, result['status']) for _, url, result in items] == [(post, 'success')]
+    # Задача получает метаданные пробного запроса, а бюджет хоста занимают оба
+    assert extracted == [post]
+    assert acquired.count(post) == 2
+    assert set(plugins.limiter.get_stats().values()) <= {0}
+
+
+def test_waiting_for_host_stops_with_feed(media_downloader):
+    class BusyHosts:
+        def try_acquire(self, url):
+            return False
+
+        def get_delay(self, url):
+            return None
+
+    # Хост занят: раскрытие ждет бюджет, пока источник не закроют
+    media_downloader.plugin_manager = BusyHosts()
+    feed = media_downloader.feed(['https://www.youtube.com/playlist?list=PL1'])
+    time.sleep(0.2)
+    assert feed._thread.is_alive()
+    feed.close()
+    feed._thread.join(timeout=2)
+
+    assert not feed._thread.is_alive()
+    assert feed.expanded == set()
+
+
+def test_no_expand_keeps_playlist_as_one_job(expanding, media_server):
+    channel = f'{media_server.base_url}/channel/whole'
+    expanding.options['expand_playlists'] = False
+    # Одна задача качает весь канал: ждать завершения записи некому
+    second_page.set()
+
+    items = list(expanding.download_iter([channel]))
+
+    assert [url for _, url, _ in items] == [channel]
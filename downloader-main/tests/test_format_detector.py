@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+from core import format_detector
+from core.format_detector import ProbeCache, classify_directory, classify_videos, get_durations, \
+    is_short_video, probe_durations
+
+
+@pytest.fixture(autouse=True)
+def default_cache(workdir, monkeypatch):
+    """Общий кэш проб создается заново в data/ временного каталога"""
+    monkeypatch.setattr(format_detector, '_default_cache', None)
+
+
+def _clip(directory, name, seconds):
+    path = directory / name
+    path.write_text(str(seconds), encoding='utf-8')
+    return str(path)
+
+
+def _ffmpeg_runs(ffmpeg):
+    return [call for call in ffmpeg.calls() if not call.startswith('ffprobe')]
+
+
+def test_one_ffmpeg_run_reads_whole_batch(tmp_path, ffmpeg):
+    short = _clip(tmp_path, 'short.mp4', 12.5)
+    long = _clip(tmp_path, 'long.mp4', 75)
+    broken = _clip(tmp_path, 'broken.mp4', 'garbage')
+
+    result = classify_videos([short, long, broken])
+
+    assert result == {short: True, long: False, broken: None}
+    assert len(_ffmpeg_runs(ffmpeg)) == 1
+    # Файл, который ffmpeg не разобрал, пробуется отдельно
+    assert ffmpeg.calls()[1:] == [f'ffprobe {broken}']
+
+
+def test_batches_are_split_by_size(tmp_path, ffmpeg):
+    paths = [_clip(tmp_path, f'{i}.mp4', i + 1) for i in range(5)]
+
+    assert probe_durations(paths, batch_size=2) == {path: i + 1 for i, path in enumerate(paths)}
+    assert len(_ffmpeg_runs(ffmpeg)) == 3
+
+
+def test_info_duration_skips_probing(tmp_path, ffmpeg):
+    path = _clip(tmp_path, 'clip.mp4', 600)
+
+    assert is_short_video(path, info={'duration': 30})
+    assert ffmpeg.calls() == []
+
+
+def test_cache_skips_unchanged_files(tmp_path, ffmpeg):
+    cache = ProbeCache(str(tmp_path / 'cache' / 'probe.sqlite'))
+    path = _clip(tmp_path, 'clip.mp4', 30)
+    assert get_durations([path], cache) == {path: 30}
+    assert get_durations([path], cache) == {path: 30}
+    assert len(ffmpeg.calls()) == 1
+
+    # Новый mtime или размер — новая проба
+    _clip(tmp_path, 'clip.mp4', 90.5)
+    os.utime(path, (1, 1))
+    assert get_durations([path], cache) == {path: 90.5}
+    assert len(ffmpeg.calls()) == 2
+
+
+def test_classify_directory_filters_extensions(tmp_path, ffmpeg):
+    clip = _clip(tmp_path, 'a.MP4', 10)
+    _clip(tmp_path, 'notes.txt', 10)
+
+    assert classify_directory(str(tmp_path)) == {clip: True}
+
+
+def test_unknown_duration_raises(tmp_path, ffmpeg):
+    with pytest.raises(ValueError):
+        is_short_video(_clip(tmp_path, 'broken.mp4', 'garbage'))
+
+
+def test_default_cache_is_shared_on_disk(tmp_path, ffmpeg):
+    path = _clip(tmp_path, 'clip.mp4', 42)
+
+    assert get_durations([path]) == {path: 42}
+    assert get_durations([path]) == {path: 42}
+    assert len(ffmpeg.calls()) == 1
+    assert os.path.exists(tmp_path / 'data' / 'cache' / 'probe.sqlite')
+
+    # cache=None — проба без кэша
+    assert get_durations([path], cache=None) == {path: 42}
+    assert len(ffmpeg.calls()) == 2
@@ -0,0 +1,78 @@
+from core.format_selector import FormatSelector, get_preset, parse_bitrate
+
+
+def _video(format_id, height, fps=30, tbr=None, filesize=None, vcodec='avc1', ext='mp4'):
+    return {'format_id': format_id, 'format': format_id, 'ext': ext, 'height': height, 'fps': fps,
+            'tbr': tbr, 'filesize': filesize, 'vcodec': vcodec, 'acodec': 'none', 'protocol': 'https'}
+
+
+def _audio(format_id, abr, ext='m4a'):
+    return {'format_id': format_id, 'format': format_id, 'ext': ext, 'abr': abr,
+            'vcodec': 'none', 'acodec': 'mp4a', 'protocol': 'https'}
+
+
+def _muxed(format_id, height, fps=30, tbr=None, filesize=None):
+    return dict(_video(format_id, height, fps, tbr, filesize), acodec='mp4a')
+
+
+def _select(quality, formats, format_type='video+audio', prefer_muxed=True):
+    return list(FormatSelector(get_preset(quality), format_type, prefer_muxed)({'formats': formats}))
+
+
+def test_parse_bitrate():
+    assert parse_bitrate('5000k') == 5000
+    assert parse_bitrate('10M') == 10000
+    assert parse_bitrate('best') is None
+
+
+def test_custom_height_preset():
+    preset = get_preset('480p')
+    assert preset.max_height == 480
+
+
+def test_picks_highest_fitting_video_with_best_audio():
+    formats = [
+        _video('1080', 1080, tbr=4000), _video('720', 720, tbr=2000), _video('480', 480, tbr=900),
+        _audio('low', 64), _audio('high', 128), _audio('opus', 160, ext='webm'),
+    ]
+
+    chosen, = _select('720p', formats)
+
+    assert chosen['format_id'] == '720+high'
+    assert [f['format_id'] for f in chosen['requested_formats']] == ['720', 'high']
+
+
+def test_prefers_30fps_and_smaller_file_within_preset():
+    formats = [
+        _video('60fps', 720, fps=60, filesize=40_000_000),
+        _video('vp9', 720, filesize=12_000_000, vcodec='vp09'),
+        _video('avc', 720, filesize=20_000_000),
+    ]
+
+    chosen, = _select('720p', formats, format_type='video_only')
+
+    assert chosen['format_id'] == 'vp9'
+
+
+def test_falls_back_to_smallest_when_nothing_fits():
+    formats = [_video('4k', 2160, tbr=20000), _video('1440', 1440, tbr=12000)]
+
+    chosen, = _select('720p', formats, format_type='video_only')
+
+    assert chosen['format_id'] == '1440'
+
+
+def test_prefers_muxed_file_equivalent_to_pair():
+    formats = [_video('720', 720, tbr=2000), _audio('a', 128), _muxed('720-muxed', 720, tbr=2000)]
+
+    chosen, = _select('720p', formats)
+
+    assert chosen['format_id'] == '720-muxed'
+    assert chosen['__merge_skipped']['format_id'] == '720+a'
+
+
+def test_keeps_pair_when_muxed_file_is_worse():
+    formats = [_video('720', 720, tbr=2000), _audio('a', 128), _muxed('360-muxed', 360, tbr=600)]
+
+    assert _select('720p', formats)[0]['format_id'] == '720+a'
+    assert _select('720p', formats, prefer_muxed=False)[0]['format_id'] == '720+a'
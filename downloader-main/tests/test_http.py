@@ -0,0 +1,81 @@
+import threading
+import types
+
+from utils.http import HttpPool
+
+
+def _handler(create_instance, **overrides):
+    fields = dict(verify=True, source_address=None, prefer_system_certs=False, _client_cert={},
+                  legacy_ssl_support=False, _create_instance=create_instance)
+    fields.update(overrides)
+    return types.SimpleNamespace(**{name: value for name, value in fields.items() if value is not ...})
+
+
+def _ydl(handler):
+    return types.SimpleNamespace(_request_director=types.SimpleNamespace(handlers={'Requests': handler}))
+
+
+def test_session_keeps_connections_alive(local_server):
+    pool = HttpPool()
+    with local_server(b'ok') as server:
+        for _ in range(3):
+            assert pool.session.get(server.url).content == b'ok'
+
+    assert pool.get_stats() == {'requests': 3, 'new': 1, 'reused': 2, 'pools': 1}
+    pool.close()
+
+
+def test_job_counters_follow_bound_thread(local_server):
+    pool = HttpPool()
+    job = pool.new_stats()
+
+    def run():
+        pool.bind(job)
+        pool.session.get(server.url).content
+
+    with local_server(b'ok') as server:
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        pool.session.get(server.url).content
+
+    assert job == {'requests': 1, 'new': 1, 'reused': 0}
+    assert pool.stats['requests'] == 2
+    pool.close()
+
+
+def test_yt_dlp_requests_go_through_shared_pool(local_server):
+    from yt_dlp import YoutubeDL
+
+    pool = HttpPool()
+    with local_server(b'{}') as server, YoutubeDL({'quiet': True}) as ydl:
+        assert pool.attach(ydl)
+        for _ in range(2):
+            ydl.urlopen(f'{server.base_url}/api/shared').read()
+
+    assert pool.stats['requests'] == 2
+    assert pool.stats['reused'] == 1
+    pool.close()
+
+
+def test_attach_falls_back_without_request_director():
+    assert HttpPool().attach(types.SimpleNamespace()) is False
+
+
+def test_attach_falls_back_when_handler_internals_differ():
+    original = lambda **kwargs: None
+    # В этой «версии» yt-dlp у обработчика нет _client_cert
+    handler = _handler(original, _client_cert=...)
+
+    assert HttpPool().attach(_ydl(handler)) is False
+    assert handler._create_instance is original
+
+
+def test_session_without_adapters_is_left_to_yt_dlp():
+    session = object()
+    handler = _handler(lambda **kwargs: session)
+    pool = HttpPool()
+
+    assert pool.attach(_ydl(handler))
+    assert handler._create_instance(cookiejar=None) is session
+    assert pool.get_stats()['pools'] == 0
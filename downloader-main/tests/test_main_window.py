@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+pytest.importorskip('PyQt5')
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtWidgets import QApplication, QMessageBox  # noqa: E402
+
+from download_queue.manager import DEFAULT_JOURNAL_PATH  # noqa: E402
+from download_queue.tasks import DONE, FAILED, PENDING, JobJournal  # noqa: E402
+from main_window import DownloadThread, MainWindow  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+def test_window_restores_pending_and_failed_jobs(app, workdir):
+    journal = JobJournal(str(workdir / DEFAULT_JOURNAL_PATH))
+    pending = journal.add('https://example.com/watch?v=pending')
+    failed = journal.add('https://example.com/watch?v=failed')
+    journal.set_state(failed, FAILED, message='offline')
+    journal.set_state(journal.add('https://example.com/watch?v=done'), DONE)
+    journal.close()
+
+    window = MainWindow()
+
+    assert window.downloader.queue == ['https://example.com/watch?v=pending', 'https://example.com/watch?v=failed']
+    assert window.queue_model.rowCount() == 2
+    window.close()
+
+
+def test_failed_urls_stay_queued_after_batch(app, workdir, monkeypatch):
+    # Итоговый диалог не ждет нажатия
+    monkeypatch.setattr(QMessageBox, 'exec_', lambda self: 0)
+    window = MainWindow()
+    good, bad, later = (f'https://{host}.example.com/watch/1' for host in 'abc')
+    window.downloader.download = lambda url, *args, **kwargs: {'status': 'success' if url == good else 'error'}
+    window.downloader.add_to_queue(good)
+    window.downloader.add_to_queue(bad)
+    window.download_thread = DownloadThread(window.downloader)
+    window.download_thread.run()
+    # Ссылка, добавленная во время загрузки
+    window.downloader.add_to_queue(later)
+
+    window.finish_download(1, 2)
+
+    assert window.downloader.queue == [bad, later]
+    assert window.downloader.journal.get_counts() == {DONE: 1, FAILED: 1, PENDING: 1}
+    window.close()
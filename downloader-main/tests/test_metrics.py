@@ -0,0 +1,70 @@
+import pytest
+
+from utils import metrics as metrics_module
+from utils.metrics import JobMetrics, MetricsRegistry
+
+
+def _finished_job():
+    job = JobMetrics('youtube.com', '720p')
+    job.add('extract', 0.4)
+    job.on_progress({'status': 'downloading', 'speed': 3000, 'retries': 1})
+    job.on_progress({'status': 'downloading', 'speed': 5000, 'retries': 2})
+    job.on_progress({'status': 'finished', 'downloaded_bytes': 10000, 'elapsed': 4.0})
+    return job
+
+
+def test_job_snapshot_collects_phases_speed_and_retries():
+    snapshot = _finished_job().snapshot()
+
+    assert snapshot['timings'] == {'extract': 0.4, 'transfer': 4.0}
+    assert snapshot['bytes'] == 10000
+    assert snapshot['avg_speed'] == 2500
+    assert snapshot['peak_speed'] == 5000
+    # Загрузчик сегментов сообщает повторы нарастающим итогом
+    assert snapshot['retries'] == 2
+
+
+def test_write_phase_excludes_inline_merge(monkeypatch):
+    clock = iter([100.0, 110.0, 113.0])
+    monkeypatch.setattr(metrics_module.time, 'time', lambda: next(clock))
+    job = JobMetrics()
+    job.on_progress({'status': 'finished', 'downloaded_bytes': 1})
+    job.add('merge', 2.0)
+    job.finish()
+
+    assert job.snapshot()['timings']['write'] == pytest.approx(1.0)
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    registry.observe(_finished_job().snapshot(), 'success')
+    registry.observe({'platform': 'vk.com', 'preset': '', 'bytes': 0, 'timings': {}}, 'error')
+
+    text = registry.render()
+
+    assert '# TYPE downloader_jobs_total counter' in text
+    assert 'downloader_jobs_total{platform="youtube.com",preset="720p",status="success"} 1' in text
+    assert 'downloader_jobs_total{platform="vk.com",preset="",status="error"} 1' in text
+    # Корзины гистограммы накопительные
+    assert 'downloader_phase_seconds_bucket{platform="youtube.com",preset="720p",phase="transfer",le="2.5"} 0' in text
+    assert 'downloader_phase_seconds_bucket{platform="youtube.com",preset="720p",phase="transfer",le="5"} 1' in text
+    assert 'downloader_phase_seconds_bucket{platform="youtube.com",preset="720p",phase="transfer",le="+Inf"} 1' in text
+    assert 'downloader_phase_seconds_count{platform="youtube.com",preset="720p",phase="extract"} 1' in text
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.observe({'platform': 'a"b\\c', 'preset': 'x\ny'}, 'success')
+
+    assert 'platform="a\\"b\\\\c",preset="x\\ny"' in registry.render()
+
+
+def test_textfile_is_replaced_atomically(tmp_path):
+    registry = MetricsRegistry()
+    path = tmp_path / 'node' / 'downloader.prom'
+    registry.set_textfile(str(path))
+    registry.observe(_finished_job().snapshot(), 'success')
+    registry.write_textfile()
+
+    assert 'downloader_bytes_total' in path.read_text(encoding='utf-8')
+    assert [item.name for item in path.parent.iterdir()] == ['downloader.prom']
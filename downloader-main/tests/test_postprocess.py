@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+from utils.postprocess import MB, MERGE_STARTUP_SECONDS, MergeCostModel, PostprocessStage, run_steps
+
+
+def _media(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_steps_work_on_previous_output(tmp_path, ffmpeg):
+    video = _media(tmp_path, 'clip.f137.mp4', b'video')
+    audio = _media(tmp_path, 'clip.f140.m4a', b'audio')
+    output = str(tmp_path / 'clip.mp4')
+
+    result = run_steps([
+        {'op': 'merge', 'inputs': [video, audio], 'output': output},
+        {'op': 'remux'},
+    ])
+
+    assert result['status'] == 'success'
+    assert result['path'] == os.path.abspath(output)
+    with open(output, 'rb') as f:
+        assert f.read() == b'videoaudio'
+    # Дорожки удаляются после склейки
+    assert not os.path.exists(video) and not os.path.exists(audio)
+    assert set(result['timings']) == {'merge', 'remux'}
+    assert result['merged_bytes'] == len(b'videoaudio')
+    assert len(ffmpeg.calls()) == 2
+
+
+def test_extract_audio_replaces_input(tmp_path, ffmpeg):
+    source = _media(tmp_path, 'clip.webm', b'sound')
+
+    result = run_steps([{'op': 'extract_audio', 'input': source, 'output': str(tmp_path / 'clip.mp3'),
+                         'quality': '128'}])
+
+    assert result['path'] == str(tmp_path / 'clip.mp3')
+    assert not os.path.exists(source)
+    assert '-b:a 128k' in ffmpeg.calls()[0]
+
+
+def test_ffmpeg_error_becomes_error_result(tmp_path, ffmpeg):
+    result = run_steps([{'op': 'merge', 'inputs': [str(tmp_path / 'missing.mp4'), str(tmp_path / 'missing.m4a')],
+                         'output': str(tmp_path / 'out.mp4')}])
+
+    assert result['status'] == 'error'
+    assert 'No such file' in result['message']
+
+
+def test_stage_runs_steps_in_worker_process(tmp_path, ffmpeg):
+    stage = PostprocessStage(workers=1, queue_size=2)
+    try:
+        futures = [stage.submit([{'op': 'remux', 'input': _media(tmp_path, f'{i}.mp4', b'x')}]) for i in range(3)]
+        results = [future.result(timeout=30) for future in futures]
+    finally:
+        stage.shutdown()
+
+    assert [result['status'] for result in results] == ['success'] * 3
+
+
+def test_merge_cost_uses_measurements_once_available():
+    model = MergeCostModel()
+    default = model.estimate(100 * MB)
+    assert not default['measured']
+
+    # Две склейки по 50 МБ: 0.1 с копирования на мегабайт сверх запуска ffmpeg
+    for _ in range(2):
+        model.record(MERGE_STARTUP_SECONDS + 5, 50 * MB, cpu_seconds=1)
+    estimate = model.estimate(10 * MB)
+
+    assert estimate['measured']
+    assert estimate['seconds'] == pytest.approx(MERGE_STARTUP_SECONDS + 1)
+    assert estimate['cpu_seconds'] == pytest.approx(0.2)
+
+
+def test_merge_cost_ignores_empty_files():
+    model = MergeCostModel()
+    model.record(1.0, 0)
+
+    assert model.merges == 0
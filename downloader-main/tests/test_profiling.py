@@ -0,0 +1,63 @@
+import os
+import pstats
+
+import pytest
+
+from utils.profiling import JobProfiler
+
+
+def _work():
+    return sum(i * i for i in range(10000))
+
+
+def test_sampled_job_writes_cpu_and_memory_files(tmp_path):
+    profiler = JobProfiler(str(tmp_path), mode='both', sample=1.0, prefix='run')
+
+    handle = profiler.start_job(7)
+    _work()
+    files = profiler.finish(handle)
+
+    assert files == {'cpu': str(tmp_path / 'run_job7.pstats'), 'memory': str(tmp_path / 'run_job7.alloc.txt')}
+    assert pstats.Stats(files['cpu']).total_calls > 0
+    with open(files['memory'], encoding='utf-8') as f:
+        assert f.readline().startswith('# job7: ')
+    assert profiler.files == [files['cpu'], files['memory']]
+
+
+def test_jobs_outside_sample_are_not_profiled_unless_forced(tmp_path):
+    profiler = JobProfiler(str(tmp_path), sample=0.0, prefix='run')
+
+    assert profiler.start_job(1) is None
+    assert profiler.finish(None) is None
+    handle = profiler.start_job(2, force=True)
+    assert profiler.finish(handle) == {'cpu': str(tmp_path / 'run_job2.pstats')}
+
+
+def test_batch_scope_writes_one_profile(tmp_path):
+    profiler = JobProfiler(str(tmp_path), scope='batch', prefix='run')
+
+    batch = profiler.start_batch()
+    # В режиме партии задачи не пишут свои файлы
+    assert profiler.finish(profiler.start_job(1)) is None
+    _work()
+    files = profiler.finish_batch(batch)
+
+    assert files == {'cpu': str(tmp_path / 'run_batch.pstats')}
+    assert os.listdir(tmp_path) == ['run_batch.pstats']
+
+
+def test_unknown_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        JobProfiler(str(tmp_path), mode='gpu')
+    with pytest.raises(ValueError):
+        JobProfiler(str(tmp_path), scope='forever')
+
+
+def test_profiled_job_lists_files_in_result(media_downloader, media_server, workdir):
+    url = f'{media_server.base_url}/watch/profiled'
+    media_downloader.set_profiling('cpu', sample=0.0, directory=str(workdir / 'profiles'), prefix='run')
+
+    result = media_downloader.download(url, options={**media_downloader.options, 'profile': True})
+
+    assert result['status'] == 'success'
+    assert os.path.exists(result['profile']['cpu'])
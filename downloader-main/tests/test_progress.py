@@ -0,0 +1,53 @@
+from utils.progress import ProgressStore, format_bytes, format_eta
+
+
+def test_totals_cover_active_jobs_only():
+    store = ProgressStore()
+    store.start(1, 'https://a')
+    store.start(2, 'https://b')
+    store.update(1, downloaded_bytes=100, total_bytes=400, speed=50)
+    store.update(2, downloaded_bytes=300, total_bytes=300, speed=10)
+    store.finish(2, 'success')
+
+    assert store.get_totals() == {'active': 1, 'downloaded_bytes': 100, 'total_bytes': 400, 'speed': 50}
+    assert store.get(2)['status'] == 'success'
+    assert store.get(2)['speed'] is None
+
+
+def test_finished_jobs_are_evicted_oldest_first():
+    store = ProgressStore(keep_finished=2)
+    for job_id in range(3):
+        store.start(job_id, f'https://{job_id}')
+        store.finish(job_id, 'success')
+
+    assert store.get(0) is None
+    assert [store.get(job_id)['job_id'] for job_id in (1, 2)] == [1, 2]
+
+
+def test_version_changes_with_every_update():
+    store = ProgressStore()
+    store.start(1, 'https://a')
+    version, jobs = store.snapshot()
+    # Снимок — копия: дальнейшие обновления его не меняют
+    store.update(1, downloaded_bytes=10)
+
+    assert store.snapshot()[0] > version
+    assert jobs[1]['downloaded_bytes'] == 0
+    assert store.find_by_url('https://a')['downloaded_bytes'] == 10
+
+
+def test_snapshot_since_current_version_skips_copy():
+    store = ProgressStore()
+    store.start(1, 'https://a')
+    version = store.version
+
+    assert store.snapshot(since=version) == (version, None)
+    store.update(1, speed=5)
+    assert store.snapshot(since=version)[1][1]['speed'] == 5
+
+
+def test_formatting():
+    assert format_bytes(1536) == '1.5 KB'
+    assert format_bytes(None) == 'N/A'
+    assert format_eta(75) == '01:15'
+    assert format_eta(3725) == '1:02:05'
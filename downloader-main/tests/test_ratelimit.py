@@ -0,0 +1,77 @@
+import pytest
+
+from utils import ratelimit
+from utils.ratelimit import HostLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit.time, 'monotonic', clock)
+    return clock
+
+
+def test_bucket_allows_burst_then_refuses(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+
+    assert [bucket.try_consume() for _ in range(4)] == [True, True, True, False]
+
+
+def test_bucket_refills_at_rate(clock):
+    bucket = TokenBucket(rate=2, burst=1)
+    assert bucket.try_consume()
+
+    assert bucket.delay() == pytest.approx(0.5)
+    clock.now += 0.25
+    assert not bucket.try_consume()
+    assert bucket.delay() == pytest.approx(0.25)
+    clock.now += 0.25
+    assert bucket.try_consume()
+
+
+def test_bucket_does_not_store_more_than_burst(clock):
+    bucket = TokenBucket(rate=10, burst=2)
+    clock.now += 60
+
+    assert [bucket.try_consume() for _ in range(3)] == [True, True, False]
+
+
+def test_limiter_caps_concurrency_per_host(clock):
+    limiter = HostLimiter()
+
+    assert limiter.try_acquire('a.com', max_concurrent=2)
+    assert limiter.try_acquire('a.com', max_concurrent=2)
+    assert not limiter.try_acquire('a.com', max_concurrent=2)
+    # Другой хост не делит бюджет
+    assert limiter.try_acquire('b.com', max_concurrent=2)
+
+    limiter.release('a.com')
+    assert limiter.try_acquire('a.com', max_concurrent=2)
+    assert limiter.get_stats() == {'a.com': 2, 'b.com': 1}
+
+
+def test_limiter_reports_delay_until_next_token(clock):
+    limiter = HostLimiter()
+    assert limiter.try_acquire('a.com', rate=1, burst=1)
+    limiter.release('a.com')
+
+    assert not limiter.try_acquire('a.com', rate=1, burst=1)
+    assert limiter.delay('a.com') == pytest.approx(1.0)
+    clock.now += 1
+    assert limiter.try_acquire('a.com', rate=1, burst=1)
+
+
+def test_limiter_configure_replaces_budget(clock):
+    limiter = HostLimiter()
+    limiter.configure('a.com', max_concurrent=1)
+
+    assert limiter.try_acquire('a.com', max_concurrent=5)
+    assert not limiter.try_acquire('a.com', max_concurrent=5)
@@ -0,0 +1,64 @@
+import json
+import time
+
+from utils.reporter import ReportIndex, ReportWriter, INDEX_NAME
+
+
+def _write_batch(writer):
+    writer.add_result('https://youtu.be/a', {'status': 'success', 'path': None},
+                      {'downloaded_bytes': 100, 'started': time.time() - 2}, 'youtube.com', 1)
+    writer.add_result('https://vk.com/b', {'status': 'error', 'error_class': 'private', 'message': 'x'},
+                      None, 'vk.com', 2)
+    writer.add_result('https://vk.com/c', {'status': 'success', 'postprocess': object()},
+                      {'downloaded_bytes': 50}, 'vk.com', 3)
+
+
+def test_writes_one_json_line_per_result(tmp_path):
+    writer = ReportWriter(str(tmp_path))
+    _write_batch(writer)
+    writer.close()
+
+    with open(writer.path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert [record['job_id'] for record in records] == [1, 2, 3]
+    assert records[1]['error_class'] == 'private'
+    # future постобработки в отчет не пишется
+    assert 'postprocess' not in records[2]
+
+
+def test_rotates_files_by_size(tmp_path):
+    writer = ReportWriter(str(tmp_path), max_bytes=300)
+    _write_batch(writer)
+    writer.close()
+
+    assert len(writer.index.files()) == 3
+    assert sum(item['items'] for item in writer.index.files()) == 3
+
+
+def test_index_answers_queries_without_reading_reports(tmp_path):
+    writer = ReportWriter(str(tmp_path))
+    _write_batch(writer)
+
+    by_platform = writer.index.query(group_by=('platform', 'status'))
+    assert by_platform == [
+        {'platform': 'vk.com', 'status': 'error', 'items': 1, 'bytes': 0, 'seconds': 0.0},
+        {'platform': 'vk.com', 'status': 'success', 'items': 1, 'bytes': 50, 'seconds': 0.0},
+        {'platform': 'youtube.com', 'status': 'success', 'items': 1, 'bytes': 100,
+         'seconds': by_platform[2]['seconds']},
+    ]
+    assert by_platform[2]['seconds'] >= 2
+    assert writer.index.failures() == [
+        {'platform': 'vk.com', 'error_class': 'private', 'items': 1, 'bytes': 0, 'seconds': 0.0},
+    ]
+
+
+def test_rebuild_matches_incremental_index(tmp_path):
+    writer = ReportWriter(str(tmp_path))
+    _write_batch(writer)
+    writer.close()
+    expected = writer.index.query(group_by=('platform', 'status', 'error_class'))
+
+    index = ReportIndex(str(tmp_path / ('rebuilt_' + INDEX_NAME)))
+    index.rebuild(str(tmp_path))
+
+    assert index.query(group_by=('platform', 'status', 'error_class')) == expected
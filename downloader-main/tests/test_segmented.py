@@ -0,0 +1,108 @@
+import json
+import os
+
+import pytest
+
+from utils.segmented import CONTROL_SUFFIX, MIN_SEGMENT_SIZE, SegmentedDownloader
+
+SIZE = 4 * MIN_SEGMENT_SIZE
+PAYLOAD = bytes(range(256)) * (SIZE // 256)
+
+
+class Interrupted(Exception):
+    pass
+
+
+def _first_progress(events):
+    def hook(d):
+        if d['status'] == 'downloading':
+            events.append(d['downloaded_bytes'])
+    return hook
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_downloads_file_over_several_ranges(local_server, tmp_path):
+    path = str(tmp_path / 'video.mp4')
+    progress = []
+    with local_server(PAYLOAD) as server:
+        size = SegmentedDownloader(4).download(server.url, path, hooks=[progress.append])
+
+    assert size == SIZE
+    assert _read(path) == PAYLOAD
+    # Пробный запрос и по запросу на каждый из четырех сегментов
+    assert server.requests == 5
+    assert progress[-1]['status'] == 'finished'
+    assert progress[-2]['downloaded_bytes'] == SIZE
+
+
+def test_dropped_segment_continues_from_last_byte(local_server, tmp_path):
+    path = str(tmp_path / 'video.mp4')
+    with local_server(PAYLOAD, drops=1) as server:
+        SegmentedDownloader(4).download(server.url, path)
+
+    assert _read(path) == PAYLOAD
+    assert server.requests == 6
+
+
+def test_falls_back_to_single_stream_without_ranges(local_server, tmp_path):
+    path = str(tmp_path / 'video.mp4')
+    with local_server(PAYLOAD, ranges=False) as server:
+        SegmentedDownloader(4).download(server.url, path)
+
+    assert server.requests == 1
+    assert _read(path) == PAYLOAD
+
+
+def test_hook_exception_aborts_all_segments(local_server, tmp_path):
+    path = str(tmp_path / 'video.mp4')
+
+    def cancel(d):
+        if d['status'] == 'downloading' and d['downloaded_bytes'] > SIZE // 4:
+            raise Interrupted()
+
+    with local_server(PAYLOAD) as server, pytest.raises(Interrupted):
+        SegmentedDownloader(4).download(server.url, path, hooks=[cancel])
+
+    assert not os.path.exists(path)
+
+
+def test_resumes_each_segment_after_interruption(local_server, tmp_path):
+    path = str(tmp_path / 'a.mp4')
+
+    def cancel(d):
+        if d['status'] == 'downloading' and d['downloaded_bytes'] > SIZE * 0.4:
+            raise Interrupted()
+
+    with local_server(PAYLOAD) as server:
+        with pytest.raises(Interrupted):
+            SegmentedDownloader(4).download(server.url, path, hooks=[cancel])
+        with open(path + '.part' + CONTROL_SUFFIX, encoding='utf-8') as f:
+            saved = sum(segment['position'] - segment['start'] for segment in json.load(f)['segments'])
+        assert 0 < saved < SIZE
+
+        events = []
+        SegmentedDownloader(4).download(server.url, path, hooks=[_first_progress(events)])
+
+    # Счет продолжается с сохраненных смещений, а не с нуля
+    assert events[0] > saved
+    assert _read(path) == PAYLOAD
+    assert not os.path.exists(path + '.part' + CONTROL_SUFFIX)
+
+
+def test_continues_contiguous_part_file(local_server, tmp_path):
+    path = str(tmp_path / 'a.mp4')
+    prefix = SIZE // 3
+    # .part загрузчика yt-dlp: байты подряд с начала файла, без файла смещений
+    with open(path + '.part', 'wb') as f:
+        f.write(PAYLOAD[:prefix])
+
+    events = []
+    with local_server(PAYLOAD) as server:
+        SegmentedDownloader(4).download(server.url, path, hooks=[_first_progress(events)])
+
+    assert events[0] > prefix
+    assert _read(path) == PAYLOAD
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from download_queue.manager import DownloadQueue
+from download_queue.tasks import JobJournal
+from server import ApiServer, JobService
+from utils.bandwidth import BandwidthGovernor
+
+
+class BlockingDownloads:
+    """download, который ждет разрешения теста: задачу можно застать в очереди или в работе"""
+
+    def __init__(self):
+        self.allowed = threading.Semaphore(0)
+        self.urls = []
+        self.priorities = {}
+
+    def __call__(self, url, callback=None, options=None, job_id=None, **kwargs):
+        self.urls.append(url)
+        self.priorities[url] = options.get('priority')
+        self.allowed.acquire(timeout=10)
+        return {'status': 'success', 'path': f'/videos/{job_id}.mp4'}
+
+
+async def _request(port, method, path, body=None):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    data = b'' if body is None else (body if isinstance(body, bytes) else json.dumps(body).encode())
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: test\r\nConnection: close\r\n'
+                 f'Content-Length: {len(data)}\r\n\r\n'.encode() + data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(payload)
+
+
+async def _wait_for(port, job_id, status):
+    for _ in range(200):
+        _, job = await _request(port, 'GET', f'/jobs/{job_id}')
+        if job['status'] == status:
+            return job
+        await asyncio.sleep(0.02)
+    raise AssertionError(f'job {job_id} did not reach {status}: {job}')
+
+
+@pytest.fixture
+def api(tmp_path):
+    """Запускает сценарий против ApiServer на свободном порту с подмененной загрузкой"""
+    downloads = BlockingDownloads()
+
+    def run(scenario, workers=1):
+        async def main():
+            queue = DownloadQueue(journal_path=str(tmp_path / 'queue.sqlite'))
+            queue.downloader.download = downloads
+            # Свой регулятор: тест не меняет общий лимит процесса
+            queue.downloader.bandwidth = BandwidthGovernor()
+            server = ApiServer(JobService(queue, workers), '127.0.0.1', 0)
+            await server.start()
+            try:
+                await scenario(server._server.sockets[0].getsockname()[1])
+            finally:
+                for _ in range(10):
+                    downloads.allowed.release()
+                server._server.close()
+                await server.service.stop()
+        asyncio.run(main())
+    run.downloads = downloads
+    return run
+
+
+def test_submitted_job_runs_to_completion(api):
+    async def scenario(port):
+        status, payload = await _request(port, 'POST', '/jobs', {'url': 'https://example.com/watch/1'})
+        assert status == 202
+        job_id = payload['jobs'][0]['id']
+        api.downloads.allowed.release()
+
+        job = await _wait_for(port, job_id, 'success')
+        assert job['result']['path'] == f'/videos/{job_id}.mp4'
+        _, listing = await _request(port, 'GET', '/jobs?status=success')
+        assert [job['id'] for job in listing['jobs']] == [job_id]
+
+    api(scenario)
+
+
+def test_queued_job_can_be_cancelled(api):
+    async def scenario(port):
+        _, payload = await _request(port, 'POST', '/jobs', {'urls': ['https://example.com/watch/a',
+                                                                      'https://example.com/watch/b']})
+        first, second = [job['id'] for job in payload['jobs']]
+        await _wait_for(port, first, 'downloading')
+
+        status, job = await _request(port, 'DELETE', f'/jobs/{second}')
+        assert status == 200
+        assert job['status'] == 'cancelled'
+        api.downloads.allowed.release()
+        await _wait_for(port, first, 'success')
+        # Отмененная задача так и не начала загрузку
+        assert api.downloads.urls == ['https://example.com/watch/a']
+
+    api(scenario)
+
+
+def test_bad_requests(api):
+    async def scenario(port):
+        assert (await _request(port, 'POST', '/jobs', b'not json'))[0] == 400
+        assert (await _request(port, 'POST', '/jobs', {}))[0] == 400
+        status, payload = await _request(port, 'POST', '/jobs', {'urls': ['not a url', 42]})
+        assert status == 202 and payload == {'jobs': [], 'rejected': ['not a url', 42]}
+        assert (await _request(port, 'GET', '/jobs/999'))[0] == 404
+        assert (await _request(port, 'GET', '/nowhere'))[0] == 404
+        assert (await _request(port, 'PATCH', '/jobs'))[0] == 405
+
+    api(scenario)
+
+
+
+def test_malformed_content_length_is_rejected(api):
+    async def scenario(port):
+        for length in (b'abc', b'-1'):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b'POST /jobs HTTP/1.1\r\nHost: test\r\nContent-Length: ' + length + b'\r\n\r\n')
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            assert response.startswith(b'HTTP/1.1 400')
+
+    api(scenario)
+
+
+def test_journal_is_written_off_the_event_loop(api, monkeypatch):
+    threads = []
+    ensure = JobJournal.ensure
+    monkeypatch.setattr(JobJournal, 'ensure',
+                        lambda self, *args: threads.append(threading.current_thread()) or ensure(self, *args))
+
+    async def scenario(port):
+        status, _ = await _request(port, 'POST', '/jobs', {'url': 'https://example.com/watch/journal'})
+        assert status == 202
+
+    api(scenario)
+
+    assert threads and threading.main_thread() not in threads
+
+def test_events_stream_job_lifecycle(api):
+    async def scenario(port):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'GET /events HTTP/1.1\r\nHost: test\r\n\r\n')
+        await writer.drain()
+        assert (await reader.readline()).startswith(b'HTTP/1.1 200')
+        await reader.readuntil(b'\r\n\r\n')
+
+        await _request(port, 'POST', '/jobs', {'url': 'https://example.com/watch/sse'})
+        api.downloads.allowed.release()
+        events = []
+        while 'complete' not in events:
+            line = await asyncio.wait_for(reader.readline(), 5)
+            if line.startswith(b'event: '):
+                events.append(line[len('event: '):].strip().decode())
+        writer.close()
+
+        assert events == ['queued', 'started', 'complete']
+
+    api(scenario)
+
+
+def test_single_urls_are_interactive_and_batches_bulk(api):
+    async def scenario(port):
+        _, single = await _request(port, 'POST', '/jobs', {'url': 'https://example.com/watch/one'})
+        _, batch = await _request(port, 'POST', '/jobs', {'urls': ['https://example.com/watch/many']})
+        for _ in range(2):
+            api.downloads.allowed.release()
+        for job in single['jobs'] + batch['jobs']:
+            await _wait_for(port, job['id'], 'success')
+
+        assert api.downloads.priorities == {'https://example.com/watch/one': 'interactive',
+                                            'https://example.com/watch/many': 'bulk'}
+
+    api(scenario)
+
+
+def test_bandwidth_limit_changes_at_runtime(api):
+    async def scenario(port):
+        status, stats = await _request(port, 'PUT', '/bandwidth', {'limit': 2048000, 'weights': {'bulk': 2}})
+        assert status == 200
+        assert stats['limit'] == 2048000
+        assert stats['weights']['bulk'] == 2
+        assert (await _request(port, 'GET', '/bandwidth'))[1] == stats
+        assert (await _request(port, 'PUT', '/bandwidth', {'limit': 'fast'}))[0] == 400
+
+    api(scenario)
@@ -0,0 +1,68 @@
+import threading
+
+from download_queue.tasks import (
+    JobJournal, CANCELLED, DONE, DOWNLOADING, FAILED, PENDING, POSTPROCESSING,
+)
+
+
+def test_ensure_reuses_unfinished_job(tmp_path):
+    journal = JobJournal(str(tmp_path / 'queue.sqlite'))
+    job_id = journal.ensure('https://a')
+
+    assert journal.ensure('https://a') == job_id
+    journal.set_state(job_id, DONE)
+    assert journal.ensure('https://a') != job_id
+
+
+def test_ensure_skips_claimed_jobs(tmp_path):
+    journal = JobJournal(str(tmp_path / 'queue.sqlite'))
+    first = journal.ensure('https://a')
+    second = journal.ensure('https://a', exclude={first})
+
+    assert second != first
+    assert journal.ensure('https://a', exclude={first, second}) not in (first, second)
+
+
+def test_concurrent_ensure_creates_one_job(tmp_path):
+    journal = JobJournal(str(tmp_path / 'queue.sqlite'))
+    ids = []
+    threads = [threading.Thread(target=lambda: ids.append(journal.ensure('https://a'))) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(ids)) == 1
+    assert journal.get_counts() == {PENDING: 1}
+
+
+def test_unfinished_jobs_survive_reopen(tmp_path):
+    path = str(tmp_path / 'queue.sqlite')
+    journal = JobJournal(path)
+    states = {}
+    for name, state in (('pending', PENDING), ('downloading', DOWNLOADING), ('post', POSTPROCESSING),
+                        ('done', DONE), ('cancelled', CANCELLED), ('failed', FAILED)):
+        job_id = journal.add(f'https://{name}')
+        if state != PENDING:
+            journal.set_state(job_id, state)
+        states[name] = job_id
+    journal.close()
+
+    reopened = JobJournal(path)
+    urls = [job['url'] for job in reopened.get_unfinished()]
+    assert urls == ['https://pending', 'https://downloading', 'https://post']
+    # Упавшие возвращаются, пока не кончились попытки
+    assert 'https://failed' in [job['url'] for job in reopened.get_unfinished(max_attempts=3)]
+
+
+def test_failed_job_is_retried_until_attempts_run_out(tmp_path):
+    journal = JobJournal(str(tmp_path / 'queue.sqlite'))
+    job_id = journal.add('https://a')
+    for _ in range(2):
+        journal.set_state(job_id, DOWNLOADING)
+        journal.set_state(job_id, FAILED, message='boom')
+
+    assert journal.get(job_id)['attempts'] == 2
+    assert journal.get(job_id)['message'] == 'boom'
+    assert [job['id'] for job in journal.get_unfinished(max_attempts=3)] == [job_id]
+    assert journal.get_unfinished(max_attempts=2) == []
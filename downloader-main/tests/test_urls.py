@@ -0,0 +1,70 @@
+import pytest
+
+from benchmarks.fake_extractor import FakeMediaIE
+from utils import urls
+from utils.urls import canonicalize_url, get_return_type, get_video_key, make_archive_key, strip_tracking
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('https://youtu.be/dQw4w9WgXcQ?si=abc&t=42', 'https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=42'),
+    ('https://m.youtube.com/watch?v=dQw4w9WgXcQ&feature=share&utm_source=tg',
+     'https://www.youtube.com/watch?v=dQw4w9WgXcQ'),
+    ('https://www.instagram.com/reel/Cabc123/?igsh=xyz#comments', 'https://www.instagram.com/reel/Cabc123'),
+    ('HTTPS://M.VK.COM/video-1_2', 'https://vk.com/video-1_2'),
+])
+def test_strip_tracking(url, expected):
+    assert strip_tracking(url) == expected
+
+
+def test_short_links_are_resolved_before_stripping(monkeypatch):
+    resolved = []
+
+    def resolve(url):
+        resolved.append(url)
+        return 'https://www.tiktok.com/@user/video/7001?is_from_webapp=1'
+
+    monkeypatch.setattr(urls, 'resolve_short_link', resolve)
+
+    assert canonicalize_url('https://vm.tiktok.com/ZMabc/') == 'https://www.tiktok.com/@user/video/7001'
+    assert canonicalize_url('https://vm.tiktok.com/ZMabc/', resolve=False) == 'https://vm.tiktok.com/ZMabc'
+    assert resolved == ['https://vm.tiktok.com/ZMabc/']
+
+
+@pytest.mark.parametrize('url, key', [
+    ('https://www.youtube.com/watch?v=dQw4w9WgXcQ', ('youtube', 'dQw4w9WgXcQ')),
+    ('https://www.tiktok.com/@user/video/7001', ('tiktok', '7001')),
+    # У VK id видео в группе videoid, а не id
+    ('https://vk.com/video-1_2', ('vk', '-1_2')),
+    ('https://example.com/page', None),
+])
+def test_video_key_without_network(url, key):
+    assert get_video_key(url) == key
+
+
+def test_archive_key_matches_download_archive_format():
+    assert make_archive_key({'extractor_key': 'Youtube', 'id': 'dQw4w9WgXcQ'}) == ('youtube', 'dQw4w9WgXcQ')
+    assert make_archive_key({'ie_key': 'VK', 'id': -1}) == ('vk', '-1')
+    assert make_archive_key({'id': 'x'}) is None
+
+
+class _LocalPlaylistIE(FakeMediaIE):
+    IE_NAME = 'test:local-playlist'
+    _RETURN_TYPE = 'playlist'
+
+
+@pytest.mark.parametrize('url, kind', [
+    ('https://vk.com/video-1_2', 'video'),
+    ('https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'video'),
+    # Ссылка на ролик в плейлисте может оказаться и тем, и другим
+    ('https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PL1', 'any'),
+    ('https://example.com/page', None),
+])
+def test_return_type_without_network(url, kind):
+    assert get_return_type(url) == kind
+
+
+def test_extra_extractors_are_checked_first():
+    url = 'http://127.0.0.1:8000/watch/x'
+
+    assert get_return_type(url) is None
+    assert get_return_type(url, (_LocalPlaylistIE,)) == 'playlist'
@@ -0,0 +1,36 @@
+from utils.ydl_pool import YDLPool
+
+
+def test_reuses_instance_for_same_effective_options():
+    pool = YDLPool()
+    with pool.lease({'quiet': True, 'outtmpl': 'a/%(id)s.%(ext)s'}) as first:
+        pass
+    # Шаблон имени и хуки — опции задачи, они не делят пул
+    with pool.lease({'quiet': True, 'outtmpl': 'b/%(id)s.%(ext)s'}) as second:
+        assert second.params['outtmpl']['default'] == 'b/%(id)s.%(ext)s'
+
+    assert second is first
+    assert pool.stats == {'created': 1, 'reused': 1}
+    pool.clear()
+
+
+def test_different_options_get_separate_instances():
+    pool = YDLPool()
+    with pool.lease({'quiet': True, 'format': 'best'}) as first:
+        with pool.lease({'quiet': True, 'format': 'worst'}) as second:
+            assert second is not first
+
+    assert pool.stats['created'] == 2
+    pool.clear()
+
+
+def test_hooks_are_reset_after_lease():
+    pool = YDLPool()
+    calls = []
+    with pool.lease({'quiet': True, 'progress_hooks': [calls.append]}) as ydl:
+        ydl.params['progress_hooks'][0]({'status': 'downloading'})
+    with pool.lease({'quiet': True}) as ydl:
+        ydl.params['progress_hooks'][0]({'status': 'finished'})
+
+    assert calls == [{'status': 'downloading'}]
+    pool.clear()